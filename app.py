@@ -1,17 +1,92 @@
 import sys
 import os
+import logging
+import startup_timeline
+import profiler
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QPushButton, QLabel, QStackedWidget, QMessageBox,
                             QLineEdit, QHBoxLayout, QFrame, QSizePolicy,
-                            QFileDialog, QDialog, QFormLayout)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSize, QTimer
-from PyQt5.QtGui import QIcon, QPixmap
-import psutil
-import pygetwindow as gw
+                            QFileDialog, QDialog, QFormLayout, QPlainTextEdit,
+                            QListWidget, QListWidgetItem, QProgressBar, QComboBox,
+                            QTableWidget, QTableWidgetItem, QHeaderView, QMenu, QSystemTrayIcon)
+from PyQt5.QtCore import Qt, QThread, QObject, pyqtSignal, QSize, QTimer, QEvent
+from PyQt5.QtGui import QIcon, QPixmap, QPainter, QColor
+try:
+    import pygetwindow as gw
+except NotImplementedError:
+    gw = None  # pygetwindow has no Linux backend
 import subprocess
 import time
-import winreg
 import json
+import threading
+import psutil
+import devtools
+import browser_locations
+from tab_inventory import TabInventory
+from process_source import get_process_source
+from browser_registry import BrowserRegistry
+from browser_model import BrowserListWidget, BrowserCardDelegate, STATUS_UNKNOWN
+from detection_engine import DetectionCycle, DetectionCancelled
+from url_fanout import FanOutRunner
+from audit_journal import get_journal, EVENT_LAUNCH
+from session_index import default_scope, filter_scope, SCOPE_ALL
+from icon_cache import get_icon_cache, release_icon_cache
+from browser_profiles import get_profile_index
+from history_index import get_history_index, HistoryCompleter
+import fleet
+import policy_engine
+import process_trace
+
+# Statuses reported by the detector; unknown means the cycle ran out of time
+STATUS_COLORS = {
+    'running': '#28a745',
+    'not_running': '#dc3545',
+    STATUS_UNKNOWN: '#8a8886'
+}
+
+STATUS_LABELS = {
+    'running': "Running",
+    'not_running': "Not Running",
+    STATUS_UNKNOWN: "Unknown"
+}
+
+# Fleet hosts report their own statuses
+FLEET_STATUS_COLORS = {
+    fleet.STATUS_RUNNING: '#28a745',
+    fleet.STATUS_PRIVATE: '#6f42c1',
+    fleet.STATUS_NOT_RUNNING: '#dc3545',
+    fleet.STATUS_UNKNOWN: '#8a8886',
+    fleet.STATUS_OFFLINE: '#343a40'
+}
+
+FLEET_STATUS_LABELS = {
+    fleet.STATUS_RUNNING: "Running",
+    fleet.STATUS_PRIVATE: "Private mode",
+    fleet.STATUS_NOT_RUNNING: "Not Running",
+    fleet.STATUS_UNKNOWN: "Unknown",
+    fleet.STATUS_OFFLINE: "Host offline"
+}
+
+# Detection polling while the window is open, and while idling in the tray
+POLL_INTERVAL = 5000
+TRAY_POLL_INTERVAL = 60000
+
+# What the app may cost while idling in the tray; bench_idle.py checks these
+IDLE_CPU_BUDGET = 0.5  # Percent of one core, averaged over the idle period
+IDLE_RSS_BUDGET_MB = 120
+
+def status_key(is_running):
+    return 'running' if is_running else 'not_running'
+
+def browser_descriptions(snapshot):
+    """Card descriptions naming each browser's installed version when it is known"""
+    return {name: f"Manage {name} browser, version {version}" for name, version in snapshot.versions.items()}
+
+def normalize_url(url):
+    url = url.strip()
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
 
 class AddBrowserDialog(QDialog):
     def __init__(self, parent=None):
@@ -42,6 +117,16 @@ class AddBrowserDialog(QDialog):
         self.incognito_input.setPlaceholderText("e.g., --incognito, --private")
         layout.addRow("Incognito Flag:", self.incognito_input)
         
+        # Optional profile location, for launching into a specific profile
+        profile_layout = QHBoxLayout()
+        self.profile_input = QLineEdit()
+        self.profile_input.setPlaceholderText("User data folder or folder with profiles.ini (optional)")
+        profile_btn = QPushButton("Browse")
+        profile_btn.clicked.connect(self.browse_profile_root)
+        profile_layout.addWidget(self.profile_input)
+        profile_layout.addWidget(profile_btn)
+        layout.addRow("Profile Folder:", profile_layout)
+        
         # Buttons
         button_layout = QHBoxLayout()
         save_btn = QPushButton("Save")
@@ -62,174 +147,382 @@ class AddBrowserDialog(QDialog):
         if file_path:
             self.path_input.setText(file_path)
     
+    def browse_profile_root(self):
+        directory = QFileDialog.getExistingDirectory(self, "Select Profile Folder")
+        if directory:
+            self.profile_input.setText(directory)
+    
     def get_browser_info(self):
         return {
             'name': self.name_input.text(),
             'path': self.path_input.text(),
-            'incognito_flag': self.incognito_input.text()
+            'incognito_flag': self.incognito_input.text(),
+            'profile_root': self.profile_input.text().strip()
         }
 
-class BrowserDetector(QThread):
-    detection_complete = pyqtSignal(dict)
+class FanOutDialog(QDialog):
+    """Open a list of URLs in every selected browser at once"""
+    def __init__(self, browser_actions, urls=(), parent=None):
+        super().__init__(parent)
+        self.browser_actions = browser_actions
+        self.runner = None
+        self.setWindowTitle("Open URLs in Multiple Browsers")
+        self.setMinimumWidth(500)
+        self.init_ui(urls)
     
-    def __init__(self):
-        super().__init__()
-        self.custom_browsers = self.load_custom_browsers()
-        self.browser_paths = self.get_browser_paths()
+    def init_ui(self, urls):
+        layout = QFormLayout(self)
+        
+        # One URL per line
+        self.url_input = QPlainTextEdit()
+        self.url_input.setPlaceholderText("One URL per line")
+        self.url_input.setPlainText('\n'.join(urls))
+        layout.addRow("URLs:", self.url_input)
+        
+        # Browser selection, every known browser checked by default
+        self.browser_select = QListWidget()
+        for browser in self.browser_actions.registry.current().browser_paths:
+            item = QListWidgetItem(browser)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            self.browser_select.addItem(item)
+        layout.addRow("Browsers:", self.browser_select)
+        
+        # Live progress
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setValue(0)
+        layout.addRow("Progress:", self.progress_bar)
+        self.log_output = QPlainTextEdit()
+        self.log_output.setReadOnly(True)
+        layout.addRow("Results:", self.log_output)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        self.start_btn = QPushButton("Open All")
+        self.start_btn.clicked.connect(self.start)
+        self.cancel_btn = QPushButton("Close")
+        self.cancel_btn.clicked.connect(self.cancel)
+        button_layout.addWidget(self.start_btn)
+        button_layout.addWidget(self.cancel_btn)
+        layout.addRow("", button_layout)
     
-    def load_custom_browsers(self):
-        try:
-            with open('custom_browsers.json', 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
+    def selected_browsers(self):
+        items = (self.browser_select.item(i) for i in range(self.browser_select.count()))
+        return [item.text() for item in items if item.checkState() == Qt.Checked]
     
-    def save_custom_browsers(self):
-        with open('custom_browsers.json', 'w') as f:
-            json.dump(self.custom_browsers, f, indent=4)
+    def start(self):
+        urls = [url for url in map(normalize_url, self.url_input.toPlainText().splitlines()) if url]
+        browsers = self.selected_browsers()
+        if not urls or not browsers:
+            QMessageBox.warning(self, "Error", "Please enter at least one URL and select a browser")
+            return
+        
+        self.runner = FanOutRunner(self.browser_actions.open_url_in_browser, urls, browsers)
+        self.runner.job_finished.connect(self.on_job_finished)
+        self.runner.progress.connect(self.on_progress)
+        self.runner.batch_finished.connect(self.on_batch_finished)
+        self.progress_bar.setRange(0, self.runner.total)
+        self.progress_bar.setValue(0)
+        self.log_output.clear()
+        self.start_btn.setEnabled(False)
+        self.cancel_btn.setText("Cancel")
+        self.runner.start()
     
-    def add_custom_browser(self, browser_info):
-        self.custom_browsers[browser_info['name']] = {
-            'path': browser_info['path'],
-            'incognito_flag': browser_info['incognito_flag']
-        }
-        self.save_custom_browsers()
-        # Recalculate browser paths after adding a custom browser
-        self.browser_paths = self.get_browser_paths()
-    
-    def get_browser_paths(self):
-        paths = {}
-        
-        # Common browser paths
-        common_paths = {
-            'Chrome': [
-                r'C:\Program Files\Google\Chrome\Application\chrome.exe',
-                r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
-                os.path.expanduser(r'~\AppData\Local\Google\Chrome\Application\chrome.exe')
-            ],
-            'Opera': [
-                r'C:\Program Files\Opera\launcher.exe',
-                r'C:\Program Files (x86)\Opera\launcher.exe',
-                os.path.expanduser(r'~\AppData\Local\Programs\Opera\launcher.exe')
-            ],
-            'Brave': [
-                r'C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe',
-                r'C:\Program Files (x86)\BraveSoftware\Brave-Browser\Application\brave.exe',
-                os.path.expanduser(r'~\AppData\Local\BraveSoftware\Brave-Browser\Application\brave.exe')
-            ],
-            'Epic': [
-                r'C:\Program Files (x86)\Epic Privacy Browser\epic.exe',
-                os.path.expanduser(r'~\AppData\Local\Epic Privacy Browser\epic.exe')
-            ],
-            'Firefox': [
-                r'C:\Program Files\Mozilla Firefox\firefox.exe',
-                r'C:\Program Files (x86)\Mozilla Firefox\firefox.exe',
-                os.path.expanduser(r'~\AppData\Local\Mozilla Firefox\firefox.exe')
-            ],
-            'Edge': [
-                r'C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe',
-                r'C:\Program Files\Microsoft\Edge\Application\msedge.exe'
-            ]
-        }
+    def cancel(self):
+        if self.runner is not None and self.runner.isRunning():
+            self.runner.cancel()
+        else:
+            self.reject()
+    
+    def on_job_finished(self, browser, url, success, message):
+        self.log_output.appendPlainText(f"{'OK' if success else 'FAILED'}  {browser}  {url}"
+                                        + ("" if success else f"  ({message})"))
+    
+    def on_progress(self, done, total):
+        self.progress_bar.setValue(done)
+    
+    def on_batch_finished(self, succeeded, failed, cancelled):
+        summary = f"{succeeded} opened, {failed} failed"
+        if cancelled:
+            summary += f", {cancelled} cancelled"
+        self.log_output.appendPlainText(summary)
+        self.start_btn.setEnabled(True)
+        self.cancel_btn.setText("Close")
+    
+    def closeEvent(self, event):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner.wait()
+        super().closeEvent(event)
+    
+    def reject(self):
+        if self.runner is not None:
+            self.runner.cancel()
+            self.runner.wait()
+        super().reject()
+
+class ActivityDialog(QDialog):
+    """Recent launches and terminations from the audit journal"""
+    TIME_RANGES = (("Last hour", 3600), ("Last 24 hours", 86400), ("Last 7 days", 7 * 86400), ("All", None))
+    MAX_ROWS = 500
+    
+    def __init__(self, browsers, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Recent Activity")
+        self.setMinimumSize(700, 400)
+        self.init_ui(browsers)
+        self.refresh()
+    
+    def init_ui(self, browsers):
+        layout = QVBoxLayout(self)
         
-        # Try to get paths from registry
-        try:
-            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r'SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths') as key:
-                for browser in common_paths.keys():
-                    try:
-                        with winreg.OpenKey(key, f'{browser.lower()}.exe') as browser_key:
-                            path = winreg.QueryValue(browser_key, None)
-                            if path and os.path.exists(path):
-                                paths[browser] = path
-                    except WindowsError:
-                        pass
-        except WindowsError:
-            pass
-        
-        # Check common paths if registry lookup failed
-        for browser, possible_paths in common_paths.items():
-            if browser not in paths:
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        paths[browser] = path
-                        break
-        
-        # Add custom browsers
-        paths.update({name: info['path'] for name, info in self.custom_browsers.items()})
-        
-        return paths
-    
-    def is_browser_running(self, browser_name):
-        try:
-            browser_path = self.browser_paths.get(browser_name, '')
-            if not browser_path:
-                return False
+        # Filters, applied to the journal index as they change
+        filter_layout = QHBoxLayout()
+        self.browser_filter = QComboBox()
+        self.browser_filter.addItem("All browsers", None)
+        for browser in browsers:
+            self.browser_filter.addItem(browser, browser)
+        self.browser_filter.currentIndexChanged.connect(self.refresh)
+        filter_layout.addWidget(self.browser_filter)
+        
+        self.url_filter = QLineEdit()
+        self.url_filter.setPlaceholderText("URL or host")
+        self.url_filter.textChanged.connect(self.refresh)
+        filter_layout.addWidget(self.url_filter)
+        
+        self.time_filter = QComboBox()
+        for label, seconds in self.TIME_RANGES:
+            self.time_filter.addItem(label, seconds)
+        self.time_filter.setCurrentIndex(1)
+        self.time_filter.currentIndexChanged.connect(self.refresh)
+        filter_layout.addWidget(self.time_filter)
+        layout.addLayout(filter_layout)
+        
+        self.table = QTableWidget(0, 5)
+        self.table.setHorizontalHeaderLabels(["Time", "Event", "Browser", "URL", "Details"])
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table)
+        
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn, alignment=Qt.AlignRight)
+    
+    def refresh(self):
+        seconds = self.time_filter.currentData()
+        events = get_journal().query(since=time.time() - seconds if seconds else None,
+                                     browser=self.browser_filter.currentData(),
+                                     url=self.url_filter.text().strip() or None,
+                                     limit=self.MAX_ROWS)
+        self.table.setRowCount(len(events))
+        for row, event in enumerate(events):
+            details = ', '.join(f"{key}={value}" for key, value in event.items()
+                                if key not in ('ts', 'event', 'browser', 'url'))
+            values = (time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(event['ts'])), event['event'],
+                      event.get('browser') or '', event.get('url', ''), details)
+            for column, value in enumerate(values):
+                self.table.setItem(row, column, QTableWidgetItem(value))
 
-            for proc in psutil.process_iter(['name', 'exe']):
-                if proc.info['exe'] and os.path.exists(proc.info['exe']):
-                    # Compare the base executable name for a match
-                    if os.path.basename(proc.info['exe']).lower() == os.path.basename(browser_path).lower():
-                        return True
-            return False
-        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+class AllUsersDialog(QDialog):
+    """Admin view: browser process counts of every user, from the detector's last snapshot"""
+    def __init__(self, detector, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("All Users")
+        self.setMinimumSize(600, 300)
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        self.table = QTableWidget(0, 0)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        layout.addWidget(self.table)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn, alignment=Qt.AlignRight)
+        
+        # Follow the periodic detection instead of scanning again; user names
+        # are only read while this view is open
+        detector.per_user_views += 1
+        self.finished.connect(lambda: setattr(detector, 'per_user_views', detector.per_user_views - 1))
+        detector.sessions_detected.connect(self.update_counts)
+        if detector.last_index is not None and detector.last_index.per_user:
+            self.update_counts(detector.last_index)
+        else:
+            self.summary_label.setText("Waiting for the next detection...")
+            detector.start()
+    
+    def update_counts(self, index):
+        if not index.per_user:
+            return  # A cycle that started before the view opened
+        counts = index.aggregate()
+        users = sorted(counts, key=lambda user: (user is None, user or ''))
+        browsers = sorted({browser for per_user in counts.values() for browser in per_user})
+        self.table.setRowCount(len(users))
+        self.table.setColumnCount(len(browsers))
+        self.table.setHorizontalHeaderLabels(browsers)
+        self.table.setVerticalHeaderLabels([user or "(unknown user)" for user in users])
+        for row, user in enumerate(users):
+            for column, browser in enumerate(browsers):
+                self.table.setItem(row, column, QTableWidgetItem(str(counts[user].get(browser, 0))))
+        self.summary_label.setText(f"{len(users)} users running browsers, "
+                                   f"{sum(sum(c.values()) for c in counts.values())} browser processes")
+
+class BrowserDetector(QThread):
+    browser_detected = pyqtSignal(str, str)  # browser name, status
+    detection_complete = pyqtSignal(dict)
+    sessions_detected = pyqtSignal(object)  # SessionIndex of the cycle's snapshot
+    
+    def __init__(self, registry, deadline=None, scope=None):
+        super().__init__()
+        self.registry = registry  # Shared, snapshots are read without locking
+        self.deadline = deadline  # Seconds per cycle, None for the configured default
+        self.scope = scope or default_scope()  # Only this user's or session's browsers count
+        self.cycle = None
+        self.stopped = False  # Set by stop(), no cycle starts after it
+        self._cycle_lock = threading.Lock()  # Orders stop() against the start of a cycle
+        self.last_index = None
+        self.tab_inventory = TabInventory()  # Refreshed after every cycle
+        self.extra_attrs = ()  # Snapshot attributes cycle_listeners need
+        self.per_user_views = 0  # Open views of every user's browsers, which need user names
+        self.cycle_listeners = []  # Called on this thread with (SessionIndex, complete, started)
+    
+    def running_browsers(self, snapshot=None):
+        """Classify one process snapshot into the set of browsers running in scope"""
+        catalog = (snapshot or self.registry.current()).catalog
+        records = get_process_source().snapshot(catalog.identity_attrs + self.scope.attrs)
+        return set(catalog.summarize(filter_scope(records, self.scope)))
+    
+    def is_browser_running(self, browser_name, running=None):
+        if browser_name not in self.registry.current().browser_paths:
             return False
+        if running is None:
+            running = self.running_browsers()
+        return browser_locations.canonical_name(browser_name) in running
     
     def run(self):
+        with profiler.span('detection cycle', 'detection'), profiler.sampled_cprofile('detector'):
+            self.detect()
+    
+    def detect(self):
         results = {}
+        with self._cycle_lock:
+            if self.stopped:
+                return
+            self.cycle = cycle = DetectionCycle(self.deadline)
+        # Work from one registry snapshot for the whole cycle
+        snapshot = self.registry.current()
         # Include both built-in and custom browsers for detection
-        all_browsers = set(self.browser_paths.keys()) # Use keys from already updated browser_paths
-        for browser in all_browsers:
-            results[browser] = self.is_browser_running(browser)
+        names = {}
+        for browser in snapshot.browser_paths:
+            names.setdefault(browser_locations.canonical_name(browser), []).append(browser)
+        
+        def report(browser, status):
+            results[browser] = status
+            self.browser_detected.emit(browser, status)
+        
+        # A browser is running as soon as one of its processes shows up
+        def found(canonical):
+            for browser in names.get(canonical, ()):
+                report(browser, status_key(True))
+        
+        try:
+            attrs = snapshot.catalog.identity_attrs + self.extra_attrs
+            if self.per_user_views:
+                attrs += ('username',)
+            index, complete = cycle.scan_sessions(snapshot.catalog, attrs, self.scope, found)
+        except DetectionCancelled:
+            return
+        self.last_index = index
+        self.sessions_detected.emit(index)
+        # Re-read changed session files here so URL checks on the GUI thread are lookups
+        with profiler.span('tab inventory', 'detection'):
+            self.tab_inventory.refresh()
+        for listener in self.cycle_listeners:
+            listener(index, complete, cycle.started)
+        # Browsers not seen are only known not to run if the whole table was read
+        for browser in snapshot.browser_paths:
+            if browser not in results:
+                report(browser, status_key(False) if complete else STATUS_UNKNOWN)
         self.detection_complete.emit(results)
+    
+    def stop(self):
+        """Cancel the running cycle from inside its process loop; later starts do nothing"""
+        with self._cycle_lock:
+            self.stopped = True
+            if self.cycle is not None:
+                self.cycle.cancel()
 
 class BrowserActions(QThread):
     def __init__(self, detector):
         super().__init__()
         self.detector = detector  # Use the shared detector instance
-        self.browser_paths = self.detector.get_browser_paths()
-        self.custom_browsers = self.detector.load_custom_browsers()
-        self.browser_incognito_flags = {
-            'Chrome': '--incognito',
-            'Opera': '--private',
-            'Brave': '--incognito',
-            'Epic': '--incognito',
-            'Firefox': '-private',
-            'Edge': '--inprivate'
-        }
-        # Add custom browser incognito flags
-        self.browser_incognito_flags.update(
-            {name: info['incognito_flag'] for name, info in self.custom_browsers.items()}
-        )
+        self.registry = detector.registry  # Paths and flags come from the shared registry
     
     def add_custom_browser(self, browser_info):
-        self.detector.add_custom_browser(browser_info)
-        # Update browser paths and incognito flags after adding custom browser
-        self.browser_paths = self.detector.get_browser_paths()
-        self.browser_incognito_flags[browser_info['name']] = browser_info['incognito_flag']
+        # The new executable's version is read later by the window's version probe
+        self.registry.add_custom_browser(browser_info, probe=False)
     
     def is_url_open(self, url):
-        try:
-            windows = gw.getAllWindows()
-            for window in windows:
-                if url in window.title:
-                    return True
+        # Session files know about background tabs, but outlive the browser. The tabs and
+        # the running browsers both come from the last detection cycle
+        open_in = {browser for browser, _ in self.detector.tab_inventory.locations(url)}
+        snapshot = self.registry.current()
+        index = self.detector.last_index
+        if index is not None and any(browser_locations.canonical_name(name) in open_in
+                                     for name in snapshot.browser_paths):
+            if open_in & set(index.scoped):
+                return True
+        
+        # Fall back to window titles for browsers without readable session files
+        if gw is None:
             return False
+        try:
+            with profiler.span('window enumeration', 'windows'):
+                titles = process_trace.window_titles()
+            return any(url in title for title in titles)
         except Exception:
             return False
     
-    def open_url_in_browser(self, browser_name, url):
-        if browser_name not in self.browser_paths:
+    def profile_root(self, browser_name, snapshot=None):
+        snapshot = snapshot or self.registry.current()
+        return snapshot.custom_browsers.get(browser_name, {}).get('profile_root')
+    
+    def profiles(self, browser_name):
+        """Return the browser's profiles from the cached profile index"""
+        return get_profile_index().profiles(browser_name, self.profile_root(browser_name))
+    
+    @profiler.traced('launch')
+    def open_url_in_browser(self, browser_name, url, profile=None):
+        snapshot = self.registry.current()
+        if browser_name not in snapshot.browser_paths:
             return False, f"Browser {browser_name} not supported"
         
-        browser_path = self.browser_paths[browser_name]
-        incognito_flag = self.browser_incognito_flags.get(browser_name, '')
+        browser_path = snapshot.browser_paths[browser_name]
+        incognito_flag = snapshot.incognito_flags.get(browser_name, '')
         
         if not os.path.exists(browser_path):
             return False, f"{browser_name} is not installed"
         
+        profile_args = []
+        if profile:
+            profile_args = get_profile_index().launch_arguments(browser_name, profile,
+                                                                self.profile_root(browser_name, snapshot))
+            if profile_args is None:
+                return False, f"{browser_name} has no profile {profile}"
+        
+        # Reuse a running browser that exposes a DevTools endpoint; it cannot pick a profile
+        if not profile and devtools.open_url(browser_name, url, private=bool(incognito_flag)):
+            get_journal().record(EVENT_LAUNCH, browser_name, url, private=bool(incognito_flag), method='devtools')
+            return True, f"Opening {url} in {browser_name}"
+        
         try:
-            command = [browser_path, incognito_flag, url] if incognito_flag else [browser_path, url]
+            command = [browser_path] + profile_args + ([incognito_flag] if incognito_flag else []) + [url]
             subprocess.Popen(command)
+            details = {'profile': profile} if profile else {}
+            get_journal().record(EVENT_LAUNCH, browser_name, url, private=bool(incognito_flag), method='spawn',
+                                 **details)
             return True, f"Opening {url} in {browser_name}"
         except Exception as e:
             return False, f"Error opening {browser_name}: {str(e)}"
@@ -238,14 +531,10 @@ class BrowserDetectionPage(QWidget):
     def __init__(self, detector):
         super().__init__()
         self.detector = detector  # Use the shared detector instance
+        self.registry_generation = None
         self.init_ui()
+        self.detector.browser_detected.connect(self.update_single_status)
         self.detector.detection_complete.connect(self.update_browser_status)
-        self.detector.start()
-        
-        # Set up timer for periodic updates
-        self.update_timer = QTimer()
-        self.update_timer.timeout.connect(self.refresh_detection)
-        self.update_timer.start(5000)  # Update every 5 seconds
     
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -255,61 +544,65 @@ class BrowserDetectionPage(QWidget):
         title.setStyleSheet("font-size: 18px; font-weight: bold; margin-bottom: 20px;")
         layout.addWidget(title)
         
-        # Status container
-        self.status_container = QWidget()
-        self.status_layout = QVBoxLayout(self.status_container)
-        layout.addWidget(self.status_container)
+        # Other users' browsers on the same host are not shown
+        scope = self.detector.scope
+        if scope.kind != SCOPE_ALL:
+            layout.addWidget(QLabel(f"Showing browsers of {scope.kind} {scope.key}"))
+        
+        # Browser list, one painted row per browser
+        self.browser_list = BrowserListWidget(BrowserCardDelegate.DETECTION_MODE, STATUS_COLORS,
+                                              STATUS_LABELS, show_status_labels=True)
+        layout.addWidget(self.browser_list)
         
         # Refresh button
         refresh_btn = QPushButton("Refresh Detection")
         refresh_btn.clicked.connect(self.refresh_detection)
         layout.addWidget(refresh_btn)
         
+        # Admin view of every user's browsers on a shared host
+        all_users_btn = QPushButton("All Users")
+        all_users_btn.clicked.connect(self.show_all_users)
+        layout.addWidget(all_users_btn)
+        
         layout.addStretch()
     
+    def sync_rows(self):
+        # Rows are only rebuilt when the registry has changed
+        snapshot = self.detector.registry.current()
+        if snapshot.generation != self.registry_generation:
+            self.browser_list.model.set_browsers(list(snapshot.browser_paths), browser_descriptions(snapshot))
+            self.browser_list.set_icons(get_icon_cache(), snapshot.browser_paths)
+            self.registry_generation = snapshot.generation
+    
+    @profiler.traced('ui')
+    def update_single_status(self, browser, status):
+        """Show one browser's result as soon as the detector reports it"""
+        startup_timeline.mark("first status")
+        self.sync_rows()
+        self.browser_list.model.set_statuses({browser: status})
+    
+    @profiler.traced('ui')
     def update_browser_status(self, results):
-        # Clear existing status widgets
-        while self.status_layout.count():
-            item = self.status_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # Add status for each browser
-        for browser, is_running in results.items():
-            status_frame = QFrame()
-            status_frame.setStyleSheet("""
-                QFrame {
-                    background-color: white;
-                    border-radius: 8px;
-                    padding: 10px;
-                    margin: 5px;
-                }
-            """)
-            
-            status_layout = QHBoxLayout(status_frame)
-            
-            # Browser name
-            name_label = QLabel(browser)
-            name_label.setStyleSheet("font-size: 14px; font-weight: bold;")
-            status_layout.addWidget(name_label)
-            
-            # Status indicator
-            status_label = QLabel("Running" if is_running else "Not Running")
-            status_label.setStyleSheet(f"""
-                color: {'#28a745' if is_running else '#dc3545'};
-                font-weight: bold;
-            """)
-            status_layout.addWidget(status_label)
-            
-            self.status_layout.addWidget(status_frame)
+        self.sync_rows()
+        self.browser_list.model.set_statuses(results)
+    
+    def show_statuses(self, statuses):
+        """Fill a freshly built page from the last known results"""
+        self.sync_rows()
+        self.browser_list.model.set_statuses(statuses)
     
     def refresh_detection(self):
         self.detector.start()
+    
+    def show_all_users(self):
+        dialog = AllUsersDialog(self.detector, self)
+        dialog.exec_()
 
 class BrowserActionPage(QWidget):
     def __init__(self, browser_actions):
         super().__init__()
         self.browser_actions = browser_actions  # Use the shared actions instance
+        self.registry_generation = None
         self.init_ui()
     
     def init_ui(self):
@@ -325,6 +618,8 @@ class BrowserActionPage(QWidget):
         self.url_input = QLineEdit()
         self.url_input.setPlaceholderText("Enter URL (e.g., https://office.com)")
         self.url_input.setText("https://office.com")
+        # Suggestions from browser history and earlier launches
+        self.url_completer = HistoryCompleter(self.url_input)
         url_layout.addWidget(self.url_input)
         
         # Open button
@@ -334,14 +629,27 @@ class BrowserActionPage(QWidget):
         
         layout.addLayout(url_layout)
         
-        # Browser buttons container
-        self.browser_container = QWidget()
-        self.browser_layout = QVBoxLayout(self.browser_container)
-        layout.addWidget(self.browser_container)
+        # Browser list with an "Open" button painted on each row
+        self.browser_list = BrowserListWidget(BrowserCardDelegate.ACTION_MODE, STATUS_COLORS, STATUS_LABELS)
+        self.browser_list.button_clicked.connect(self.open_in_browser)
+        # Right click a row to open the URL in one of the browser's profiles
+        self.browser_list.view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.browser_list.view.customContextMenuRequested.connect(self.show_profile_menu)
+        layout.addWidget(self.browser_list)
         
         # Add browser buttons
         self.update_browser_buttons()
         
+        # Open a list of URLs in several browsers at once
+        fan_out_btn = QPushButton("Open URLs in Multiple Browsers")
+        fan_out_btn.clicked.connect(self.open_fan_out)
+        layout.addWidget(fan_out_btn)
+        
+        # Launches and terminations recorded in the audit journal
+        activity_btn = QPushButton("Recent Activity")
+        activity_btn.clicked.connect(self.show_activity)
+        layout.addWidget(activity_btn)
+        
         # Add custom browser button
         add_browser_btn = QPushButton("Add Custom Browser")
         add_browser_btn.clicked.connect(self.add_custom_browser)
@@ -349,18 +657,20 @@ class BrowserActionPage(QWidget):
         
         layout.addStretch()
     
+    @profiler.traced('ui')
     def update_browser_buttons(self):
-        # Clear existing buttons
-        while self.browser_layout.count():
-            item = self.browser_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
-        # Add buttons for each browser
-        for browser in self.browser_actions.detector.browser_paths.keys(): # Get paths from the shared detector
-            btn = QPushButton(f"Open in {browser}")
-            btn.clicked.connect(lambda checked, b=browser: self.open_in_browser(b))
-            self.browser_layout.addWidget(btn)
+        # One row per browser, taken from the shared registry
+        snapshot = self.browser_actions.registry.current()
+        self.browser_list.model.set_browsers(list(snapshot.browser_paths), browser_descriptions(snapshot))
+        self.browser_list.set_icons(get_icon_cache(), snapshot.browser_paths)
+        self.registry_generation = snapshot.generation
+    
+    @profiler.traced('ui')
+    def update_statuses(self, results):
+        """Show the latest detection results so rows can be filtered by status"""
+        if self.browser_actions.registry.current().generation != self.registry_generation:
+            self.update_browser_buttons()
+        self.browser_list.model.set_statuses(results)
     
     def add_custom_browser(self):
         dialog = AddBrowserDialog(self)
@@ -369,12 +679,21 @@ class BrowserActionPage(QWidget):
             if browser_info['name'] and browser_info['path']:
                 self.browser_actions.add_custom_browser(browser_info)
                 self.update_browser_buttons()
+                self.window().probe_versions()
                 QMessageBox.information(self, "Success", f"Added {browser_info['name']} successfully!")
                 # Trigger a refresh on the detection page to show the new browser
-                self.parent().parent().detection_page.refresh_detection() # Access the detection page from parent
+                self.window().detection_page.refresh_detection()
             else:
                 QMessageBox.warning(self, "Error", "Please provide both browser name and path!")
     
+    def show_activity(self):
+        dialog = ActivityDialog(list(self.browser_actions.registry.current().browser_paths), self)
+        dialog.exec_()
+    
+    def open_fan_out(self):
+        dialog = FanOutDialog(self.browser_actions, [self.url_input.text().strip()], self)
+        dialog.exec_()
+    
     def open_url(self):
         url = self.url_input.text().strip()
         if not url:
@@ -393,6 +712,11 @@ class BrowserActionPage(QWidget):
             )
             
             if reply == QMessageBox.Yes:
+                # Reload the existing tab in place when Chrome exposes a DevTools endpoint
+                if devtools.open_url('Chrome', url, reuse_existing=True):
+                    get_journal().record(EVENT_LAUNCH, 'Chrome', url, method='reload')
+                    return
+                
                 # Close existing window
                 try:
                     windows = gw.getAllWindows()
@@ -407,7 +731,7 @@ class BrowserActionPage(QWidget):
         if not success:
             QMessageBox.warning(self, "Error", message)
     
-    def open_in_browser(self, browser_name):
+    def open_in_browser(self, browser_name, profile=None):
         url = self.url_input.text().strip()
         if not url:
             QMessageBox.warning(self, "Error", "Please enter a URL")
@@ -416,12 +740,171 @@ class BrowserActionPage(QWidget):
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        success, message = self.browser_actions.open_url_in_browser(browser_name, url)
+        success, message = self.browser_actions.open_url_in_browser(browser_name, url, profile)
         if not success:
             QMessageBox.warning(self, "Error", message)
+    
+    def show_profile_menu(self, position):
+        index = self.browser_list.view.indexAt(position)
+        if not index.isValid():
+            return
+        browser_name = index.data(Qt.DisplayRole)
+        menu = QMenu(self)
+        menu.addAction("Open URL", lambda: self.open_in_browser(browser_name))
+        profiles = self.browser_actions.profiles(browser_name)
+        if profiles:
+            profile_menu = menu.addMenu("Open URL in Profile")
+            for profile in profiles:
+                label = f"{profile.name} (default)" if profile.default else profile.name
+                profile_menu.addAction(label, lambda key=profile.key: self.open_in_browser(browser_name, key))
+        menu.exec_(self.browser_list.view.viewport().mapToGlobal(position))
 
-class BrowserManagerApp(QMainWindow):
+class FleetBridge(QObject):
+    """Carries aggregator callbacks from its thread to the GUI thread"""
+    host_updated = pyqtSignal(str, dict, bool)  # host, statuses, full table
+    command_finished = pyqtSignal(str, int, bool, str)  # host, command id, success, message
+
+class FleetPage(QWidget):
+    """Browser status of every host reporting to the fleet aggregator"""
+    SEPARATOR = " / "
+    
+    def __init__(self, port, bind=fleet.DEFAULT_BIND):
+        super().__init__()
+        self.bridge = FleetBridge()
+        self.aggregator = fleet.FleetAggregator(port, bind, on_update=self.bridge.host_updated.emit,
+                                                on_result=self.bridge.command_finished.emit)
+        self.pending = {}  # Row updates waiting for the next flush
+        self.hosts = set()
+        self.init_ui()
+        self.bridge.host_updated.connect(self.queue_update)
+        self.bridge.command_finished.connect(self.show_result)
+        
+        # Apply updates from many hosts in one model update per flush
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(250)
+        self.flush_timer.timeout.connect(self.flush_updates)
+        self.aggregator.start()
+        self.update_summary()
+    
+    def init_ui(self):
+        layout = QVBoxLayout(self)
+        
+        title = QLabel("Fleet")
+        title.setStyleSheet("font-size: 18px; font-weight: bold; margin-bottom: 20px;")
+        layout.addWidget(title)
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+        if self.aggregator.secret_generated:
+            # Agents cannot connect without it
+            secret_label = QLabel(f"Agents must set {fleet.SECRET_ENV_VAR}={self.aggregator.secret}")
+            secret_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            layout.addWidget(secret_label)
+        
+        url_layout = QHBoxLayout()
+        self.url_input = QLineEdit()
+        self.url_input.setPlaceholderText("URL to open on the selected host")
+        self.url_input.setText("https://office.com")
+        url_layout.addWidget(self.url_input)
+        layout.addLayout(url_layout)
+        
+        # One row per host and browser; right click for more actions
+        self.browser_list = BrowserListWidget(BrowserCardDelegate.ACTION_MODE, FLEET_STATUS_COLORS,
+                                              FLEET_STATUS_LABELS)
+        self.browser_list.button_clicked.connect(self.open_on_host)
+        view = self.browser_list.view
+        view.setContextMenuPolicy(Qt.CustomContextMenu)
+        view.customContextMenuRequested.connect(self.show_row_menu)
+        layout.addWidget(self.browser_list)
+        
+        self.result_label = QLabel()
+        layout.addWidget(self.result_label)
+    
+    def queue_update(self, host, statuses, full):
+        self.hosts.add(host)
+        for browser, status in statuses.items():
+            if status is not None:
+                self.pending[host + self.SEPARATOR + browser] = status
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+    
+    @profiler.traced('ui')
+    def flush_updates(self):
+        pending, self.pending = self.pending, {}
+        self.browser_list.model.set_statuses(pending)
+        self.update_summary()
+    
+    def update_summary(self):
+        online = sum(1 for statuses in self.aggregator.hosts().values()
+                     if any(status != fleet.STATUS_OFFLINE for status in statuses.values()))
+        self.summary_label.setText(f"Listening on {self.aggregator.bind}:{self.aggregator.port}, "
+                                   f"{online} of {len(self.hosts)} hosts online")
+    
+    def split_row(self, row_name):
+        host, _, browser = row_name.partition(self.SEPARATOR)
+        return host, browser
+    
+    def open_on_host(self, row_name):
+        url = normalize_url(self.url_input.text())
+        if not url:
+            QMessageBox.warning(self, "Error", "Please enter a URL")
+            return
+        host, browser = self.split_row(row_name)
+        self.aggregator.send_command(host, fleet.ACTION_OPEN, browser, url)
+        self.result_label.setText(f"Opening {url} in {browser} on {host}...")
+    
+    def close_on_host(self, row_name):
+        host, browser = self.split_row(row_name)
+        self.aggregator.send_command(host, fleet.ACTION_CLOSE, browser)
+        self.result_label.setText(f"Closing {browser} on {host}...")
+    
+    def show_row_menu(self, position):
+        index = self.browser_list.view.indexAt(position)
+        if not index.isValid():
+            return
+        row_name = index.data(Qt.DisplayRole)
+        menu = QMenu(self)
+        menu.addAction("Open URL", lambda: self.open_on_host(row_name))
+        menu.addAction("Close Browser", lambda: self.close_on_host(row_name))
+        menu.exec_(self.browser_list.view.viewport().mapToGlobal(position))
+    
+    def show_result(self, host, command_id, success, message):
+        self.result_label.setText(message if success else f"Failed: {message}")
+    
+    def shutdown(self):
+        self.aggregator.stop()
+
+class IdleMonitor:
+    """CPU and RSS of this process while it idles in the tray"""
+    
     def __init__(self):
+        self.process = psutil.Process()
+        self.reset()
+    
+    def reset(self):
+        times = self.process.cpu_times()
+        self.started = time.monotonic()
+        self.cpu_started = times.user + times.system
+    
+    def sample(self):
+        """Return (average CPU percent since reset, RSS in MB)"""
+        times = self.process.cpu_times()
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        cpu = (times.user + times.system - self.cpu_started) / elapsed * 100
+        return cpu, self.process.memory_info().rss / (1024 * 1024)
+    
+    def check(self):
+        cpu, rss = self.sample()
+        if cpu > IDLE_CPU_BUDGET or rss > IDLE_RSS_BUDGET_MB:
+            logging.getLogger('browser_manager.idle').warning(
+                "idle footprint over budget: %.2f%% CPU (budget %.2f%%), %.0f MB RSS (budget %d MB)",
+                cpu, IDLE_CPU_BUDGET, rss, IDLE_RSS_BUDGET_MB)
+        return cpu, rss
+
+class BrowserManagerApp(QMainWindow):
+    versions_probed = pyqtSignal(object)  # RegistrySnapshot with the versions read on the worker
+    
+    def __init__(self, fleet_port=None, start_in_tray=False, fleet_bind=fleet.DEFAULT_BIND):
         super().__init__()
         self.setWindowTitle("Browser Manager")
         self.setMinimumSize(800, 300)  # Set minimum size instead of fixed size
@@ -437,20 +920,42 @@ class BrowserManagerApp(QMainWindow):
         layout = QVBoxLayout(central_widget)
         
         # Create shared instances
-        self.detector = BrowserDetector()
+        self.registry = BrowserRegistry()
+        self.detector = BrowserDetector(self.registry)
         self.browser_actions = BrowserActions(self.detector)
+        
+        # Last results, kept while the pages are torn down in the tray
+        self.statuses = {}
+        self.detector.browser_detected.connect(self.remember_status)
+        self.detector.detection_complete.connect(self.on_detection_complete)
+        self.versions_probed.connect(self.on_versions_probed)
+        
+        # Periodic detection, slowed down while idling in the tray
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self.detector.start)
+        
+        # Tray mode: pages released, slow polling, summary in the tray icon
+        self.idle = False
+        self.idle_monitor = None
+        self.tray = None
 
         # Create stacked widget for pages
         self.stacked_widget = QStackedWidget()
         layout.addWidget(self.stacked_widget)
         
-        # Create pages, passing shared instances
-        self.detection_page = BrowserDetectionPage(self.detector)
-        self.action_page = BrowserActionPage(self.browser_actions)
+        # Create the detection page now unless starting in the tray; the action
+        # page is built on first navigation
+        self.detection_page = None
+        self.action_page = None
+        self.enforcer = None
+        if not start_in_tray:
+            self.ensure_detection_page()
         
-        # Add pages to stacked widget
-        self.stacked_widget.addWidget(self.detection_page)
-        self.stacked_widget.addWidget(self.action_page)
+        # Hosts reporting through fleet agents, only when running as an aggregator
+        self.fleet_page = FleetPage(fleet_port, fleet_bind) if fleet_port is not None else None
+        if self.fleet_page is not None:
+            self.stacked_widget.addWidget(self.fleet_page)
         
         # Create navigation buttons
         nav_layout = QHBoxLayout()
@@ -466,6 +971,13 @@ class BrowserManagerApp(QMainWindow):
         
         nav_layout.addWidget(self.detection_btn)
         nav_layout.addWidget(self.action_btn)
+        
+        self.fleet_btn = None
+        if self.fleet_page is not None:
+            self.fleet_btn = QPushButton("Fleet")
+            self.fleet_btn.setCheckable(True)
+            self.fleet_btn.clicked.connect(lambda: self.switch_page(2))
+            nav_layout.addWidget(self.fleet_btn)
         layout.addLayout(nav_layout)
         
         # Apply styles
@@ -532,14 +1044,198 @@ class BrowserManagerApp(QMainWindow):
         self.detection_btn.setStyleSheet(nav_style)
         self.action_btn.setStyleSheet(nav_style)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        startup_timeline.mark("window shown")
+        # Defer discovery and the first scan until the event loop is running
+        QTimer.singleShot(0, self.start_background_work)
+    
+    def closeEvent(self, event):
+        # Cancel a scan in progress instead of waiting for it to finish
+        self.poll_timer.stop()
+        if self.tray is not None:
+            self.tray.hide()
+        self.detector.stop()
+        self.detector.wait()
+        if self.fleet_page is not None:
+            self.fleet_page.shutdown()
+        if self.enforcer is not None:
+            self.enforcer.stop()
+        get_history_index().stop()
+        super().closeEvent(event)
+    
+    def start_background_work(self):
+        if self.registry.current().generation:
+            return  # Already started, e.g. the window was hidden and shown again
+        # Versions come from the cache here; changed executables are read on a worker
+        self.registry.discover(probe=False)
+        startup_timeline.mark("discovery done")
+        self.probe_versions()
+        # Enforce policies.json in the background when it has rules, on the detector's cycles
+        self.enforcer = policy_engine.start_enforcer(self.registry, tab_inventory=self.detector.tab_inventory,
+                                                     fed=True)
+        if self.enforcer is not None:
+            self.detector.extra_attrs = self.enforcer.attrs
+            self.detector.cycle_listeners.append(self.enforcer.feed)
+        self.detector.start()
+        self.poll_timer.start()
+        # Copy and index the browsers' history databases for URL suggestions
+        get_history_index().start()
+    
+    def ensure_detection_page(self):
+        """Build the detection page, filled from the last results if there are any"""
+        if self.detection_page is None:
+            self.detection_page = BrowserDetectionPage(self.detector)
+            self.stacked_widget.insertWidget(0, self.detection_page)
+            if self.statuses:
+                self.detection_page.show_statuses(self.statuses)
+        return self.detection_page
+    
+    def ensure_action_page(self):
+        """Build the action page the first time it is needed"""
+        if self.action_page is None:
+            self.action_page = BrowserActionPage(self.browser_actions)
+            self.detector.detection_complete.connect(self.action_page.update_statuses)
+            self.stacked_widget.addWidget(self.action_page)
+            if self.statuses:
+                self.action_page.update_statuses(self.statuses)
+        return self.action_page
+    
     def switch_page(self, index):
         """Switch between pages"""
-        self.stacked_widget.setCurrentIndex(index)
+        pages = [None, None, self.fleet_page]
+        if index == 0:
+            pages[0] = self.ensure_detection_page()
+        elif index == 1:
+            pages[1] = self.ensure_action_page()
+        self.stacked_widget.setCurrentWidget(pages[index])
         self.detection_btn.setChecked(index == 0)
         self.action_btn.setChecked(index == 1)
+        if self.fleet_btn is not None:
+            self.fleet_btn.setChecked(index == 2)
+    
+    def probe_versions(self):
+        self.registry.start_version_probe(self.versions_probed.emit)
+    
+    def on_versions_probed(self, snapshot):
+        """Show versions read by the probe; pages rebuilt later pick them up from the registry"""
+        if self.detection_page is not None:
+            self.detection_page.sync_rows()
+        if self.action_page is not None and self.action_page.registry_generation != snapshot.generation:
+            self.action_page.update_browser_buttons()
+    
+    def remember_status(self, browser, status):
+        self.statuses[browser] = status
+    
+    def on_detection_complete(self, results):
+        self.statuses.update(results)
+        if self.idle:
+            self.update_tray_summary()
+            self.idle_monitor.check()
+    
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            # Let the state change finish before pages are torn down or rebuilt
+            if self.isMinimized() and not self.idle:
+                QTimer.singleShot(0, self.enter_idle)
+            elif not self.isMinimized() and self.idle and self.isVisible():
+                QTimer.singleShot(0, self.leave_idle)
+    
+    def enter_idle(self):
+        """Release the pages and poll slowly until the window is restored"""
+        if self.idle:
+            return
+        self.idle = True
+        self.release_pages()
+        self.poll_timer.setInterval(TRAY_POLL_INTERVAL)
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            self.ensure_tray().show()
+            self.update_tray_summary()
+            self.hide()
+        elif not self.isMinimized():
+            self.showMinimized()  # Without a tray the taskbar entry restores the window
+        self.idle_monitor = self.idle_monitor or IdleMonitor()
+        self.idle_monitor.reset()
+    
+    def leave_idle(self):
+        """Rebuild the pages from the last results and resume normal polling"""
+        if not self.idle:
+            return
+        self.idle = False
+        if self.idle_monitor is not None:
+            cpu, rss = self.idle_monitor.sample()
+            logging.getLogger('browser_manager.idle').info("left tray mode: %.2f%% CPU, %.0f MB RSS", cpu, rss)
+        self.switch_page(0)
+        if self.tray is not None:
+            self.tray.hide()
+        self.showNormal()
+        self.activateWindow()
+        self.poll_timer.setInterval(POLL_INTERVAL)
+        self.detector.start()  # Replace the cached results with fresh ones
+    
+    def release_pages(self):
+        """Delete the detection and action pages and the icon pixmaps they used"""
+        for page in (self.detection_page, self.action_page):
+            if page is not None:
+                self.stacked_widget.removeWidget(page)
+                page.deleteLater()
+        self.detection_page = None
+        self.action_page = None
+        release_icon_cache()
+    
+    def ensure_tray(self):
+        if self.tray is None:
+            self.tray = QSystemTrayIcon(self)
+            menu = QMenu(self)
+            menu.addAction("Show Browser Manager", self.leave_idle)
+            menu.addAction("Refresh Now", self.detector.start)
+            menu.addSeparator()
+            menu.addAction("Quit", self.quit_from_tray)
+            self.tray.setContextMenu(menu)
+            self.tray.activated.connect(
+                lambda reason: self.leave_idle() if reason == QSystemTrayIcon.Trigger else None)
+        return self.tray
+    
+    def update_tray_summary(self):
+        """Show the running browsers in the tray tooltip and a status dot on the icon"""
+        if self.tray is None:
+            return
+        running = sorted(browser for browser, status in self.statuses.items() if status == status_key(True))
+        if running:
+            self.tray.setToolTip(f"Browser Manager: {len(running)} running ({', '.join(running)})")
+        else:
+            self.tray.setToolTip("Browser Manager: no browsers running")
+        pixmap = self.windowIcon().pixmap(32, 32)
+        if pixmap.isNull():
+            pixmap = QPixmap(32, 32)
+            pixmap.fill(QColor('#0078D7'))
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(STATUS_COLORS[status_key(bool(running))]))
+        painter.drawEllipse(18, 18, 13, 13)
+        painter.end()
+        self.tray.setIcon(QIcon(pixmap))
+    
+    def quit_from_tray(self):
+        self.close()
+        QApplication.quit()
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    startup_timeline.mark("modules imported")
+    argv = profiler.configure_from_args(sys.argv)
+    argv = process_trace.configure_from_args(argv)
+    fleet_options, argv = fleet.options_from_args(argv)
+    start_in_tray = '--tray' in argv
+    argv = [arg for arg in argv if arg != '--tray']
+    if fleet_options.agent:
+        # Headless: report this host to an aggregator instead of showing a window
+        sys.exit(fleet.run_agent(fleet_options))
+    app = QApplication(argv)
+    if profiler.enabled():
+        app.aboutToQuit.connect(profiler.export_chrome_trace)
     
     # Set application-wide icon
     icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logo.ico")
@@ -547,6 +1243,21 @@ if __name__ == "__main__":
         app_icon = QIcon(icon_path)
         app.setWindowIcon(app_icon)
     
-    window = BrowserManagerApp()
-    window.show()
+    window = BrowserManagerApp(fleet_options.aggregator, start_in_tray, fleet_options.aggregator_bind)
+    startup_timeline.mark("window constructed")
+    if start_in_tray:
+        # No pages are built until the window is first restored
+        window.start_background_work()
+        window.enter_idle()
+    else:
+        window.show()
+    report_path = startup_timeline.report_path()
+    if report_path:
+        # Startup benchmark: quit as soon as the event loop is running
+        def report_and_quit():
+            startup_timeline.mark("event loop running")
+            startup_timeline.write_report(report_path)
+            window.close()
+            app.quit()
+        QTimer.singleShot(0, report_and_quit)
     sys.exit(app.exec_()) 
\ No newline at end of file
@@ -0,0 +1,296 @@
+"""Audit journal of URL launches, private-mode launches and terminations.
+
+record() never touches the disk: it adds the event to an in-memory index
+and hands it to a background writer thread, which batches events and
+appends them to an NDJSON file (one compact JSON object per line). When
+the file would grow past max_bytes it is rotated to .1, .2, ... keeping
+`backups` old files.
+
+The writer thread rebuilds the index from the journal files when the
+journal starts, after which query() answers by time range, browser and URL
+without reading any file. The index only holds the events of the files
+kept on disk: when a rotation deletes the oldest file, its events are
+dropped from the index as well.
+
+    journal = get_journal()
+    journal.record(EVENT_LAUNCH, 'Firefox', 'https://office.com', private=True)
+    journal.query(browser='Firefox', url='office.com', since=time.time() - 3600)
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import browser_locations
+from tab_inventory import normalize_url, normalize_host
+
+logger = logging.getLogger('browser_manager.audit')
+
+JOURNAL_FILE = 'audit_journal.ndjson'
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 3
+FLUSH_INTERVAL = 1.0  # Seconds an event may wait in memory before it is written
+BATCH_SIZE = 200
+
+EVENT_LAUNCH = 'launch'
+EVENT_TERMINATE = 'terminate'
+EVENT_CLOSE_TABS = 'close_tabs'
+
+_STOP = object()
+
+
+def _contains(positions, position):
+    """Whether a sorted posting list holds position"""
+    i = bisect.bisect_left(positions, position)
+    return i < len(positions) and positions[i] == position
+
+
+class AuditIndex:
+    """Events in time order plus browser, URL and host postings.
+
+    Positions count every event ever added, so the sorted posting lists stay
+    valid when the oldest events are dropped; base is the position of
+    events[0].
+    """
+
+    def __init__(self):
+        self.base = 0
+        self.events = []
+        self.times = []
+        self.by_browser = {}
+        self.by_url = {}
+        self.by_host = {}
+
+    def __len__(self):
+        return len(self.events)
+
+    def event(self, position):
+        return self.events[position - self.base]
+
+    def add(self, event):
+        position = self.base + len(self.events)
+        if self.times and event['ts'] < self.times[-1]:
+            # Clock went backwards; keep times sorted for bisect
+            event = dict(event, ts=self.times[-1])
+        self.events.append(event)
+        self.times.append(event['ts'])
+        if event.get('browser'):
+            self.by_browser.setdefault(event['browser'], []).append(position)
+        if event.get('url'):
+            self.by_url.setdefault(normalize_url(event['url']), []).append(position)
+            self.by_host.setdefault(normalize_host(event['url']), []).append(position)
+
+    def drop(self, count):
+        """Forget the oldest count events"""
+        count = min(count, len(self.events))
+        if count <= 0:
+            return
+        del self.events[:count]
+        del self.times[:count]
+        self.base += count
+        for postings in (self.by_browser, self.by_url, self.by_host):
+            for key in list(postings):
+                positions = postings[key]
+                stale = bisect.bisect_left(positions, self.base)
+                if stale == len(positions):
+                    del postings[key]
+                elif stale:
+                    del positions[:stale]
+
+    def positions(self, browser=None, url=None):
+        """Smallest posting list matching the key filters, or None for all events"""
+        postings = []
+        if browser:
+            postings.append(self.by_browser.get(browser_locations.canonical_name(browser), []))
+        if url:
+            # A bare host matches every URL on that host
+            if '/' in url.split('://', 1)[-1].rstrip('/'):
+                postings.append(self.by_url.get(normalize_url(url), []))
+            else:
+                postings.append(self.by_host.get(normalize_host(url), []))
+        if not postings:
+            return None
+        postings.sort(key=len)
+        first, others = postings[0], postings[1:]
+        return [pos for pos in first if all(_contains(other, pos) for other in others)]
+
+
+class AuditJournal:
+    """Buffered NDJSON journal with an in-memory query index"""
+
+    def __init__(self, path=None, max_bytes=MAX_BYTES, backups=BACKUPS,
+                 flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE):
+        self.path = path or browser_locations.data_path(JOURNAL_FILE)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._index = AuditIndex()
+        self._file_counts = []  # Events in each journal file, oldest first; only used by the writer
+        self._writer = threading.Thread(target=self._run, name='audit-journal', daemon=True)
+        self._writer.start()
+
+    def record(self, event_type, browser, url=None, private=False, **details):
+        """Add an event; returns immediately, the write happens in the background"""
+        event = {'ts': time.time(), 'event': event_type,
+                 'browser': browser_locations.canonical_name(browser) if browser else None}
+        if url:
+            event['url'] = url
+        if private:
+            event['private'] = True
+        event.update(details)
+        with self._lock:
+            self._index.add(event)
+        self._queue.put(event)
+        return event
+
+    def query(self, since=None, until=None, browser=None, url=None, event_type=None, limit=None):
+        """Return matching events, newest first"""
+        with self._lock:
+            index = self._index
+            lo = bisect.bisect_left(index.times, since) if since is not None else 0
+            hi = bisect.bisect_right(index.times, until) if until is not None else len(index.times)
+            lo, hi = lo + index.base, hi + index.base
+            positions = index.positions(browser, url)
+            if positions is None:
+                candidates = range(hi - 1, lo - 1, -1)
+            else:
+                start, end = bisect.bisect_left(positions, lo), bisect.bisect_left(positions, hi)
+                candidates = reversed(positions[start:end])
+            results = []
+            for position in candidates:
+                event = index.event(position)
+                if event_type and event['event'] != event_type:
+                    continue
+                results.append(event)
+                if limit and len(results) >= limit:
+                    break
+            return results
+
+    def recent(self, limit=100):
+        return self.query(limit=limit)
+
+    def flush(self, timeout=5.0):
+        """Block until every recorded event has been written"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(5.0)
+
+    def _files(self):
+        """Journal files, oldest first"""
+        names = [f"{self.path}.{n}" for n in range(self.backups, 0, -1)] + [self.path]
+        return [name for name in names if os.path.exists(name)]
+
+    def _load(self):
+        """Index the journal files, then the events recorded while they were read"""
+        loaded = AuditIndex()
+        counts = []
+        files = self._files()
+        for name in files:
+            before = len(loaded)
+            try:
+                with open(name, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            loaded.add(json.loads(line))
+                        except (ValueError, KeyError, TypeError):
+                            continue  # Torn last line after a crash
+            except OSError as e:
+                logger.warning("could not read audit journal %s: %s", name, e)
+            counts.append(len(loaded) - before)
+        if self.path not in files:
+            counts.append(0)
+        self._file_counts = counts
+        with self._lock:
+            for event in self._index.events:
+                loaded.add(event)
+            self._index = loaded
+
+    def _run(self):
+        self._load()
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            # Pick up whatever arrived while the batch was filling
+            while not stopping:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(event, separators=(',', ':')) + '\n' for event in batch).encode('utf-8')
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            with open(self.path, 'ab') as f:
+                f.write(data)
+        except OSError as e:
+            logger.warning("could not write audit journal %s: %s", self.path, e)
+        # Counted even when the write failed, so the index stays bounded
+        self._file_counts[-1] += len(batch)
+
+    def _rotate(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"):
+                os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        # The current file became .1; whatever is older than .<backups> is gone
+        kept = self._file_counts[-self.backups:] if self.backups else []
+        dropped = sum(self._file_counts) - sum(kept)
+        self._file_counts = kept + [0]
+        with self._lock:
+            self._index.drop(dropped)
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Return the shared journal, starting it on first use"""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = AuditJournal()
+            atexit.register(_journal.close)
+        return _journal
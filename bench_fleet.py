@@ -0,0 +1,118 @@
+"""Run several local agent processes against one aggregator.
+
+Each agent is a `fleet.py agent` process running real detection on this
+machine under its own host name, standing in for a lab machine. For every
+host count the aggregator (in this process) waits until all agents have
+reported, then measures its own CPU use and the status changes it received over
+--seconds, and checks a command round trip to every host. Exits with
+status 1 when a host never reported or a command got no answer:
+
+    python bench_fleet.py [--hosts 1,4,16] [--seconds 10] [--interval 1]
+"""
+import argparse
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import browser_locations
+import fleet
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def wait_for(predicate, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+class Counter:
+    """Counts aggregator callbacks from its thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.updates = 0
+        self.results = {}  # command id -> (host, ok, message)
+
+    def on_update(self, host, statuses, full):
+        with self.lock:
+            self.updates += 1
+
+    def on_result(self, host, command_id, ok, message):
+        with self.lock:
+            self.results[command_id] = (host, ok, message)
+
+
+def bench(count, seconds, interval, directory):
+    counter = Counter()
+    secret = secrets.token_urlsafe(16)
+    aggregator = fleet.FleetAggregator(0, on_update=counter.on_update, on_result=counter.on_result,
+                                       secret=secret).start()
+    env = dict(os.environ, **{fleet.SECRET_ENV_VAR: secret, browser_locations.DATA_DIR_ENV_VAR: directory})
+    names = [f'sim-{n:03}' for n in range(count)]
+    agents = [subprocess.Popen([sys.executable, os.path.join(HERE, 'fleet.py'), 'agent',
+                                '--connect', f'127.0.0.1:{aggregator.port}', '--name', name,
+                                '--interval', str(interval)],
+                               cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+              for name in names]
+    try:
+        started = time.perf_counter()
+        reported = wait_for(lambda: len(aggregator.hosts()) == count, 30 + count)
+        connect_s = time.perf_counter() - started
+
+        with counter.lock:
+            updates_before = counter.updates
+        cpu_before = time.process_time()
+        time.sleep(seconds)
+        cpu = (time.process_time() - cpu_before) / seconds * 100
+        with counter.lock:
+            updates = counter.updates - updates_before
+
+        # A close for a browser no host has installed answers without side effects
+        commands = {aggregator.send_command(name, fleet.ACTION_CLOSE, 'Not A Browser'): name for name in names}
+        answered = wait_for(lambda: set(commands) <= set(counter.results), 10 + count)
+        missing_answers = [commands[i] for i in commands if i not in counter.results]
+        return {'hosts': count, 'reported': len(aggregator.hosts()), 'connect_s': connect_s, 'cpu': cpu,
+                'updates_per_s': updates / seconds, 'ok': reported and answered,
+                'missing_answers': missing_answers}
+    finally:
+        for agent in agents:
+            agent.terminate()
+        for agent in agents:
+            try:
+                agent.wait(5)
+            except subprocess.TimeoutExpired:
+                agent.kill()
+        aggregator.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', default='1,4,16', help="comma separated agent counts")
+    parser.add_argument('--seconds', type=float, default=10.0, help="measuring window per count")
+    parser.add_argument('--interval', type=float, default=1.0, help="agent detection interval")
+    args = parser.parse_args()
+
+    print(f"{'hosts':>6} {'reported':>9} {'connect s':>10} {'CPU %':>7} {'updates/s':>10}")
+    failed = False
+    for count in (int(value) for value in args.hosts.split(',')):
+        with tempfile.TemporaryDirectory() as directory:  # Keep the agents' data files out of the user's
+            row = bench(count, args.seconds, args.interval, directory)
+        print(f"{row['hosts']:>6} {row['reported']:>9} {row['connect_s']:>10.2f} {row['cpu']:>7.2f} "
+              f"{row['updates_per_s']:>10.1f}", flush=True)
+        if row['missing_answers']:
+            print(f"       no command answer from {', '.join(row['missing_answers'])}")
+        failed = failed or not row['ok']
+    print("CPU % is the aggregator's CPU time over the window; updates/s counts status changes, not heartbeats")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
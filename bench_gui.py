@@ -0,0 +1,201 @@
+"""Benchmark GUI status updates with synthetic browser lists.
+
+Runs headless (QT_QPA_PLATFORM=offscreen) and drives the update paths of
+both frontends with 10, 100 and 1000 synthetic browsers:
+
+    app-detection      app.BrowserDetectionPage.update_browser_status
+    modern-detection   browser_manager_modern.BrowserDetectionPage.update_browser_status
+    modern-streaming   per-browser update_single_status (what used to be card updates)
+    theme-switch       BrowserListWidget.set_dark_mode on both list styles
+    app-action-rows    app.BrowserActionPage.update_browser_buttons
+
+For every update it measures the wall time until the window has been
+repainted, the event-loop latency (how long a zero-delay timer posted right
+after the update waits) and the number of widgets and QObjects the page owns.
+Medians are written to bench_gui_results.json, which is not tracked, so
+later runs can be compared; the tracked baseline is only replaced on
+purpose with --output bench_gui_baseline.json:
+
+    python bench_gui.py [--sizes 10 100 1000] [--rounds N] [--output FILE]
+    python bench_gui.py --compare bench_gui_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QEventLoop, QObject, QTimer, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtWidgets import QApplication, QWidget
+
+import browser_locations
+
+DEFAULT_OUTPUT = 'bench_gui_results.json'
+
+
+def event_loop_latency():
+    """Milliseconds a zero-delay timer waits before the event loop runs it"""
+    loop = QEventLoop()
+    fired = []
+    start = time.perf_counter()
+    QTimer.singleShot(0, lambda: (fired.append(time.perf_counter()), loop.quit()))
+    loop.exec_()
+    return (fired[0] - start) * 1000
+
+
+def object_counts(root):
+    """Widgets and QObjects owned by root, root included"""
+    return len(root.findChildren(QWidget)) + 1, len(root.findChildren(QObject)) + 1
+
+
+def measure(app, root, update, rounds):
+    """Run update() rounds times; return median wall time, latency and final object counts"""
+    wall, latency = [], []
+    for i in range(rounds):
+        start = time.perf_counter()
+        update(i)
+        latency.append(event_loop_latency())
+        root.repaint()  # Force the paint the update scheduled
+        app.processEvents()
+        wall.append((time.perf_counter() - start) * 1000)
+    widgets, objects = object_counts(root)
+    return {
+        'wall_ms': statistics.median(wall),
+        'latency_ms': statistics.median(latency),
+        'widgets': widgets,
+        'objects': objects
+    }
+
+
+def synthetic_registry(size, directory):
+    """A BrowserRegistry holding size custom browsers"""
+    from browser_registry import BrowserRegistry
+    config_path = os.path.join(directory, f'browsers_{size}.json')
+    with open(config_path, 'w') as f:
+        json.dump({f"Browser {i:04d}": {'path': f"/nonexistent/browser{i}", 'incognito_flag': '--private'}
+                   for i in range(size)}, f)
+    registry = BrowserRegistry(config_path)
+    registry.discover()
+    return registry
+
+
+def show(page):
+    page.resize(800, 600)
+    page.show()
+    QApplication.processEvents()
+    return page
+
+
+def bench_app(app, size, rounds, directory):
+    import app as classic
+    registry = synthetic_registry(size, directory)
+    browsers = list(registry.current().browser_paths)
+    detector = classic.BrowserDetector(registry)
+    results = {}
+
+    page = show(classic.BrowserDetectionPage(detector))
+    statuses = ('running', 'not_running')
+    results['app-detection'] = measure(app, page, lambda i: page.update_browser_status(
+        {name: statuses[(i + n) % 2] for n, name in enumerate(browsers)}), rounds)
+    results['theme-switch-app'] = measure(
+        app, page, lambda i: page.browser_list.set_dark_mode(i % 2 == 0), rounds)
+    page.close()
+
+    action_page = show(classic.BrowserActionPage(classic.BrowserActions(detector)))
+    results['app-action-rows'] = measure(app, action_page, lambda i: action_page.update_browser_buttons(), rounds)
+    action_page.close()
+    return results
+
+
+def bench_modern(app, size, rounds):
+    import browser_manager_modern as modern
+    browsers = [f"Browser {i:04d}" for i in range(size)]
+    page = modern.BrowserDetectionPage()
+    page.browsers = browsers
+    page.browser_list.model.set_browsers(browsers)
+    show(page)
+    results = {}
+
+    statuses = ('blue', 'green', 'red')
+    results['modern-detection'] = measure(app, page, lambda i: page.update_browser_status(
+        {name: statuses[(i + n) % 3] for n, name in enumerate(browsers)}), rounds)
+
+    def stream(i):
+        for n, name in enumerate(browsers):
+            page.update_single_status(name, statuses[(i + n) % 3])
+    results['modern-streaming'] = measure(app, page, stream, rounds)
+    results['theme-switch-modern'] = measure(
+        app, page, lambda i: page.browser_list.set_dark_mode(i % 2 == 0), rounds)
+    page.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(results, baseline=None):
+    print(f"{'scenario':<20} {'size':>5} {'wall ms':>9} {'latency ms':>11} {'widgets':>8} {'objects':>8}"
+          + (f" {'wall vs base':>13}" if baseline else ""))
+    base = {(r['scenario'], r['size']): r for r in (baseline or {}).get('results', [])}
+    for r in results:
+        line = (f"{r['scenario']:<20} {r['size']:>5} {r['wall_ms']:>9.2f} {r['latency_ms']:>11.2f}"
+                f" {r['widgets']:>8} {r['objects']:>8}")
+        previous = base.get((r['scenario'], r['size']))
+        if previous:
+            change = (r['wall_ms'] - previous['wall_ms']) / max(previous['wall_ms'], 1e-6) * 100
+            line += f" {change:>+12.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', metavar='BASELINE', help="print changes against an earlier results file")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ[browser_locations.DATA_DIR_ENV_VAR] = directory  # Caches and journal too
+        for size in args.sizes:
+            for scenarios in (bench_app(app, size, args.rounds, directory),
+                              bench_modern(app, size, args.rounds)):
+                for scenario, measured in scenarios.items():
+                    results.append(dict(scenario=scenario, size=size, **measured))
+
+    print_table(results, baseline)
+    with open(args.output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'qpa': os.environ.get('QT_QPA_PLATFORM'),
+            'rounds': args.rounds,
+            'results': results
+        }, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
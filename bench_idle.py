@@ -0,0 +1,74 @@
+"""Measure the app's footprint while it idles in the tray.
+
+Runs headless (QT_QPA_PLATFORM=offscreen): opens the main window, lets the
+first detection finish, then enters tray mode and keeps the event loop
+running for --seconds. Reports average CPU and RSS while idle against
+IDLE_CPU_BUDGET and IDLE_RSS_BUDGET_MB from app.py, plus the object count
+with and without pages and how long restoring the window takes. Exits with
+status 1 when a budget is exceeded:
+
+    python bench_idle.py [--seconds 30]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QEventLoop, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+
+def run_events(seconds):
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    loop.exec_()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=30.0, help="how long to idle")
+    args = parser.parse_args()
+
+    qt_app = QApplication.instance() or QApplication(sys.argv)
+    import app
+
+    window = app.BrowserManagerApp()
+    window.show()
+    run_events(2.0)  # Discovery and the first detection cycle
+    window.switch_page(1)
+    run_events(0.5)
+    monitor = app.IdleMonitor()
+    _, active_rss = monitor.sample()
+    active_objects = len(window.findChildren(QObject))
+
+    window.enter_idle()
+    run_events(0.5)  # Let deleteLater() run
+    gc.collect()
+    idle_objects = len(window.findChildren(QObject))
+    monitor.reset()
+    run_events(args.seconds)
+    idle_cpu, idle_rss = monitor.sample()
+
+    start = time.perf_counter()
+    window.leave_idle()
+    window.repaint()
+    restore_ms = (time.perf_counter() - start) * 1000
+    restored = window.detection_page.browser_list.model.rowCount()
+
+    print(f"{'':<10} {'objects':>8} {'RSS MB':>8} {'CPU %':>7}")
+    print(f"{'active':<10} {active_objects:>8} {active_rss:>8.1f} {'':>7}")
+    print(f"{'idle':<10} {idle_objects:>8} {idle_rss:>8.1f} {idle_cpu:>7.2f}")
+    print(f"restore: {restore_ms:.1f} ms, {restored} rows filled from the cached results")
+    print(f"budget: {app.IDLE_CPU_BUDGET:.2f}% CPU, {app.IDLE_RSS_BUDGET_MB} MB RSS")
+    window.close()
+
+    over = idle_cpu > app.IDLE_CPU_BUDGET or idle_rss > app.IDLE_RSS_BUDGET_MB
+    print("OVER BUDGET" if over else "within budget")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+"""Benchmark process table snapshots of every available process source.
+
+Prints the time per snapshot and the time normalised to 10,000 processes,
+once for a name-only snapshot (what detection needs) and once with cmdline.
+
+    python bench_process_source.py [--rounds N]
+"""
+import argparse
+import sys
+import time
+
+import process_source
+
+
+def available_sources():
+    sources = []
+    if sys.platform.startswith('linux'):
+        sources.append(process_source.ProcfsProcessSource())
+    try:
+        sources.append(process_source.PsutilProcessSource())
+    except ImportError:
+        print("psutil not installed, skipping the psutil backend")
+    return sources
+
+
+def bench(source, attrs, rounds):
+    source.snapshot(attrs)  # Warm up caches
+    best = float('inf')
+    count = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        count = len(source.snapshot(attrs))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    sources = available_sources()
+    print(f"{'source':<8} {'attrs':<18} {'procs':>6} {'ms/snapshot':>12} {'ms/10k procs':>13}")
+    for source in sources:
+        for attrs in ((), ('cmdline',)):
+            best, count = bench(source, attrs, args.rounds)
+            per_10k = best / max(count, 1) * 10000
+            label = ','.join(('name',) + attrs)
+            print(f"{source.name:<8} {label:<18} {count:>6} {best * 1000:>12.2f} {per_10k * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
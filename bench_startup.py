@@ -0,0 +1,164 @@
+"""Benchmark cold launches of the app from source and of built executables.
+
+Every run starts the app with BROWSER_MANAGER_STARTUP_REPORT set, so it
+writes its startup milestones (ms since it was launched) and exits
+as soon as its event loop runs; the wall time until the process has exited
+is measured as well. The first run of a target is reported separately
+since it pays for a cold file cache; the others are summarised by their
+median. For the source tree it also lists the slowest imports of app.py
+from `python -X importtime`.
+
+    python bench_startup.py [--runs N] [--output FILE]
+    python bench_startup.py --exe "dist/Browser Manager/Browser Manager.exe" --compare bench_startup_baseline.json
+
+Results go to bench_startup_results.json, which is not tracked; the
+tracked baseline is only replaced on purpose with
+--output bench_startup_baseline.json.
+
+Runs headless (QT_QPA_PLATFORM=offscreen) unless QT_QPA_PLATFORM is set.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import browser_locations
+
+DEFAULT_OUTPUT = 'bench_startup_results.json'
+HERE = os.path.dirname(os.path.abspath(__file__))
+MILESTONES = ('modules imported', 'window constructed', 'window shown', 'event loop running')
+SLOWEST_IMPORTS = 10
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def launch(command, directory):
+    """Start the app once; returns ({milestone: ms}, wall ms) or None if it failed"""
+    report = os.path.join(directory, 'startup_report.json')
+    if os.path.exists(report):
+        os.remove(report)
+    env = dict(os.environ, BROWSER_MANAGER_STARTUP_REPORT=report)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['BROWSER_MANAGER_LAUNCH_TIME'] = repr(time.time())
+    env[browser_locations.DATA_DIR_ENV_VAR] = directory
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=directory, env=env, capture_output=True, timeout=120)
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0 or not os.path.exists(report):
+        print(f"{command[-1]} failed:\n{result.stderr.decode(errors='replace')[-2000:]}")
+        return None
+    with open(report) as f:
+        return json.load(f), wall
+
+
+def bench_target(name, command, runs):
+    with tempfile.TemporaryDirectory() as directory:  # Keep the app's data files out of the user's
+        launches = [launch(command, directory) for _ in range(runs)]
+    launches = [launched for launched in launches if launched]
+    if not launches:
+        return None
+
+    def summary(selected):
+        row = {milestone: statistics.median(marks[milestone] for marks, _ in selected)
+               for milestone in MILESTONES if all(milestone in marks for marks, _ in selected)}
+        row['exit'] = statistics.median(wall for _, wall in selected)
+        return row
+
+    return {'target': name, 'runs': len(launches), 'first': summary(launches[:1]),
+            'median': summary(launches[1:] or launches)}
+
+
+def import_profile():
+    """Cumulative import time of app.py and its slowest top-level imports, in ms"""
+    code = f"import sys; sys.path.insert(0, {HERE!r}); import app"
+    with tempfile.TemporaryDirectory() as directory:
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=directory,
+                                capture_output=True, text=True, env=dict(os.environ, QT_QPA_PLATFORM='offscreen'))
+    imports = []
+    total = None
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, module = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        if module == 'app':
+            total = cumulative
+        elif depth == 3:  # Imported directly by app.py
+            imports.append([module, cumulative])
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return {'total_ms': total, 'slowest': imports[:SLOWEST_IMPORTS]}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=HERE).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_table(results, baseline=None):
+    columns = MILESTONES + ('exit',)
+    print(f"{'target':<28} {'run':<7}" + ''.join(f" {column[:14]:>15}" for column in columns)
+          + (f" {'exit vs base':>13}" if baseline else ""))
+    base = {r['target']: r for r in (baseline or {}).get('results', [])}
+    for r in results:
+        for run in ('first', 'median'):
+            line = f"{r['target'][-28:]:<28} {run:<7}" + ''.join(
+                f" {r[run][column]:>15.1f}" if column in r[run] else f" {'-':>15}" for column in columns)
+            previous = base.get(r['target'])
+            if previous:
+                change = (r[run]['exit'] - previous[run]['exit']) / max(previous[run]['exit'], 1e-6) * 100
+                line += f" {change:>+12.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--exe', action='append', default=[], help="built executable to launch as well")
+    parser.add_argument('--no-source', action='store_true', help="only launch the executables")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', metavar='BASELINE', help="print changes against an earlier results file")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    targets = [] if args.no_source else [('source', [sys.executable, os.path.join(HERE, 'app.py')])]
+    targets += [(os.path.basename(os.path.dirname(exe)) + '/' + os.path.basename(exe), [os.path.abspath(exe)])
+                for exe in args.exe]
+    results = [result for result in (bench_target(name, command, args.runs) for name, command in targets)
+               if result]
+    print("ms since launch; exit is the wall time until the process has exited")
+    print_table(results, baseline)
+
+    imports = None if args.no_source else import_profile()
+    if imports and imports['total_ms'] is not None:
+        print(f"\nimport app: {imports['total_ms']:.1f} ms, slowest direct imports:")
+        for module, ms in imports['slowest']:
+            print(f"  {module:<24} {ms:>8.1f} ms")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'revision': git_revision(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'qpa': os.environ.get('QT_QPA_PLATFORM', 'offscreen'),
+            'runs': args.runs,
+            'results': results,
+            'imports': imports
+        }, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
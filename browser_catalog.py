@@ -0,0 +1,262 @@
+"""Declarative browser catalog compiled into a single-pass process classifier.
+
+Each catalog entry lists the executable names of a browser, the directories
+it is installed under and the command line markers of its helper and
+private-mode processes. compile_catalog() turns the entries (plus the
+user's custom browsers) into hash maps, a path prefix trie and one combined
+marker regex, so classifying a process costs a few dict lookups no matter
+how many browsers are known.
+"""
+import os
+import re
+from collections import namedtuple
+
+import browser_locations
+
+BROWSER_CATALOG = [
+    {
+        'name': 'Google Chrome',
+        'executables': ('chrome.exe', 'chrome', 'google-chrome', 'chromium', 'chromium-browser'),
+        'install_prefixes': (
+            r'C:\Program Files\Google\Chrome',
+            r'C:\Program Files (x86)\Google\Chrome',
+            r'~\AppData\Local\Google\Chrome',
+            '/opt/google/chrome',
+            '/usr/lib/chromium'
+        ),
+        'helper_markers': ('--type',),
+        'private_markers': ('--incognito',)
+    },
+    {
+        'name': 'Opera',
+        # launcher.exe is too generic to trust outside Opera's install directory
+        'executables': ('opera.exe', 'opera'),
+        'path_executables': ('launcher.exe',),
+        'install_prefixes': (
+            r'C:\Program Files\Opera',
+            r'C:\Program Files (x86)\Opera',
+            r'~\AppData\Local\Programs\Opera',
+            '/usr/lib/x86_64-linux-gnu/opera'
+        ),
+        'helper_markers': ('--type',),
+        'private_markers': ('--private', '--incognito')
+    },
+    {
+        'name': 'Brave',
+        'executables': ('brave.exe', 'brave', 'brave-browser'),
+        'install_prefixes': (
+            r'C:\Program Files\BraveSoftware\Brave-Browser',
+            r'C:\Program Files (x86)\BraveSoftware\Brave-Browser',
+            r'~\AppData\Local\BraveSoftware\Brave-Browser',
+            '/opt/brave.com/brave'
+        ),
+        'helper_markers': ('--type',),
+        'private_markers': ('--incognito',)
+    },
+    {
+        'name': 'Epic',
+        'executables': ('epic.exe',),
+        'install_prefixes': (
+            r'C:\Program Files (x86)\Epic Privacy Browser',
+            r'~\AppData\Local\Epic Privacy Browser'
+        ),
+        'helper_markers': ('--type',),
+        'private_markers': ('--incognito',)
+    },
+    {
+        'name': 'Firefox',
+        'executables': ('firefox.exe', 'firefox', 'firefox-bin', 'firefox-esr'),
+        'install_prefixes': (
+            r'C:\Program Files\Mozilla Firefox',
+            r'C:\Program Files (x86)\Mozilla Firefox',
+            r'~\AppData\Local\Mozilla Firefox',
+            '/usr/lib/firefox',
+            '/opt/firefox'
+        ),
+        'helper_markers': ('-contentproc',),
+        'private_markers': ('-private', '-private-window', '--private-window')
+    },
+    {
+        'name': 'Edge',
+        'executables': ('msedge.exe', 'msedge', 'microsoft-edge'),
+        'install_prefixes': (
+            r'C:\Program Files (x86)\Microsoft\Edge',
+            r'C:\Program Files\Microsoft\Edge',
+            '/opt/microsoft/msedge'
+        ),
+        'helper_markers': ('--type',),
+        'private_markers': ('--inprivate',)
+    }
+]
+
+ROLE_MAIN = 'main'
+ROLE_HELPER = 'helper'
+
+Classification = namedtuple('Classification', 'browser role private')
+
+# Per-browser result of classifying a whole snapshot
+BrowserSummary = namedtuple('BrowserSummary', 'processes main_count helper_count private')
+
+
+def normalize_path(path):
+    """Lower-case, forward-slash form of a path used for matching"""
+    return os.path.expanduser(path).replace('\\', '/').rstrip('/').lower()
+
+
+class CompiledCatalog:
+    """Browser classifier built by compile_catalog()"""
+
+    def __init__(self, by_exe, by_path, prefix_trie, executables, marker_regex, markers, names, needs_exe):
+        self.by_exe = by_exe              # executable name -> browser
+        self.by_path = by_path            # full executable path -> browser
+        self.prefix_trie = prefix_trie    # nested dicts over path components
+        self.executables = executables    # browser -> executable names valid under its prefixes
+        self.marker_regex = marker_regex  # one alternation of every cmdline marker
+        self.markers = markers            # marker -> {browser: role or 'private'}
+        self.names = names
+        # Snapshot attributes needed to tell browsers apart, and to also get roles and private mode
+        self.identity_attrs = ('exe',) if needs_exe else ()
+        self.required_attrs = self.identity_attrs + ('cmdline',)
+
+    def _browser_for_path(self, exe):
+        path = normalize_path(exe)
+        browser = self.by_path.get(path)
+        if browser:
+            return browser
+        node, found = self.prefix_trie, None
+        for part in path.split('/')[:-1]:
+            node = node.get(part)
+            if node is None:
+                break
+            found = node.get('', found)
+        # Only the browser's own executables count, not updaters or crash reporters
+        if found and path.rsplit('/', 1)[-1] in self.executables[found]:
+            return found
+        return None
+
+    def classify_browser(self, name, exe=None):
+        """Return the browser a process belongs to, or None"""
+        if exe:
+            browser = self._browser_for_path(exe)
+            if browser:
+                return browser
+        return self.by_exe.get(name.lower()) if name else None
+
+    def classify(self, record):
+        """Classify a ProcessRecord as (browser, role, private), or None"""
+        browser = self.classify_browser(record.name, record.exe)
+        if browser is None:
+            return None
+        role, private = ROLE_MAIN, False
+        if record.cmdline:
+            for marker in self.marker_regex.findall(' '.join(record.cmdline[1:])):
+                kind = self.markers[marker].get(browser)
+                if kind == 'private':
+                    private = True
+                elif kind == ROLE_HELPER:
+                    role = ROLE_HELPER
+        return Classification(browser, role, private)
+
+    def summarize(self, records, on_found=None):
+        """Group a snapshot by browser in a single pass.
+
+        on_found(browser) is called the first time each browser is seen, so
+        callers can report it before the rest of the snapshot has been read.
+        """
+        builder = SummaryBuilder()
+        for record in records:
+            classification = self.classify(record)
+            if classification is None:
+                continue
+            if builder.add(record, classification) and on_found is not None:
+                on_found(classification.browser)
+        return builder.summaries()
+
+
+class SummaryBuilder:
+    """Accumulates per-browser BrowserSummary groups one classified record at a time"""
+
+    def __init__(self):
+        self.groups = {}
+
+    def add(self, record, classification):
+        """Add a record; returns True if it is the first process of its browser"""
+        group = self.groups.get(classification.browser)
+        first = group is None
+        if first:
+            group = self.groups[classification.browser] = [[], 0, 0, False]
+        group[0].append(record)
+        if classification.role == ROLE_HELPER:
+            group[2] += 1
+        else:
+            group[1] += 1
+        group[3] = group[3] or classification.private
+        return first
+
+    def summaries(self):
+        return {browser: BrowserSummary(*group) for browser, group in self.groups.items()}
+
+
+def compile_catalog(custom_browsers=None, catalog=BROWSER_CATALOG):
+    """Compile catalog entries and custom browsers into a CompiledCatalog.
+
+    custom_browsers uses the custom_browsers.json layout,
+    {name: {'path': ..., 'incognito_flag': ...}}. A custom browser whose name
+    matches a catalog entry extends that entry.
+    """
+    entries = {entry['name']: dict(entry) for entry in catalog}
+    for name, info in (custom_browsers or {}).items():
+        name = browser_locations.canonical_name(name)
+        entry = entries.setdefault(name, {'name': name})
+        if info.get('path'):
+            entry['paths'] = tuple(entry.get('paths', ())) + (info['path'],)
+        if info.get('incognito_flag'):
+            entry['private_markers'] = tuple(entry.get('private_markers', ())) + (info['incognito_flag'],)
+
+    # Catalog executable names win; a custom path that reuses one of them
+    # (or another custom browser's) can only be told apart by its full path
+    by_exe, needs_exe = {}, False
+    for entry in entries.values():
+        for exe_name in entry.get('executables', ()):
+            by_exe[exe_name.lower()] = entry['name']
+    for entry in entries.values():
+        for path in entry.get('paths', ()):
+            exe_name = os.path.basename(normalize_path(path))
+            claimant = by_exe.setdefault(exe_name, entry['name'])
+            if claimant != entry['name']:
+                needs_exe = True
+
+    by_path, prefix_trie, executables, markers = {}, {}, {}, {}
+    for entry in entries.values():
+        browser = entry['name']
+        executables[browser] = {exe_name.lower() for exe_name in
+                                entry.get('executables', ()) + entry.get('path_executables', ())}
+        for path in entry.get('paths', ()):
+            by_path[normalize_path(path)] = browser
+        for prefix in entry.get('install_prefixes', ()):
+            node = prefix_trie
+            for part in normalize_path(prefix).split('/'):
+                node = node.setdefault(part, {})
+            node[''] = browser
+        for marker in entry.get('helper_markers', ()):
+            markers.setdefault(marker, {})[browser] = ROLE_HELPER
+        for marker in entry.get('private_markers', ()):
+            markers.setdefault(marker, {})[browser] = 'private'
+
+    # Longest markers first so -private-window is not read as -private
+    alternation = '|'.join(re.escape(marker) for marker in sorted(markers, key=len, reverse=True))
+    marker_regex = re.compile(rf'(?:^|(?<=\s))({alternation})(?=[\s=]|$)' if markers else r'(?!)')
+
+    return CompiledCatalog(by_exe, by_path, prefix_trie, executables, marker_regex, markers,
+                           tuple(entries), needs_exe)
+
+
+_default_catalog = None
+
+
+def default_catalog():
+    """Return the compiled built-in catalog"""
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = compile_catalog()
+    return _default_catalog
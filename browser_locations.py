@@ -0,0 +1,87 @@
+"""Well-known per-user data locations of the supported browsers, and Browser Manager's own."""
+import os
+
+LOCAL_APPDATA = os.environ.get('LOCALAPPDATA', os.path.expanduser(r'~\AppData\Local'))
+ROAMING_APPDATA = os.environ.get('APPDATA', os.path.expanduser(r'~\AppData\Roaming'))
+
+# Where Browser Manager keeps its caches, audit journal, history index and traces
+DATA_DIR_ENV_VAR = 'BROWSER_MANAGER_DATA_DIR'
+DATA_DIRS = {
+    'nt': os.path.join(LOCAL_APPDATA, 'Browser Manager'),
+    'posix': os.path.join(os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share'),
+                          'browser-manager')
+}
+
+# Chromium based browsers keep every profile under one "user data" directory
+CHROMIUM_USER_DATA_DIRS = {
+    'Google Chrome': [
+        os.path.join(LOCAL_APPDATA, 'Google', 'Chrome', 'User Data'),
+        os.path.expanduser('~/.config/google-chrome'),
+        os.path.expanduser('~/.config/chromium')
+    ],
+    'Brave': [
+        os.path.join(LOCAL_APPDATA, 'BraveSoftware', 'Brave-Browser', 'User Data'),
+        os.path.expanduser('~/.config/BraveSoftware/Brave-Browser')
+    ],
+    'Edge': [
+        os.path.join(LOCAL_APPDATA, 'Microsoft', 'Edge', 'User Data'),
+        os.path.expanduser('~/.config/microsoft-edge')
+    ],
+    'Opera': [
+        os.path.join(ROAMING_APPDATA, 'Opera Software', 'Opera Stable'),
+        os.path.expanduser('~/.config/opera')
+    ],
+    'Epic': [
+        os.path.join(LOCAL_APPDATA, 'Epic Privacy Browser', 'User Data')
+    ]
+}
+
+# Firefox keeps profiles.ini and the profile directories under one root
+FIREFOX_PROFILE_ROOTS = {
+    'Firefox': [
+        os.path.join(ROAMING_APPDATA, 'Mozilla', 'Firefox'),
+        os.path.expanduser('~/.mozilla/firefox')
+    ]
+}
+
+# app.py and browser_manager_modern.py name some browsers differently
+BROWSER_NAME_ALIASES = {
+    'Chrome': 'Google Chrome'
+}
+
+
+def canonical_name(browser_name):
+    """Map a frontend browser name onto the name used in this module"""
+    return BROWSER_NAME_ALIASES.get(browser_name, browser_name)
+
+
+def data_dir():
+    """Return the per-user data directory; BROWSER_MANAGER_DATA_DIR overrides it"""
+    return os.environ.get(DATA_DIR_ENV_VAR) or DATA_DIRS.get(os.name, DATA_DIRS['posix'])
+
+
+def data_path(name):
+    """Return the path of name in the data directory, creating the directory if needed"""
+    directory = data_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        pass  # Reported by whoever writes the file
+    return os.path.join(directory, name)
+
+
+def _first_existing(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            return path
+    return None
+
+
+def chromium_user_data_dir(browser_name):
+    """Return the user data directory of a Chromium based browser, or None"""
+    return _first_existing(CHROMIUM_USER_DATA_DIRS.get(canonical_name(browser_name), []))
+
+
+def firefox_profile_root(browser_name):
+    """Return the directory holding profiles.ini for a Firefox based browser, or None"""
+    return _first_existing(FIREFOX_PROFILE_ROOTS.get(canonical_name(browser_name), []))
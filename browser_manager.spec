@@ -1,6 +1,30 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# Builds dist/Browser Manager/ (onedir) by default: the executable starts
+# straight from that folder. Set BROWSER_MANAGER_BUILD=onefile for a
+# single executable, which unpacks Python and Qt into a temporary folder
+# on every launch and starts much more slowly. See build.py.
+import os
 
-block_cipher = None
+ONEFILE = os.environ.get('BROWSER_MANAGER_BUILD', 'onedir').lower() == 'onefile'
+
+# The app only uses QtCore, QtGui and QtWidgets; PIL is only needed by
+# create_icon.py at development time
+EXCLUDES = [
+    'PIL',
+    'tkinter',
+    'PyQt5.Qt3DAnimation', 'PyQt5.Qt3DCore', 'PyQt5.Qt3DExtras', 'PyQt5.Qt3DInput',
+    'PyQt5.Qt3DLogic', 'PyQt5.Qt3DRender',
+    'PyQt5.QtBluetooth', 'PyQt5.QtDBus', 'PyQt5.QtDesigner', 'PyQt5.QtHelp',
+    'PyQt5.QtLocation', 'PyQt5.QtMultimedia', 'PyQt5.QtMultimediaWidgets',
+    'PyQt5.QtNetwork', 'PyQt5.QtNfc', 'PyQt5.QtOpenGL', 'PyQt5.QtPositioning',
+    'PyQt5.QtPrintSupport', 'PyQt5.QtQml', 'PyQt5.QtQuick', 'PyQt5.QtQuick3D',
+    'PyQt5.QtQuickWidgets', 'PyQt5.QtRemoteObjects', 'PyQt5.QtSensors',
+    'PyQt5.QtSerialPort', 'PyQt5.QtSql', 'PyQt5.QtSvg', 'PyQt5.QtTest',
+    'PyQt5.QtTextToSpeech', 'PyQt5.QtWebChannel', 'PyQt5.QtWebEngine',
+    'PyQt5.QtWebEngineCore', 'PyQt5.QtWebEngineWidgets', 'PyQt5.QtWebSockets',
+    'PyQt5.QtXml', 'PyQt5.QtXmlPatterns',
+]
 
 a = Analysis(
     ['app.py'],
@@ -11,35 +35,63 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
-    win_no_prefer_redirects=False,
-    win_private_assemblies=False,
-    cipher=block_cipher,
+    excludes=EXCLUDES,
     noarchive=False,
+    optimize=0,
 )
+pyz = PYZ(a.pure)
 
-pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='Browser Manager',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon='logo.ico',
-    version='file_version_info.txt'
-) 
\ No newline at end of file
+# UPX is off: compressed DLLs are unpacked in memory on every load, which
+# costs more startup time than the smaller download saves
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='Browser Manager',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='logo.ico',
+        version='file_version_info.txt'
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='Browser Manager',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon='logo.ico',
+        version='file_version_info.txt'
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='Browser Manager',
+    )
@@ -1,235 +1,139 @@
 import sys
+import time
+import logging
+import startup_timeline
+import profiler
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, 
                             QHBoxLayout, QWidget, QLabel, QLineEdit, QMessageBox, 
                             QStackedWidget, QInputDialog, QFrame, QScrollArea,
                             QSizePolicy, QSpacerItem)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSize
 from PyQt5.QtGui import QFont, QPalette, QColor, QPainter
-import psutil
-import pygetwindow as gw
+try:
+    import pygetwindow as gw
+except NotImplementedError:
+    gw = None  # pygetwindow has no Linux backend
 import subprocess
-import time
-
-class ModernCard(QFrame):
-    """Modern card widget for browser items"""
-    clicked = pyqtSignal()  # Add the clicked signal
-    
-    def __init__(self, browser_name, description="", parent=None):
-        super().__init__(parent)
-        self.browser_name = browser_name
-        self.is_dark_mode = False
-        self.setup_ui(description)
-        self.apply_light_theme()
-        # Make the card clickable
-        self.setCursor(Qt.PointingHandCursor)
-    
-    def setup_ui(self, description):
-        self.setFixedHeight(80)
-        self.setFrameStyle(QFrame.NoFrame)
-        
-        layout = QHBoxLayout()
-        layout.setContentsMargins(20, 15, 20, 15)
-        
-        # Left side - Browser info
-        left_layout = QVBoxLayout()
-        left_layout.setSpacing(5)
-        
-        # Browser name
-        self.name_label = QLabel(self.browser_name)
-        self.name_label.setFont(QFont('Segoe UI', 11, QFont.Bold))
-        left_layout.addWidget(self.name_label)
-        
-        # Description
-        self.desc_label = QLabel(description or f"Manage {self.browser_name} browser")
-        self.desc_label.setFont(QFont('Segoe UI', 9))
-        left_layout.addWidget(self.desc_label)
-        
-        left_widget = QWidget()
-        left_widget.setLayout(left_layout)
-        layout.addWidget(left_widget)
-        
-        # Spacer
-        layout.addItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
-        
-        # Right side - Controls
-        right_layout = QHBoxLayout()
-        right_layout.setSpacing(15)
-        
-        # Status indicator (for detection page)
-        self.status_label = QLabel("●")
-        self.status_label.setFont(QFont('Segoe UI', 32))  # Increased font size significantly
-        self.status_label.setFixedSize(32, 32)  # Increased fixed size
-        self.status_label.setAlignment(Qt.AlignCenter)  # Center the dot
-        self.status_label.hide()  # Hidden by default
-        right_layout.addWidget(self.status_label)
-        
-        # Action button (for action page)
-        self.action_button = QPushButton("Open")
-        self.action_button.setFixedSize(80, 35)
-        self.action_button.hide()  # Hidden by default
-        right_layout.addWidget(self.action_button)
-        
-        right_widget = QWidget()
-        right_widget.setLayout(right_layout)
-        layout.addWidget(right_widget)
-        
-        self.setLayout(layout)
-    
-    def mousePressEvent(self, event):
-        """Handle click events on the card"""
-        if event.button() == Qt.LeftButton:
-            self.clicked.emit()  # Emit the clicked signal
-    
-    def set_detection_mode(self, enabled=True):
-        """Configure card for detection page"""
-        self.status_label.setVisible(enabled)
-        self.action_button.setVisible(not enabled)
-    
-    def set_action_mode(self, enabled=True):
-        """Configure card for action page"""
-        self.action_button.setVisible(enabled)
-        self.status_label.setVisible(not enabled)
-    
-    def update_status(self, status):
-        """Update browser status (blue/green/red)"""
-        colors = {
-            'blue': '#0078d4',
-            'green': '#107c10', 
-            'red': '#d13438'
-        }
-        color = colors.get(status, '#0078d4')
-        self.status_label.setStyleSheet(f"color: {color};")
-    
-    def apply_dark_theme(self):
-        self.is_dark_mode = True
-        self.setStyleSheet("""
-            ModernCard {
-                background-color: #2d2d2d;
-                border-radius: 8px;
-                border: 1px solid #404040;
-            }
-            ModernCard:hover {
-                background-color: #353535;
-                border: 1px solid #505050;
-            }
-            QLabel {
-                color: #ffffff;
-                background: transparent;
-            }
-            QPushButton {
-                background-color: #0078d4;
-                color: white;
-                border: none;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #106ebe;
-            }
-            QPushButton:pressed {
-                background-color: #005a9e;
-            }
-            QScrollArea {
-                border: none;
-                background-color: #2d2d2d;
-            }
-            QScrollBar:vertical {
-                background-color: #404040;
-                width: 12px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:vertical {
-                background-color: #505050;
-                border-radius: 6px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background-color: #606060;
-            }
-        """)
-        self.desc_label.setStyleSheet("color: #b3b3b3;")
-    
-    def apply_light_theme(self):
-        self.is_dark_mode = False
-        self.setStyleSheet("""
-            ModernCard {
-                background-color: #ffffff;
-                border-radius: 8px;
-                border: 1px solid #e1e1e1;
-            }
-            ModernCard:hover {
-                background-color: #f8f9fa;
-                border: 1px solid #d1d1d1;
-            }
-            QLabel {
-                color: #323130;
-                background: transparent;
-            }
-            QPushButton {
-                background-color: #0078d4;
-                color: white;
-                border: none;
-                border-radius: 4px;
-                font-weight: bold;
-            }
-            QPushButton:hover {
-                background-color: #106ebe;
-            }
-            QPushButton:pressed {
-                background-color: #005a9e;
-            }
-            QScrollArea {
-                border: none;
-                background-color: #f5f5f5;
-            }
-            QScrollBar:vertical {
-                background-color: #e1e1e1;
-                width: 12px;
-                border-radius: 6px;
-            }
-            QScrollBar::handle:vertical {
-                background-color: #c1c1c1;
-                border-radius: 6px;
-                min-height: 20px;
-            }
-            QScrollBar::handle:vertical:hover {
-                background-color: #a1a1a1;
-            }
-        """)
-        self.desc_label.setStyleSheet("color: #666666;")
+import browser_termination
+from audit_journal import get_journal, EVENT_LAUNCH, EVENT_TERMINATE
+import devtools
+from tab_inventory import TabInventory
+from browser_model import BrowserListWidget, BrowserCardDelegate, STATUS_UNKNOWN
+from browser_catalog import default_catalog
+from detection_engine import DetectionCycle, DetectionCancelled
+from session_index import default_scope
+from version_probe import get_version_index, select_incognito_flag
+from icon_cache import get_icon_cache
+from browser_profiles import get_profile_index
+from history_index import get_history_index, HistoryCompleter
+
+# Card colors and filter labels for the detection statuses; unknown means
+# the detection cycle ran out of time before it got to the browser
+STATUS_COLORS = {
+    'blue': '#0078d4',
+    'green': '#107c10',
+    'red': '#d13438',
+    STATUS_UNKNOWN: '#8a8886'
+}
+
+STATUS_LABELS = {
+    'blue': "Not running",
+    'green': "Running",
+    'red': "Private mode",
+    STATUS_UNKNOWN: "Unknown"
+}
+
+# A card click is answered from the last result if it is younger than this;
+# older results are shown as stale and refreshed in the background
+SNAPSHOT_FRESHNESS = 5.0
+
+@profiler.traced('windows')
+def has_private_window(browser_name):
+    """Check the browser's window titles for an incognito/private window"""
+    if gw is None:
+        return False
+    try:
+        for window in gw.getWindowsWithTitle(browser_name):
+            title_lower = window.title.lower()
+            if "incognito" in title_lower or "private" in title_lower or "inprivate" in title_lower:
+                return True
+    except gw.PyGetWindowException:
+        pass
+    return False
+
+def browser_status(browser_name, summary):
+    """Map a browser's snapshot summary to its card color"""
+    if summary is None:
+        return "blue"
+    if summary.private or has_private_window(browser_name):
+        return "red"
+    return "green"
 
 class BrowserDetector(QThread):
+    browser_detected = pyqtSignal(str, str)  # browser name, status
     detection_finished = pyqtSignal(dict)
+    processes_detected = pyqtSignal(dict)  # browser name -> [(pid, create_time)]
 
-    def __init__(self, browsers_to_detect):
+    def __init__(self, browsers_to_detect, deadline=None, scope=None):
         super().__init__()
         self.browsers_to_detect = browsers_to_detect
-        self._is_running = True
+        self.scope = scope or default_scope()  # Only this user's or session's browsers count
+        self.cycle = DetectionCycle(deadline)
 
     def run(self):
+        try:
+            with profiler.span('detection cycle', 'detection'), profiler.sampled_cprofile('detector'):
+                results = self.detect()
+        except DetectionCancelled:
+            return
+        self.detection_finished.emit(results)
+
+    def detect(self):
         results = {}
-        for browser_name, exe_name in self.browsers_to_detect.items():
-            status = "blue"
-            running_processes = [p for p in psutil.process_iter(['name']) if p.info['name'] == exe_name]
-
-            if running_processes:
-                status = "green"
-                try:
-                    for window in gw.getWindowsWithTitle(browser_name):
-                        title_lower = window.title.lower()
-                        if "incognito" in title_lower or "private" in title_lower or "inprivate" in title_lower:
-                            status = "red"
-                            break
-                except gw.PyGetWindowException:
-                    pass
+        cycle = self.cycle
+        catalog = default_catalog()
+        wanted = set(self.browsers_to_detect)
+        streamed = {}
+
+        # A browser is running as soon as one of its processes shows up; private
+        # windows are only known once the scan has finished
+        def found(browser_name):
+            if browser_name in wanted:
+                streamed[browser_name] = "green"
+                self.browser_detected.emit(browser_name, "green")
+
+        # One process snapshot per cycle, shared by every browser
+        index, complete = cycle.scan_sessions(catalog, catalog.required_attrs + ('create_time',), self.scope,
+                                              found)
+        summaries = index.scoped
+        self.processes_detected.emit({
+            browser_name: [(p.pid, p.create_time) for p in summaries[browser_name].processes]
+            if browser_name in summaries else []
+            for browser_name in self.browsers_to_detect
+            if complete or browser_name in summaries})
+
+        # Report the browsers that need no window lookup first
+        def cost(browser_name):
+            summary = summaries.get(browser_name)
+            return 0 if summary is None or summary.private else 1
+
+        for browser_name in sorted(self.browsers_to_detect, key=cost):
+            if browser_name in summaries or complete:
+                # Window title lookups can be slow, so keep checking the deadline
+                if not cycle.should_continue() and cost(browser_name):
+                    status = STATUS_UNKNOWN
+                else:
+                    status = browser_status(browser_name, summaries.get(browser_name))
+            else:
+                status = STATUS_UNKNOWN  # The scan stopped before reaching it
             results[browser_name] = status
-            if not self._is_running:
-                break
-
-        self.detection_finished.emit(results)
+            if streamed.get(browser_name) != status:
+                self.browser_detected.emit(browser_name, status)
+        return results
 
     def stop(self):
-        self._is_running = False
+        """Cancel the cycle, including a process scan in progress"""
+        self.cycle.cancel()
 
 class BrowserActions:
     BROWSER_PATHS = {
@@ -250,24 +154,42 @@ class BrowserActions:
         "Edge": "--inprivate"
     }
     
-    BROWSER_PROCESS_NAMES = {
-        "Google Chrome": "chrome.exe",
-        "Opera": "opera.exe",
-        "Brave": "brave.exe",
-        "Epic": "epic.exe",
-        "Firefox": "firefox.exe",
-        "Edge": "msedge.exe"
-    }
+    TAB_INVENTORY = TabInventory()
 
     @staticmethod
-    def open_url_in_browser(browser_name, url):
+    def versions():
+        """Installed version of every browser whose executable could be read; may probe, so not on the GUI thread"""
+        return get_version_index().versions(BrowserActions.BROWSER_PATHS)
+
+    @staticmethod
+    def cached_versions():
+        """The versions already in the version index"""
+        return get_version_index().cached_versions(BrowserActions.BROWSER_PATHS)
+
+    @staticmethod
+    @profiler.traced('launch')
+    def open_url_in_browser(browser_name, url, profile=None):
         browser_path = BrowserActions.BROWSER_PATHS.get(browser_name)
         incognito_flag = BrowserActions.BROWSER_INCOGNITO_FLAGS.get(browser_name)
+        if browser_path and incognito_flag:
+            # Pick the flag the installed version understands
+            incognito_flag = select_incognito_flag(browser_name, get_version_index().cached_version(browser_path),
+                                                   incognito_flag)
         
         if browser_path and incognito_flag:
+            profile_args = get_profile_index().launch_arguments(browser_name, profile) if profile else []
+            if profile_args is None:
+                QMessageBox.warning(None, "Profile Not Found", f"{browser_name} has no profile {profile}.")
+                return False
+            # Reuse a running browser that exposes a DevTools endpoint; it cannot pick a profile
+            if not profile and devtools.open_url(browser_name, url, private=True):
+                get_journal().record(EVENT_LAUNCH, browser_name, url, private=True, method='devtools')
+                return True
             try:
-                command = [browser_path, incognito_flag, url]
+                command = [browser_path] + profile_args + [incognito_flag, url]
                 subprocess.Popen(command)
+                details = {'profile': profile} if profile else {}
+                get_journal().record(EVENT_LAUNCH, browser_name, url, private=True, method='spawn', **details)
                 return True
             except FileNotFoundError:
                 QMessageBox.warning(None, "Browser Not Found",
@@ -281,6 +203,15 @@ class BrowserActions:
 
     @staticmethod
     def is_url_open_in_browser(browser_name, url_partial):
+        # Session files know about background tabs, but outlive the browser
+        BrowserActions.TAB_INVENTORY.refresh()
+        if BrowserActions.TAB_INVENTORY.is_url_open(url_partial, browser_name):
+            if browser_termination.scan_processes(browser_name, scope=default_scope()):
+                return True
+
+        # Fall back to window titles for browsers without readable session files
+        if gw is None:
+            return False
         try:
             for window in gw.getWindowsWithTitle(browser_name):
                 if url_partial.lower() in window.title.lower():
@@ -290,33 +221,69 @@ class BrowserActions:
         return False
 
     @staticmethod
-    def terminate_browser_process(browser_name):
-        exe_name = BrowserActions.BROWSER_PROCESS_NAMES.get(browser_name)
-        if not exe_name:
-            return False
-        try:
-            subprocess.run(["taskkill", "/F", "/IM", exe_name], check=True, capture_output=True)
-            return True
-        except subprocess.CalledProcessError as e:
-            print(f"Error terminating {exe_name}: {e.stderr.decode()}")
-            return False
-        except FileNotFoundError:
-            print("taskkill command not found. Ensure it's in your system PATH.")
+    def terminate_browser_process(browser_name, snapshot_entries=None):
+        """Close the browser's process tree and block until it has exited.
+
+        snapshot_entries are the (pid, create_time) pairs from the last detection;
+        when they are missing or stale the processes are looked up in a fresh snapshot.
+        """
+        if browser_name not in default_catalog().names:
             return False
+        success, pids = browser_termination.terminate_browser(browser_name, snapshot_entries,
+                                                              scope=default_scope())
+        get_journal().record(EVENT_TERMINATE, browser_name, pids=pids, success=success)
+        return success
+
+class BrowserTerminator(QThread):
+    """Terminates a browser off the GUI thread and reports when its tree is gone"""
+    termination_finished = pyqtSignal(str, bool)
+
+    def __init__(self, browser_name, snapshot_entries=None):
+        super().__init__()
+        self.browser_name = browser_name
+        self.snapshot_entries = snapshot_entries
+
+    def run(self):
+        success = BrowserActions.terminate_browser_process(self.browser_name, self.snapshot_entries)
+        self.termination_finished.emit(self.browser_name, success)
+
+class VersionProbe(QThread):
+    """Reads the browsers' versions from their executables off the GUI thread"""
+    versions_probed = pyqtSignal(dict)  # browser name -> version
+
+    def run(self):
+        self.versions_probed.emit(BrowserActions.versions())
+
+class UrlOpenCheck(QThread):
+    """Reads the session files and process table off the GUI thread to find an open URL"""
+    check_finished = pyqtSignal(str, str, bool)  # browser name, url, open
+
+    def __init__(self, browser_name, url_partial):
+        super().__init__()
+        self.browser_name = browser_name
+        self.url_partial = url_partial
+
+    def run(self):
+        found = BrowserActions.is_url_open_in_browser(self.browser_name, self.url_partial)
+        self.check_finished.emit(self.browser_name, self.url_partial, found)
 
 class BrowserDetectionPage(QWidget):
+    processes_updated = pyqtSignal(dict)
+    statuses_updated = pyqtSignal(dict)
+
     def __init__(self):
         super().__init__()
-        self.browsers = {
-            "Google Chrome": "chrome.exe",
-            "Opera": "opera.exe",
-            "Brave": "brave.exe",
-            "Epic": "epic.exe",
-            "Firefox": "firefox.exe",
-            "Edge": "msedge.exe"
-        }
-        self.browser_cards = {}
+        self.browsers = [
+            "Google Chrome",
+            "Opera",
+            "Brave",
+            "Epic",
+            "Firefox",
+            "Edge"
+        ]
         self.detection_thread = None
+        self.refresh_threads = {}  # browser name -> targeted BrowserDetector
+        self.process_snapshot = {}
         self.init_ui()
 
     def init_ui(self):
@@ -339,13 +306,13 @@ class BrowserDetectionPage(QWidget):
         content_layout = QVBoxLayout()
         
         # Browser cards
-        for browser_name in self.browsers.keys():
-            card = ModernCard(browser_name)
-            card.set_detection_mode(True)
-            # Connect the card's clicked signal to the detection function
-            card.clicked.connect(lambda checked, b=browser_name: self.detect_single_browser(b))
-            content_layout.addWidget(card)
-            self.browser_cards[browser_name] = card
+        self.browser_list = BrowserListWidget(BrowserCardDelegate.DETECTION_MODE, STATUS_COLORS, STATUS_LABELS)
+        self.browser_list.model.set_browsers(self.browsers)
+        self.browser_list.set_icons(get_icon_cache(), BrowserActions.BROWSER_PATHS)
+        self.browser_list.set_stale_after(SNAPSHOT_FRESHNESS)
+        # Clicking a card re-detects that browser
+        self.browser_list.browser_clicked.connect(self.detect_single_browser)
+        content_layout.addWidget(self.browser_list)
         
         # Detection button
         self.detection_button = QPushButton("Run Browser Detection")
@@ -380,43 +347,71 @@ class BrowserDetectionPage(QWidget):
         self.setLayout(main_layout)
 
     def detect_single_browser(self, browser_name):
-        """Detect status for a single browser"""
-        exe_name = self.browsers[browser_name]
-        status = "blue"
-        running_processes = [p for p in psutil.process_iter(['name']) if p.info['name'] == exe_name]
-
-        if running_processes:
-            status = "green"
-            try:
-                for window in gw.getWindowsWithTitle(browser_name):
-                    title_lower = window.title.lower()
-                    if "incognito" in title_lower or "private" in title_lower or "inprivate" in title_lower:
-                        status = "red"
-                        break
-            except gw.PyGetWindowException:
-                pass
-
-        if browser_name in self.browser_cards:
-            self.browser_cards[browser_name].update_status(status)
+        """Serve a fresh status from the last snapshot, otherwise refresh it in the background"""
+        model = self.browser_list.model
+        updated = model.updated(browser_name)
+        if updated is not None and time.monotonic() - updated < SNAPSHOT_FRESHNESS:
+            self.statuses_updated.emit({browser_name: model.status(browser_name)})
+            return
+        if browser_name in self.refresh_threads:
+            return  # Already refreshing
+        if self.detection_thread and self.detection_thread.isRunning():
+            return  # A full detection is about to report this browser anyway
+
+        thread = BrowserDetector([browser_name])
+        thread.browser_detected.connect(self.update_single_status)
+        thread.processes_detected.connect(self.on_processes_detected)
+        # A bound slot runs on the GUI thread; a lambda would run on the worker
+        thread.finished.connect(self.on_refresh_finished)
+        self.refresh_threads[browser_name] = thread
+        thread.start()
+
+    def on_refresh_finished(self):
+        """Forget a targeted refresh once its thread has returned from run()"""
+        thread = self.sender()
+        thread.wait()
+        for browser_name, refresh in list(self.refresh_threads.items()):
+            if refresh is thread:
+                del self.refresh_threads[browser_name]
 
     def run_detection(self):
         """Run detection for all browsers"""
-        if self.detection_thread and self.detection_thread.isRunning():
-            self.detection_thread.stop()
-            self.detection_thread.wait()
+        self.stop_detection()
 
         self.detection_button.setEnabled(False)
         self.detection_thread = BrowserDetector(self.browsers)
+        self.detection_thread.browser_detected.connect(self.update_single_status)
         self.detection_thread.detection_finished.connect(self.update_browser_status)
+        self.detection_thread.processes_detected.connect(self.on_processes_detected)
         self.detection_thread.start()
 
+    def on_processes_detected(self, snapshot):
+        # Targeted refreshes only report their own browser
+        self.process_snapshot = {**self.process_snapshot, **snapshot}
+        self.processes_updated.emit(self.process_snapshot)
+
+    @profiler.traced('ui')
+    def update_single_status(self, browser_name, status):
+        """Show one browser's result as soon as the detector reports it"""
+        startup_timeline.mark("first status")
+        self.browser_list.model.set_statuses({browser_name: status})
+        self.statuses_updated.emit({browser_name: status})
+
+    @profiler.traced('ui')
     def update_browser_status(self, results):
         """Update status for all browsers"""
-        for browser_name, status_color in results.items():
-            if browser_name in self.browser_cards:
-                self.browser_cards[browser_name].update_status(status_color)
+        self.browser_list.model.set_statuses(results)
+        self.statuses_updated.emit(results)
         self.detection_button.setEnabled(True)
 
+    def stop_detection(self):
+        if self.detection_thread and self.detection_thread.isRunning():
+            self.detection_thread.stop()
+            self.detection_thread.wait()
+        for thread in list(self.refresh_threads.values()):
+            thread.stop()
+            thread.wait()
+
 class BrowserActionPage(QWidget):
     def __init__(self):
         super().__init__()
@@ -428,8 +423,14 @@ class BrowserActionPage(QWidget):
             "Firefox",
             "Edge"
         ]
-        self.browser_cards = {}
+        self.process_snapshot = {}
+        self.termination_threads = {}
+        self.url_checks = {}  # browser name -> UrlOpenCheck
         self.init_ui()
+        # Executables that changed since they were last read are probed in the background
+        self.version_probe = VersionProbe()
+        self.version_probe.versions_probed.connect(self.show_versions)
+        self.version_probe.start()
 
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -451,20 +452,33 @@ class BrowserActionPage(QWidget):
         content_layout = QVBoxLayout()
         
         # Browser cards
-        for browser_name in self.browsers:
-            card = ModernCard(browser_name)
-            card.set_action_mode(True)
-            card.action_button.clicked.connect(lambda checked, b=browser_name: self.show_action_dialog(b))
-            content_layout.addWidget(card)
-            self.browser_cards[browser_name] = card
+        self.browser_list = BrowserListWidget(BrowserCardDelegate.ACTION_MODE, STATUS_COLORS, STATUS_LABELS)
+        self.browser_list.model.set_browsers(self.browsers, self.descriptions(BrowserActions.cached_versions()))
+        self.browser_list.set_icons(get_icon_cache(), BrowserActions.BROWSER_PATHS)
+        self.browser_list.button_clicked.connect(self.show_action_dialog)
+        content_layout.addWidget(self.browser_list)
         
         content.setLayout(content_layout)
         main_layout.addWidget(content)
         
         self.setLayout(main_layout)
 
+    @staticmethod
+    def descriptions(versions):
+        return {name: f"Manage {name} browser, version {version}" for name, version in versions.items()}
+
+    def show_versions(self, versions):
+        """Name the versions read by the probe once it has finished"""
+        self.browser_list.model.set_browsers(self.browsers, self.descriptions(versions))
+
+    def set_process_snapshot(self, snapshot):
+        """Remember the processes found by the last detection run"""
+        self.process_snapshot = snapshot
+
     def show_action_dialog(self, browser_name):
         options = ["Open office.com", "Open Custom URL"]
+        if get_profile_index().profiles(browser_name):
+            options.append("Open URL in Profile")
         item, ok = QInputDialog.getItem(self, f"Action for {browser_name}",
                                       "Choose an action:", options, 0, False)
 
@@ -473,28 +487,86 @@ class BrowserActionPage(QWidget):
                 self.handle_office_com_action(browser_name)
             elif item == "Open Custom URL":
                 self.handle_custom_url_action(browser_name)
+            elif item == "Open URL in Profile":
+                self.handle_profile_url_action(browser_name)
 
     def handle_office_com_action(self, browser_name):
+        """Check for an open office.com tab in the background, then act on the answer"""
+        if browser_name in self.url_checks:
+            return  # Still checking
+        thread = UrlOpenCheck(browser_name, "office.com")
+        thread.check_finished.connect(self.on_office_com_checked)
+        self.url_checks[browser_name] = thread
+        thread.start()
+
+    def on_office_com_checked(self, browser_name, url_partial, is_open):
+        thread = self.url_checks.pop(browser_name, None)
+        if thread:
+            thread.wait()
         office_url = "https://office.com"
-        if BrowserActions.is_url_open_in_browser(browser_name, "office.com"):
+        if is_open:
             reply = QMessageBox.question(self, "Office.com Already Open",
                                        "Office.com is already open. Do you want to close and reopen it?",
                                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
-                if BrowserActions.terminate_browser_process(browser_name):
-                    time.sleep(1)
-                    BrowserActions.open_url_in_browser(browser_name, office_url)
+                # Reload the existing tab when possible instead of restarting the browser
+                if devtools.open_url(browser_name, office_url, reuse_existing=True):
+                    get_journal().record(EVENT_LAUNCH, browser_name, office_url, method='reload')
                 else:
-                    QMessageBox.warning(self, "Error", f"Failed to terminate {browser_name}.")
+                    self.restart_browser_with_url(browser_name, office_url)
         else:
             BrowserActions.open_url_in_browser(browser_name, office_url)
 
+    def restart_browser_with_url(self, browser_name, url):
+        """Terminate the browser in the background and relaunch it once its tree has exited"""
+        if browser_name in self.termination_threads:
+            return  # Already restarting
+        thread = BrowserTerminator(browser_name, self.process_snapshot.get(browser_name))
+        thread.termination_finished.connect(
+            lambda name, success: self.on_browser_terminated(name, success, url))
+        self.termination_threads[browser_name] = thread
+        thread.start()
+
+    def on_browser_terminated(self, browser_name, success, url):
+        thread = self.termination_threads.pop(browser_name, None)
+        if thread:
+            thread.wait()
+        if success:
+            BrowserActions.open_url_in_browser(browser_name, url)
+        else:
+            QMessageBox.warning(self, "Error", f"Failed to terminate {browser_name}.")
+
+    def stop_workers(self):
+        for thread in list(self.url_checks.values()) + [self.version_probe]:
+            thread.wait()
+
+    def ask_url(self, title):
+        """Ask for a URL with history suggestions; returns (text, ok) like QInputDialog.getText"""
+        dialog = QInputDialog(self)
+        dialog.setWindowTitle(title)
+        dialog.setLabelText("Enter URL:")
+        dialog.setTextValue("https://")
+        HistoryCompleter(dialog.findChild(QLineEdit))
+        ok = dialog.exec_() == QInputDialog.Accepted
+        return dialog.textValue(), ok
+
     def handle_custom_url_action(self, browser_name):
-        text, ok = QInputDialog.getText(self, f"Open Custom URL in {browser_name}",
-                                       "Enter URL:", QLineEdit.Normal, "https://")
+        text, ok = self.ask_url(f"Open Custom URL in {browser_name}")
         if ok and text:
             BrowserActions.open_url_in_browser(browser_name, text)
 
+    def handle_profile_url_action(self, browser_name):
+        profiles = get_profile_index().profiles(browser_name)
+        labels = [f"{profile.name} (default)" if profile.default else profile.name for profile in profiles]
+        label, ok = QInputDialog.getItem(self, f"Profile of {browser_name}",
+                                         "Open in profile:", labels, 0, False)
+        if not ok or not label:
+            return
+        profile = profiles[labels.index(label)]
+        text, ok = self.ask_url(f"Open URL in {browser_name} ({profile.name})")
+        if ok and text:
+            BrowserActions.open_url_in_browser(browser_name, text, profile.key)
+
 class BrowserManagerApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -524,14 +596,40 @@ class BrowserManagerApp(QMainWindow):
         self.stacked_widget = QStackedWidget()
         self.setCentralWidget(self.stacked_widget)
 
+        # The action page is built on first navigation
         self.detection_page = BrowserDetectionPage()
-        self.action_page = BrowserActionPage()
-
+        self.action_page = None
         self.stacked_widget.addWidget(self.detection_page)
-        self.stacked_widget.addWidget(self.action_page)
         
         self.create_navigation_bar()
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        startup_timeline.mark("window shown")
+
+    def closeEvent(self, event):
+        # Cancel a scan in progress instead of waiting for it to finish
+        self.detection_page.stop_detection()
+        if self.action_page is not None:
+            self.action_page.stop_workers()
+        get_history_index().stop()
+        super().closeEvent(event)
+
+    def show_action_page(self):
+        """Switch to the action page, building it the first time"""
+        if self.action_page is None:
+            # URL suggestions are only needed once the action page is used
+            get_history_index().start()
+            self.action_page = BrowserActionPage()
+            self.action_page.set_process_snapshot(self.detection_page.process_snapshot)
+            detection_model = self.detection_page.browser_list.model
+            self.action_page.browser_list.model.set_statuses(
+                {name: detection_model.status(name) for name in detection_model.browsers()})
+            self.detection_page.processes_updated.connect(self.action_page.set_process_snapshot)
+            self.detection_page.statuses_updated.connect(self.action_page.browser_list.model.set_statuses)
+            self.stacked_widget.addWidget(self.action_page)
+        self.stacked_widget.setCurrentWidget(self.action_page)
+
     def create_navigation_bar(self):
         nav_bar = QWidget()
         nav_layout = QHBoxLayout()
@@ -542,7 +640,7 @@ class BrowserManagerApp(QMainWindow):
         nav_layout.addWidget(btn_detection)
 
         btn_action = QPushButton("Browser Action")
-        btn_action.clicked.connect(lambda: self.stacked_widget.setCurrentWidget(self.action_page))
+        btn_action.clicked.connect(self.show_action_page)
         nav_layout.addWidget(btn_action)
 
         main_layout = QVBoxLayout()
@@ -554,7 +652,13 @@ class BrowserManagerApp(QMainWindow):
         self.setCentralWidget(container)
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    startup_timeline.mark("modules imported")
+    argv = profiler.configure_from_args(sys.argv)
+    app = QApplication(argv)
+    if profiler.enabled():
+        app.aboutToQuit.connect(profiler.export_chrome_trace)
     window = BrowserManagerApp()
+    startup_timeline.mark("window constructed")
     window.show()
     sys.exit(app.exec_()) 
\ No newline at end of file
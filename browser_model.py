@@ -0,0 +1,422 @@
+"""Model/view browser list shared by the detection and action pages.
+
+Browsers live in one BrowserListModel row each and are painted by
+BrowserCardDelegate inside a QListView, so only the visible rows are drawn
+and no widgets are created per browser. Status updates are applied in place
+and reported as dataChanged ranges; filtering and sorting by status go
+through a proxy model without rebuilding anything.
+
+Each row also remembers when its status was last reported; with
+set_stale_after() the detection cards fade their status dot and show the
+age of results older than that.
+
+With set_icons() the cards show each browser's icon from an
+icon_cache.IconCache. Painting only looks the icon up; until it has been
+loaded in the background the card shows a placeholder.
+"""
+import time
+
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListView, QLineEdit,
+                             QComboBox, QStyledItemDelegate, QStyle, QAbstractItemView)
+from PyQt5.QtCore import (Qt, QAbstractTableModel, QSortFilterProxyModel, QModelIndex,
+                          QRect, QSize, QEvent, QTimer, pyqtSignal)
+from PyQt5.QtGui import QFont, QColor, QPen, QPainter
+
+NAME_COLUMN, STATUS_COLUMN, DESCRIPTION_COLUMN = range(3)
+
+StatusRole = Qt.UserRole + 1
+DescriptionRole = Qt.UserRole + 2
+UpdatedRole = Qt.UserRole + 3  # time.monotonic() of the last known status, or None
+
+STATUS_UNKNOWN = 'unknown'
+
+LIGHT_THEME = {
+    'background': '#ffffff',
+    'hover_background': '#f8f9fa',
+    'border': '#e1e1e1',
+    'hover_border': '#d1d1d1',
+    'text': '#323130',
+    'secondary_text': '#666666',
+    'button': '#0078d4',
+    'view_background': '#f5f5f5'
+}
+
+DARK_THEME = {
+    'background': '#2d2d2d',
+    'hover_background': '#353535',
+    'border': '#404040',
+    'hover_border': '#505050',
+    'text': '#ffffff',
+    'secondary_text': '#b3b3b3',
+    'button': '#0078d4',
+    'view_background': '#2d2d2d'
+}
+
+
+class BrowserListModel(QAbstractTableModel):
+    """One row per browser: name, status and description"""
+    HEADERS = ("Browser", "Status", "Description")
+
+    def __init__(self, browsers=(), parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._row_of = {}
+        self.set_browsers(browsers)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name, status, description, updated = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return (name, status, description)[index.column()]
+        if role == StatusRole:
+            return status
+        if role == DescriptionRole:
+            return description
+        if role == UpdatedRole:
+            return updated
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def set_browsers(self, browsers, descriptions=None):
+        """Replace the browser list; statuses of browsers already shown are kept"""
+        descriptions = descriptions or {}
+        old_rows = {row[0]: row for row in self._rows}
+        self.beginResetModel()
+        self._rows = [[name, old_rows[name][1] if name in old_rows else STATUS_UNKNOWN,
+                       descriptions.get(name) or f"Manage {name} browser",
+                       old_rows[name][3] if name in old_rows else None]
+                      for name in browsers]
+        self._row_of = {row[0]: i for i, row in enumerate(self._rows)}
+        self.endResetModel()
+
+    def add_browser(self, name, description=None):
+        if name in self._row_of:
+            return
+        row = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.append([name, STATUS_UNKNOWN, description or f"Manage {name} browser", None])
+        self._row_of[name] = row
+        self.endInsertRows()
+
+    def browsers(self):
+        return [row[0] for row in self._rows]
+
+    def status(self, name):
+        row = self._row_of.get(name)
+        return self._rows[row][1] if row is not None else None
+
+    def updated(self, name):
+        """time.monotonic() when the browser's status was last reported, or None"""
+        row = self._row_of.get(name)
+        return self._rows[row][3] if row is not None else None
+
+    def set_statuses(self, statuses):
+        """Apply {browser: status}; unknown browsers are appended as new rows"""
+        changed = []
+        now = time.monotonic()
+        for name, status in statuses.items():
+            row = self._row_of.get(name)
+            if row is None:
+                self.add_browser(name)
+                row = self._row_of[name]
+            if status != STATUS_UNKNOWN:
+                self._rows[row][3] = now  # An unknown status says nothing new
+            if self._rows[row][1] != status:
+                self._rows[row][1] = status
+                changed.append(row)
+        self._emit_changed(changed)
+
+    def _emit_changed(self, rows):
+        """Emit one dataChanged per contiguous run of changed rows"""
+        if not rows:
+            return
+        rows.sort()
+        start = previous = rows[0]
+        for row in rows[1:] + [None]:
+            if row is not None and row == previous + 1:
+                previous = row
+                continue
+            self.dataChanged.emit(self.index(start, 0), self.index(previous, self.columnCount() - 1),
+                                  [Qt.DisplayRole, StatusRole, UpdatedRole])
+            if row is not None:
+                start = previous = row
+
+
+class BrowserFilterModel(QSortFilterProxyModel):
+    """Filters rows by status and name; sorts by name or by status"""
+
+    def __init__(self, status_order=(), parent=None):
+        super().__init__(parent)
+        self.status_filter = None
+        self.status_order = {status: i for i, status in enumerate(status_order)}
+        self.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.setFilterKeyColumn(NAME_COLUMN)
+        self.setDynamicSortFilter(True)
+
+    def set_status_filter(self, status):
+        """Show only rows with this status, or every row for None"""
+        self.status_filter = status
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.status_filter is not None:
+            index = self.sourceModel().index(source_row, NAME_COLUMN, source_parent)
+            if index.data(StatusRole) != self.status_filter:
+                return False
+        return super().filterAcceptsRow(source_row, source_parent)
+
+    def lessThan(self, left, right):
+        if left.column() == STATUS_COLUMN:
+            left_rank = self.status_order.get(left.data(StatusRole), len(self.status_order))
+            right_rank = self.status_order.get(right.data(StatusRole), len(self.status_order))
+            if left_rank != right_rank:
+                return left_rank < right_rank
+            # Same status: keep names in order
+            return (left.sibling(left.row(), NAME_COLUMN).data().lower()
+                    < right.sibling(right.row(), NAME_COLUMN).data().lower())
+        return str(left.data()).lower() < str(right.data()).lower()
+
+
+class BrowserCardDelegate(QStyledItemDelegate):
+    """Paints a browser row as a card with a status dot or an action button"""
+    button_clicked = pyqtSignal(str)
+
+    DETECTION_MODE = 'detection'
+    ACTION_MODE = 'action'
+    CARD_HEIGHT = 80
+    MARGIN = 4
+    ICON_SIZE = 32
+
+    def __init__(self, mode, status_colors=None, status_labels=None, show_status_labels=False,
+                 button_text="Open", parent=None):
+        super().__init__(parent)
+        self.mode = mode
+        self.status_colors = status_colors or {}
+        self.status_labels = status_labels or {}
+        self.show_status_labels = show_status_labels
+        self.button_text = button_text
+        self.stale_after = None  # Seconds after which a status is shown as stale
+        self.icon_for = None  # name -> QPixmap, or None while it loads; None paints no icons
+        self.theme = LIGHT_THEME
+        self.is_dark_mode = False
+        self.name_font = QFont('Segoe UI', 11, QFont.Bold)
+        self.desc_font = QFont('Segoe UI', 9)
+        self.button_font = QFont('Segoe UI', 9, QFont.Bold)
+
+    def set_dark_mode(self, enabled):
+        self.is_dark_mode = enabled
+        self.theme = DARK_THEME if enabled else LIGHT_THEME
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.CARD_HEIGHT + 2 * self.MARGIN)
+
+    def card_rect(self, option_rect):
+        return option_rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+
+    def button_rect(self, card):
+        return QRect(card.right() - 20 - 80, card.center().y() - 17, 80, 35)
+
+    def paint(self, painter, option, index):
+        theme = self.theme
+        card = self.card_rect(option.rect)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(QColor(theme['hover_border' if hovered else 'border'])))
+        painter.setBrush(QColor(theme['hover_background' if hovered else 'background']))
+        painter.drawRoundedRect(card, 8, 8)
+
+        # Left side - icon, browser name and description
+        text_rect = card.adjusted(20, 15, -140, -15)
+        if self.icon_for is not None:
+            icon_rect = QRect(card.left() + 16, card.center().y() - self.ICON_SIZE // 2,
+                              self.ICON_SIZE, self.ICON_SIZE)
+            self.paint_icon(painter, icon_rect, index.data(Qt.DisplayRole))
+            text_rect.setLeft(icon_rect.right() + 12)
+        half = text_rect.height() // 2
+        painter.setFont(self.name_font)
+        painter.setPen(QColor(theme['text']))
+        painter.drawText(text_rect.adjusted(0, 0, 0, -half), Qt.AlignLeft | Qt.AlignVCenter,
+                         index.data(Qt.DisplayRole))
+        painter.setFont(self.desc_font)
+        painter.setPen(QColor(theme['secondary_text']))
+        painter.drawText(text_rect.adjusted(0, half, 0, 0), Qt.AlignLeft | Qt.AlignVCenter,
+                         index.data(DescriptionRole))
+
+        # Right side - status dot or action button
+        if self.mode == self.DETECTION_MODE:
+            status = index.data(StatusRole)
+            color = QColor(self.status_colors.get(status, '#8a8886'))
+            age = self.status_age(index)
+            if age is not None:
+                color.setAlpha(110)  # Faded until the browser is detected again
+            dot = QRect(card.right() - 20 - 16, card.center().y() - 8, 16, 16)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(color)
+            painter.drawEllipse(dot)
+            label = self.status_labels.get(status) if self.show_status_labels else None
+            if label:
+                painter.setFont(self.button_font)
+                painter.setPen(color)
+                painter.drawText(QRect(dot.left() - 130, card.top(), 120, card.height()),
+                                 Qt.AlignRight | Qt.AlignVCenter, label)
+            if age is not None:
+                painter.setFont(self.desc_font)
+                painter.setPen(QColor(theme['secondary_text']))
+                painter.drawText(QRect(dot.left() - 150, dot.bottom() + 4, dot.right() - dot.left() + 150, 16),
+                                 Qt.AlignRight | Qt.AlignVCenter, f"Stale, {age:.0f} s old")
+        else:
+            button = self.button_rect(card)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(theme['button']))
+            painter.drawRoundedRect(button, 4, 4)
+            painter.setFont(self.button_font)
+            painter.setPen(QColor('white'))
+            painter.drawText(button, Qt.AlignCenter, self.button_text)
+            # Small status dot once detection has reported this browser
+            status = index.data(StatusRole)
+            if status in self.status_colors:
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(QColor(self.status_colors[status]))
+                painter.drawEllipse(QRect(button.left() - 20, card.center().y() - 5, 10, 10))
+        painter.restore()
+
+    def paint_icon(self, painter, rect, name):
+        pixmap = self.icon_for(name)
+        if pixmap is not None:
+            painter.drawPixmap(rect, pixmap)
+            return
+        # Placeholder until the icon has been loaded
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(self.theme['border']))
+        painter.drawRoundedRect(rect, 6, 6)
+        painter.setFont(self.name_font)
+        painter.setPen(QColor(self.theme['secondary_text']))
+        painter.drawText(rect, Qt.AlignCenter, name[:1].upper())
+
+    def status_age(self, index):
+        """Age in seconds of a stale status, None while it is fresh or never known"""
+        updated = index.data(UpdatedRole)
+        if self.stale_after is None or updated is None:
+            return None
+        age = time.monotonic() - updated
+        return age if age > self.stale_after else None
+
+    def editorEvent(self, event, model, option, index):
+        if (self.mode == self.ACTION_MODE and event.type() == QEvent.MouseButtonRelease
+                and event.button() == Qt.LeftButton
+                and self.button_rect(self.card_rect(option.rect)).contains(event.pos())):
+            self.button_clicked.emit(index.data(Qt.DisplayRole))
+            return True
+        return super().editorEvent(event, model, option, index)
+
+
+class BrowserListWidget(QWidget):
+    """Filter bar plus a virtualized list of browser cards"""
+    browser_clicked = pyqtSignal(str)
+    button_clicked = pyqtSignal(str)
+
+    def __init__(self, mode, status_colors=None, status_labels=None, show_status_labels=False,
+                 button_text="Open", parent=None):
+        super().__init__(parent)
+        self.model = BrowserListModel(parent=self)
+        self.proxy = BrowserFilterModel(status_order=list(status_colors or {}), parent=self)
+        self.proxy.setSourceModel(self.model)
+        self.delegate = BrowserCardDelegate(mode, status_colors, status_labels, show_status_labels,
+                                            button_text, parent=self)
+        self.delegate.button_clicked.connect(self.button_clicked)
+        self.status_labels = status_labels or {}
+        self.stale_timer = None
+        self.icon_cache = None
+        self.executables = {}
+        self.init_ui(status_colors or {})
+
+    def init_ui(self, status_colors):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # Filter bar
+        filter_layout = QHBoxLayout()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Filter browsers")
+        self.search_input.textChanged.connect(self.proxy.setFilterFixedString)
+        filter_layout.addWidget(self.search_input)
+
+        self.status_combo = QComboBox()
+        self.status_combo.addItem("All statuses", None)
+        for status in status_colors:
+            self.status_combo.addItem(self.status_labels.get(status, status.capitalize()), status)
+        self.status_combo.currentIndexChanged.connect(
+            lambda i: self.proxy.set_status_filter(self.status_combo.itemData(i)))
+        self.status_combo.setVisible(bool(status_colors))
+        filter_layout.addWidget(self.status_combo)
+
+        self.sort_combo = QComboBox()
+        self.sort_combo.addItem("Default order", -1)
+        self.sort_combo.addItem("Sort by name", NAME_COLUMN)
+        if status_colors:
+            self.sort_combo.addItem("Sort by status", STATUS_COLUMN)
+        self.sort_combo.currentIndexChanged.connect(
+            lambda i: self.proxy.sort(self.sort_combo.itemData(i)))
+        filter_layout.addWidget(self.sort_combo)
+        layout.addLayout(filter_layout)
+
+        # Only visible rows are painted
+        self.view = QListView()
+        self.view.setModel(self.proxy)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setUniformItemSizes(True)
+        self.view.setMouseTracking(True)
+        self.view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.view.setSelectionMode(QAbstractItemView.NoSelection)
+        self.view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.view.clicked.connect(lambda index: self.browser_clicked.emit(index.data(Qt.DisplayRole)))
+        layout.addWidget(self.view)
+        self.apply_theme()
+
+    def set_dark_mode(self, enabled):
+        self.delegate.set_dark_mode(enabled)
+        self.apply_theme()
+
+    def set_stale_after(self, seconds):
+        """Mark statuses older than seconds as stale; None turns it off"""
+        self.delegate.stale_after = seconds
+        if seconds is None:
+            if self.stale_timer is not None:
+                self.stale_timer.stop()
+            return
+        if self.stale_timer is None:
+            # Ages change without model updates, so repaint the visible rows periodically
+            self.stale_timer = QTimer(self)
+            self.stale_timer.timeout.connect(self.view.viewport().update)
+        self.stale_timer.start(1000)
+
+    def set_icons(self, icon_cache, executables):
+        """Show icons from icon_cache; executables maps browser names to their executables"""
+        self.executables = dict(executables)
+        if self.icon_cache is None:
+            self.icon_cache = icon_cache
+            icon_cache.icon_ready.connect(self.on_icon_ready)
+        self.delegate.icon_for = lambda name: self.icon_cache.pixmap(self.executables.get(name))
+        self.view.viewport().update()
+
+    def on_icon_ready(self, executable):
+        if executable in self.executables.values():
+            self.view.viewport().update()
+
+    def apply_theme(self):
+        self.view.setStyleSheet(
+            f"QListView {{ border: none; background-color: {self.delegate.theme['view_background']}; }}")
+        self.view.viewport().update()
@@ -0,0 +1,167 @@
+"""Profiles of the installed browsers, read from the browsers' own profile lists.
+
+Chromium based browsers list their profiles in the "Local State" JSON file
+of the user data directory (profile.info_cache, keyed by profile
+directory); Firefox lists them in profiles.ini. Each file is parsed once
+and kept in a ProfileIndex until its mtime or size changes, so looking a
+profile up when a URL is opened is a stat() and a dict lookup instead of a
+walk over the profile directories.
+
+launch_arguments() turns a profile into the command line that selects it:
+--profile-directory=<dir> for Chromium browsers and -P <name> for Firefox.
+
+Custom browsers can name a profile location in custom_browsers.json with
+"profile_root": a Chromium user data directory or a directory holding
+profiles.ini.
+"""
+import configparser
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+import browser_locations
+
+logger = logging.getLogger('browser_manager.profiles')
+
+LOCAL_STATE_FILE = 'Local State'
+PROFILES_INI_FILE = 'profiles.ini'
+
+KIND_CHROMIUM = 'chromium'
+KIND_FIREFOX = 'firefox'
+
+# key is what launch_arguments() passes to the browser: the profile
+# directory for Chromium, the profile name for Firefox
+Profile = namedtuple('Profile', 'key name path default')
+
+# One parsed profile list: the file it came from and when it was read
+ProfileList = namedtuple('ProfileList', 'kind source mtime_ns size profiles by_key')
+
+
+def parse_local_state(path):
+    """Return the profiles listed in a Chromium "Local State" file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    section = state.get('profile') or {}
+    info_cache = section.get('info_cache') or {}
+    last_used = section.get('last_used') or 'Default'
+    user_data_dir = os.path.dirname(path)
+    profiles = []
+    for directory, info in info_cache.items():
+        name = info.get('name') or directory if isinstance(info, dict) else directory
+        profiles.append(Profile(directory, name, os.path.join(user_data_dir, directory), directory == last_used))
+    return sorted(profiles, key=lambda profile: (not profile.default, profile.name.lower()))
+
+
+def parse_profiles_ini(path):
+    """Return the profiles listed in a Firefox profiles.ini file"""
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str  # Keys are case sensitive ("IsRelative", "Path")
+    with open(path, 'r', encoding='utf-8') as f:
+        parser.read_file(f)
+    root = os.path.dirname(path)
+    # Firefox 67+ records the default profile per installation in [Install*] sections
+    install_defaults = {parser.get(section, 'Default', fallback=None)
+                        for section in parser.sections() if section.startswith('Install')}
+    profiles = []
+    for section in parser.sections():
+        if not section.startswith('Profile') or not parser.has_option(section, 'Name'):
+            continue
+        name = parser.get(section, 'Name')
+        relative_path = parser.get(section, 'Path', fallback='')
+        relative = parser.get(section, 'IsRelative', fallback='1') == '1'
+        profile_path = os.path.normpath(os.path.join(root, relative_path) if relative else relative_path)
+        default = relative_path in install_defaults if install_defaults else parser.get(
+            section, 'Default', fallback='0') == '1'
+        profiles.append(Profile(name, name, profile_path, default))
+    return sorted(profiles, key=lambda profile: (not profile.default, profile.name.lower()))
+
+
+def profile_source(browser_name, profile_root=None):
+    """Return (kind, path of the profile list) of a browser, or None"""
+    if profile_root:
+        for kind, file_name in ((KIND_CHROMIUM, LOCAL_STATE_FILE), (KIND_FIREFOX, PROFILES_INI_FILE)):
+            path = os.path.join(profile_root, file_name)
+            if os.path.isfile(path):
+                return kind, path
+        return None
+    user_data_dir = browser_locations.chromium_user_data_dir(browser_name)
+    if user_data_dir:
+        return KIND_CHROMIUM, os.path.join(user_data_dir, LOCAL_STATE_FILE)
+    root = browser_locations.firefox_profile_root(browser_name)
+    if root:
+        return KIND_FIREFOX, os.path.join(root, PROFILES_INI_FILE)
+    return None
+
+
+def launch_arguments(kind, profile):
+    """Command line arguments that start a browser of the given kind in profile"""
+    if kind == KIND_CHROMIUM:
+        return [f'--profile-directory={profile.key}']
+    if kind == KIND_FIREFOX:
+        return ['-P', profile.key]
+    return []
+
+
+class ProfileIndex:
+    """Parsed profile lists per browser, re-read only when their file changes"""
+
+    def __init__(self):
+        self._lists = {}  # (browser, profile root) -> ProfileList
+        self._lock = threading.Lock()
+
+    def profile_list(self, browser_name, profile_root=None):
+        """Return the browser's ProfileList, or None when it has no profile list"""
+        browser_name = browser_locations.canonical_name(browser_name)
+        key = (browser_name, profile_root)
+        source = profile_source(browser_name, profile_root)
+        if source is None:
+            return None
+        kind, path = source
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._lists.get(key)
+            if (cached and cached.source == path and cached.mtime_ns == st.st_mtime_ns
+                    and cached.size == st.st_size):
+                return cached
+        parser = parse_local_state if kind == KIND_CHROMIUM else parse_profiles_ini
+        try:
+            profiles = tuple(parser(path))
+        except (OSError, ValueError, configparser.Error) as e:
+            logger.warning("could not read the profiles of %s from %s: %s", browser_name, path, e)
+            profiles = ()
+        parsed = ProfileList(kind, path, st.st_mtime_ns, st.st_size, profiles,
+                             {profile.key: profile for profile in profiles})
+        with self._lock:
+            self._lists[key] = parsed
+        return parsed
+
+    def profiles(self, browser_name, profile_root=None):
+        """Return the browser's profiles, the default one first"""
+        parsed = self.profile_list(browser_name, profile_root)
+        return parsed.profiles if parsed else ()
+
+    def launch_arguments(self, browser_name, profile_key, profile_root=None):
+        """Return the arguments selecting profile_key, or None if the browser has no such profile"""
+        parsed = self.profile_list(browser_name, profile_root)
+        profile = parsed.by_key.get(profile_key) if parsed else None
+        if profile is None:
+            return None
+        return launch_arguments(parsed.kind, profile)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_profile_index():
+    """Return the shared profile index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = ProfileIndex()
+        return _index
@@ -0,0 +1,203 @@
+"""Versioned, immutable registry of the browsers the app knows about.
+
+Every change (discovery, adding a custom browser) builds a complete new
+RegistrySnapshot with a higher generation and swaps it in with a single
+attribute assignment. Readers on any thread call current() without locking
+and keep using the snapshot they got; comparing generations tells them
+whether anything changed since they last looked.
+
+Browser versions come from the version index cache when a snapshot is
+built with probe=False; start_version_probe() then reads the executables
+that changed on a worker thread and publishes their versions as a new
+snapshot.
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+import profiler
+from browser_catalog import compile_catalog
+from version_probe import get_version_index, select_incognito_flag
+
+try:
+    import winreg
+except ImportError:
+    winreg = None  # Registry lookups are Windows only
+
+CUSTOM_BROWSERS_FILE = 'custom_browsers.json'
+
+# Common browser paths
+COMMON_BROWSER_PATHS = {
+    'Chrome': [
+        r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+        r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+        os.path.expanduser(r'~\AppData\Local\Google\Chrome\Application\chrome.exe')
+    ],
+    'Opera': [
+        r'C:\Program Files\Opera\launcher.exe',
+        r'C:\Program Files (x86)\Opera\launcher.exe',
+        os.path.expanduser(r'~\AppData\Local\Programs\Opera\launcher.exe')
+    ],
+    'Brave': [
+        r'C:\Program Files\BraveSoftware\Brave-Browser\Application\brave.exe',
+        r'C:\Program Files (x86)\BraveSoftware\Brave-Browser\Application\brave.exe',
+        os.path.expanduser(r'~\AppData\Local\BraveSoftware\Brave-Browser\Application\brave.exe')
+    ],
+    'Epic': [
+        r'C:\Program Files (x86)\Epic Privacy Browser\epic.exe',
+        os.path.expanduser(r'~\AppData\Local\Epic Privacy Browser\epic.exe')
+    ],
+    'Firefox': [
+        r'C:\Program Files\Mozilla Firefox\firefox.exe',
+        r'C:\Program Files (x86)\Mozilla Firefox\firefox.exe',
+        os.path.expanduser(r'~\AppData\Local\Mozilla Firefox\firefox.exe')
+    ],
+    'Edge': [
+        r'C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe',
+        r'C:\Program Files\Microsoft\Edge\Application\msedge.exe'
+    ]
+}
+
+BUILTIN_INCOGNITO_FLAGS = {
+    'Chrome': '--incognito',
+    'Opera': '--private',
+    'Brave': '--incognito',
+    'Epic': '--incognito',
+    'Firefox': '-private',
+    'Edge': '--inprivate'
+}
+
+RegistrySnapshot = namedtuple('RegistrySnapshot',
+                              'generation custom_browsers browser_paths incognito_flags catalog versions')
+
+
+def _frozen(mapping):
+    return MappingProxyType(dict(mapping))
+
+
+def discover_browser_paths(custom_browsers):
+    """Locate installed browsers via the App Paths registry key and common paths"""
+    paths = {}
+
+    # Try to get paths from registry
+    if winreg is not None:
+        try:
+            with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r'SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths') as key:
+                for browser in COMMON_BROWSER_PATHS:
+                    try:
+                        with winreg.OpenKey(key, f'{browser.lower()}.exe') as browser_key:
+                            path = winreg.QueryValue(browser_key, None)
+                            if path and os.path.exists(path):
+                                paths[browser] = path
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+
+    # Check common paths if registry lookup failed
+    for browser, possible_paths in COMMON_BROWSER_PATHS.items():
+        if browser not in paths:
+            for path in possible_paths:
+                if os.path.exists(path):
+                    paths[browser] = path
+                    break
+
+    # Add custom browsers
+    paths.update({name: info['path'] for name, info in custom_browsers.items()})
+    return paths
+
+
+class BrowserRegistry:
+    """Holds the current RegistrySnapshot and publishes new ones on change"""
+
+    def __init__(self, config_path=CUSTOM_BROWSERS_FILE):
+        self.config_path = config_path
+        self._write_lock = threading.Lock()
+        self._snapshot = RegistrySnapshot(0, _frozen({}), _frozen({}),
+                                          _frozen(BUILTIN_INCOGNITO_FLAGS), compile_catalog(), _frozen({}))
+
+    def current(self):
+        """Return the current snapshot; safe to call from any thread"""
+        return self._snapshot
+
+    @profiler.traced('config')
+    def load_custom_browsers(self):
+        try:
+            with open(self.config_path, 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_custom_browsers(self, custom_browsers):
+        with open(self.config_path, 'w') as f:
+            json.dump(custom_browsers, f, indent=4)
+
+    @profiler.traced('config')
+    def discover(self, probe=True):
+        """Load custom browsers, locate installed browsers and publish the result.
+
+        With probe=False versions are only taken from the cache; the GUI calls
+        start_version_probe() afterwards.
+        """
+        with self._write_lock:
+            return self._publish(self.load_custom_browsers(), probe)
+
+    def add_custom_browser(self, browser_info, probe=True):
+        with self._write_lock:
+            custom_browsers = {name: dict(info) for name, info in self._snapshot.custom_browsers.items()}
+            custom_browsers[browser_info['name']] = {
+                'path': browser_info['path'],
+                'incognito_flag': browser_info['incognito_flag']
+            }
+            if browser_info.get('profile_root'):
+                custom_browsers[browser_info['name']]['profile_root'] = browser_info['profile_root']
+            self.save_custom_browsers(custom_browsers)
+            return self._publish(custom_browsers, probe)
+
+    def probe_versions(self):
+        """Probe the executables whose version is not cached and publish the result.
+
+        Reading a changed executable can take a while; call this off the GUI thread.
+        """
+        get_version_index().versions(self._snapshot.browser_paths)
+        with self._write_lock:
+            current = self._snapshot
+            # Only the cache is read here, so adding a browser meanwhile does not wait for probing
+            versions = get_version_index().cached_versions(current.browser_paths)
+            if versions == dict(current.versions):
+                return current
+            custom_browsers = {name: dict(info) for name, info in current.custom_browsers.items()}
+            return self._build(custom_browsers, dict(current.browser_paths), versions)
+
+    def start_version_probe(self, on_done=None):
+        """Run probe_versions() on a worker thread; on_done(snapshot) is called on that thread"""
+        def run():
+            snapshot = self.probe_versions()
+            if on_done is not None:
+                on_done(snapshot)
+        threading.Thread(target=run, name='version-probe', daemon=True).start()
+
+    def _publish(self, custom_browsers, probe=True):
+        """Build a complete snapshot off to the side, then swap it in atomically"""
+        browser_paths = discover_browser_paths(custom_browsers)
+        index = get_version_index()
+        versions = index.versions(browser_paths) if probe else index.cached_versions(browser_paths)
+        return self._build(custom_browsers, browser_paths, versions)
+
+    def _build(self, custom_browsers, browser_paths, versions):
+        # Built-in flags follow the installed version, custom ones are used as given
+        flags = {name: select_incognito_flag(name, versions.get(name), flag)
+                 for name, flag in BUILTIN_INCOGNITO_FLAGS.items()}
+        flags.update({name: info['incognito_flag'] for name, info in custom_browsers.items()})
+        snapshot = RegistrySnapshot(
+            generation=self._snapshot.generation + 1,
+            custom_browsers=_frozen({name: _frozen(info) for name, info in custom_browsers.items()}),
+            browser_paths=_frozen(browser_paths),
+            incognito_flags=_frozen(flags),
+            catalog=compile_catalog(custom_browsers),
+            versions=_frozen(versions)
+        )
+        self._snapshot = snapshot
+        return snapshot
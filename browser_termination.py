@@ -0,0 +1,130 @@
+"""Process tree termination for browsers.
+
+Browsers are closed by resolving the exact process tree recorded in the last
+detection snapshot, asking it to close gracefully and only force-killing what
+is still alive after a timeout.
+"""
+import os
+
+import psutil
+
+import profiler
+from browser_catalog import default_catalog
+from process_source import get_process_source
+from session_index import filter_scope
+
+GRACEFUL_TIMEOUT = 3.0
+KILL_TIMEOUT = 2.0
+
+
+def scan_processes(browser_name, catalog=None, scope=None):
+    """Take a fresh snapshot of the processes that belong to browser_name.
+
+    With a session_index.Scope only the processes of that user or session
+    are returned, so other users' browsers are never touched.
+    """
+    catalog = catalog or default_catalog()
+    attrs = catalog.identity_attrs + ('create_time',) + (scope.attrs if scope else ())
+    records = filter_scope(get_process_source().snapshot(attrs), scope)
+    return [(record.pid, record.create_time) for record in records
+            if catalog.classify_browser(record.name, record.exe) == browser_name]
+
+
+def resolve_process_tree(entries):
+    """Resolve snapshot entries into live processes plus all their descendants.
+
+    Returns (processes, denied). Entries whose PID has been reused by another
+    process since the snapshot (different create time) are skipped; denied
+    counts the processes that could not be inspected (AccessDenied) and so
+    cannot be closed either.
+    """
+    tree = {}
+    denied = 0
+    for pid, create_time in entries:
+        try:
+            proc = psutil.Process(pid)
+            if create_time is not None and abs(proc.create_time() - create_time) > 0.01:
+                continue
+            tree[proc.pid] = proc
+            for child in proc.children(recursive=True):
+                tree[child.pid] = child
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            continue
+        except psutil.AccessDenied:
+            denied += 1
+    return list(tree.values()), denied
+
+
+@profiler.traced('windows')
+def _close_windows(pids):
+    """Post WM_CLOSE to every top-level window owned by pids (Windows only)"""
+    import ctypes
+    from ctypes import wintypes
+
+    user32 = ctypes.windll.user32
+    WM_CLOSE = 0x0010
+    pids = set(pids)
+
+    @ctypes.WINFUNCTYPE(wintypes.BOOL, wintypes.HWND, wintypes.LPARAM)
+    def callback(hwnd, _lparam):
+        owner = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(owner))
+        if owner.value in pids and user32.IsWindowVisible(hwnd):
+            user32.PostMessageW(hwnd, WM_CLOSE, 0, 0)
+        return True
+
+    user32.EnumWindows(callback, 0)
+
+
+def request_close(procs):
+    """Ask processes to exit on their own: WM_CLOSE on Windows, SIGTERM elsewhere"""
+    if os.name == 'nt':
+        _close_windows(proc.pid for proc in procs)
+        return
+    for proc in procs:
+        try:
+            proc.terminate()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+
+
+def terminate_browser(browser_name, entries=None, catalog=None, scope=None, rescan=True):
+    """Close a browser's process tree and wait for it; returns (success, pids).
+
+    entries are the (pid, create_time) pairs of the last detection. When
+    there are none, or none of them is still the recorded process, and
+    rescan is set, the browser is looked up in a fresh snapshot instead, so
+    a stale snapshot never reports a running browser as closed. Processes
+    that could not be inspected make the result False.
+    """
+    procs, denied = resolve_process_tree(entries or ())
+    if rescan and not procs and not denied:
+        procs, denied = resolve_process_tree(scan_processes(browser_name, catalog, scope))
+    success = terminate_tree(procs) and not denied
+    return success, [proc.pid for proc in procs]
+
+
+@profiler.traced('termination')
+def terminate_tree(procs, graceful_timeout=GRACEFUL_TIMEOUT, kill_timeout=KILL_TIMEOUT):
+    """Close a process tree, escalating to kill, and wait until it has exited.
+
+    Returns True once every process is gone, False if some survived the kill.
+    """
+    if not procs:
+        return True
+
+    request_close(procs)
+    _, alive = psutil.wait_procs(procs, timeout=graceful_timeout)
+    if not alive:
+        return True
+
+    # Escalate: whatever ignored the close request gets killed
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+        except psutil.AccessDenied:
+            print(f"Access denied killing process {proc.pid}")
+    _, alive = psutil.wait_procs(alive, timeout=kill_timeout)
+    return not alive
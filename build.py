@@ -1,3 +1,4 @@
+import argparse
 import os
 import subprocess
 import sys
@@ -27,6 +28,7 @@ def install_requirements():
         "PyQt5==5.15.7",
         "psutil==5.9.4",
         "pygetwindow==0.0.9",
+        "lz4==4.3.3",
         "pyinstaller==6.14.1",
         "pillow"  # Latest compatible version
     ]
@@ -43,31 +45,33 @@ def verify_icon():
     if not os.path.exists("logo.ico"):
         raise FileNotFoundError("logo.ico file not found. Please ensure the file exists in the current directory.")
 
-def build_executable():
-    """Build the executable using PyInstaller"""
-    print("Building executable...")
+def build_executable(onefile=False):
+    """Build the executable using PyInstaller and browser_manager.spec"""
+    print(f"Building executable ({'onefile' if onefile else 'onedir'})...")
     try:
         # First, ensure PyInstaller is in PATH
         pyinstaller_path = os.path.join(os.path.dirname(sys.executable), 'Scripts', 'pyinstaller.exe')
         if not os.path.exists(pyinstaller_path):
             pyinstaller_path = 'pyinstaller'  # Fallback to PATH
 
+        # The spec excludes unused Qt modules and picks the layout from this variable
+        env = dict(os.environ, BROWSER_MANAGER_BUILD='onefile' if onefile else 'onedir')
         subprocess.check_call([
             pyinstaller_path,
             "--clean",
             "--noconfirm",
-            "--icon=logo.ico",
-            "--name=Browser Manager",
-            "--windowed",
-            "--onefile",
-            "app.py"
-        ])
+            "browser_manager.spec"
+        ], env=env)
     except subprocess.CalledProcessError as e:
         print(f"Error building executable: {e}")
         raise
 
 def main():
     """Main build process"""
+    parser = argparse.ArgumentParser(description="Build the Browser Manager executable")
+    parser.add_argument("--onefile", action="store_true",
+                        help="build a single executable; it unpacks itself on every launch and starts slower")
+    args = parser.parse_args()
     try:
         # Upgrade pip first
         upgrade_pip()
@@ -80,10 +84,14 @@ def main():
         verify_icon()
         
         # Build executable
-        build_executable()
+        build_executable(args.onefile)
         
         print("\nBuild completed successfully!")
-        print("You can find the executable in the 'dist' folder.")
+        if args.onefile:
+            print("You can find the executable in the 'dist' folder.")
+        else:
+            print("You can find the executable in the 'dist/Browser Manager' folder; ship the whole folder.")
+        print("Run 'python bench_startup.py --exe <executable>' to measure its startup time.")
         
     except Exception as e:
         print(f"\nError during build process: {e}")
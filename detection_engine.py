@@ -0,0 +1,105 @@
+"""Detection cycles with a deadline and cancellation inside the process scan.
+
+A DetectionCycle wraps one pass of browser detection. Its scan() reads the
+process table through iter_snapshot() and reports every browser the moment
+its first process is classified, instead of after the whole table has been
+read. The cycle checks its deadline and cancel flag before every process:
+
+- once the deadline has passed the scan stops where it is, and the caller
+  reports the browsers it could not decide as unknown;
+- once cancel() has been called the next check raises DetectionCancelled,
+  so a stopped detector does not finish a slow scan first.
+
+scan_sessions() does the same but partitions the snapshot into a
+SessionIndex, so detection only reports browsers in the app's scope while
+the other users' processes are still counted for the admin view. Reading a
+process's user is the most expensive attribute on Windows, so it is only
+read when the scope needs it or the caller asks for 'username'.
+
+The deadline defaults to DEFAULT_DEADLINE seconds and can be changed with
+BROWSER_MANAGER_DETECTION_DEADLINE=<seconds>.
+"""
+import logging
+import os
+import time
+
+import profiler
+from process_source import get_process_source
+from session_index import SessionIndex, ALL_PROCESSES
+
+logger = logging.getLogger('browser_manager.detection')
+
+DEADLINE_ENV_VAR = 'BROWSER_MANAGER_DETECTION_DEADLINE'
+DEFAULT_DEADLINE = 3.0
+
+
+def default_deadline():
+    """Return the configured per-cycle deadline in seconds"""
+    try:
+        return float(os.environ.get(DEADLINE_ENV_VAR, DEFAULT_DEADLINE))
+    except ValueError:
+        return DEFAULT_DEADLINE
+
+
+class DetectionCancelled(Exception):
+    """Raised inside a cycle after it has been cancelled"""
+
+
+class DetectionCycle:
+    """One detection pass with its own deadline and cancel flag"""
+
+    def __init__(self, deadline=None):
+        self.deadline = default_deadline() if deadline is None else deadline
+        self.started = time.monotonic()
+        self._expires = self.started + self.deadline
+        self.cancelled = False
+        self.expired = False
+
+    def cancel(self):
+        """Stop the cycle at its next check; safe to call from any thread"""
+        self.cancelled = True
+
+    def should_continue(self):
+        """Raise once cancelled; return False once the deadline has passed"""
+        if self.cancelled:
+            raise DetectionCancelled()
+        if not self.expired and time.monotonic() >= self._expires:
+            self.expired = True
+            logger.warning("detection cycle hit its %.1f s deadline", self.deadline)
+        return not self.expired
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def scan(self, catalog, attrs=(), on_found=None):
+        """Classify one process snapshot, calling on_found(browser) as browsers appear.
+
+        Returns (summaries, complete); complete is False when the deadline cut
+        the scan short, in which case browsers missing from summaries are
+        undecided rather than not running.
+        """
+        source = get_process_source()
+        with profiler.span('process snapshot', 'detection', source=source.name):
+            summaries = catalog.summarize(source.iter_snapshot(attrs, self.should_continue), on_found)
+        return summaries, not self.expired
+
+    def scan_sessions(self, catalog, attrs=(), scope=ALL_PROCESSES, on_found=None):
+        """Like scan(), but partition the snapshot by user and session.
+
+        Returns (index, complete). index.scoped holds the summaries in scope
+        and on_found(browser) only fires for browsers in scope. index.users
+        is only partitioned by user when 'username' is in attrs or the scope
+        is per user.
+        """
+        source = get_process_source()
+        attrs = tuple(attrs) + scope.attrs
+        index = SessionIndex(scope, per_user='username' in attrs)
+        with profiler.span('process snapshot', 'detection', source=source.name, scope=scope.kind):
+            for record in source.iter_snapshot(attrs, self.should_continue):
+                classification = catalog.classify(record)
+                if classification is None:
+                    continue
+                if index.add(record, classification) and on_found is not None:
+                    on_found(classification.browser)
+        index.finish()
+        return index, not self.expired
@@ -0,0 +1,371 @@
+"""Open URLs in an already running Chromium browser over the DevTools protocol.
+
+A browser started with --remote-debugging-port writes the port it listens on
+to <user data dir>/DevToolsActivePort. When that endpoint answers, tabs are
+opened, activated and navigated over its HTTP and WebSocket API instead of
+launching a new browser process. Connections are pooled per endpoint and kept
+open between requests.
+
+Callers that already know the endpoint (a browser started with a fixed
+--remote-debugging-port, or a test server) pass it as a (host, port) pair
+instead of having it looked up from the browser's user data directory.
+"""
+import base64
+import http.client
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from urllib.parse import quote, urlsplit
+
+import browser_locations
+
+logger = logging.getLogger('browser_manager.devtools')
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_TIMEOUT = 2.0
+
+
+class DevToolsError(Exception):
+    """Raised when a DevTools endpoint is unreachable or rejects a request"""
+
+
+class DevToolsConnectionError(DevToolsError):
+    """Raised when the WebSocket to the browser was closed under a request"""
+
+
+class DevToolsSocket:
+    """Minimal WebSocket client for the DevTools JSON-RPC channel"""
+
+    def __init__(self, ws_url, timeout=DEFAULT_TIMEOUT):
+        parts = urlsplit(ws_url)
+        self.sock = socket.create_connection((parts.hostname, parts.port or 80), timeout)
+        self._next_id = 0
+        self._buffer = b''
+        try:
+            self._handshake(parts.netloc, parts.path or '/')
+        except Exception:
+            self.sock.close()
+            raise
+
+    def _handshake(self, netloc, path):
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = (f"GET {path} HTTP/1.1\r\n"
+                   f"Host: {netloc}\r\n"
+                   "Upgrade: websocket\r\n"
+                   "Connection: Upgrade\r\n"
+                   f"Sec-WebSocket-Key: {key}\r\n"
+                   "Sec-WebSocket-Version: 13\r\n\r\n")
+        self.sock.sendall(request.encode())
+        while b'\r\n\r\n' not in self._buffer:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise DevToolsConnectionError("Connection closed during WebSocket handshake")
+            self._buffer += chunk
+        head, self._buffer = self._buffer.split(b'\r\n\r\n', 1)
+        if b' 101 ' not in head.split(b'\r\n', 1)[0]:
+            raise DevToolsError(f"WebSocket upgrade refused: {head.splitlines()[0].decode(errors='replace')}")
+
+    def _read_exact(self, count):
+        while len(self._buffer) < count:
+            chunk = self.sock.recv(max(4096, count - len(self._buffer)))
+            if not chunk:
+                raise DevToolsConnectionError("WebSocket connection closed")
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:count], self._buffer[count:]
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        # Client frames must be masked
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 1 << 16:
+            header += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('!Q', length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def _recv_message(self):
+        message = b''
+        while True:
+            first, second = self._read_exact(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', self._read_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', self._read_exact(8))[0]
+            mask = self._read_exact(4) if second & 0x80 else None
+            payload = self._read_exact(length)
+            if mask:
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+            if opcode == 0x8:
+                raise DevToolsConnectionError("WebSocket closed by browser")
+            if opcode == 0x9:
+                self._send_frame(0xA, payload)  # Answer pings
+                continue
+            if opcode in (0x0, 0x1, 0x2):
+                message += payload
+                if first & 0x80:
+                    return message
+
+    def call(self, method, params=None):
+        """Send a DevTools command and return its result"""
+        self._next_id += 1
+        message_id = self._next_id
+        request = {'id': message_id, 'method': method, 'params': params or {}}
+        self._send_frame(0x1, json.dumps(request).encode())
+        while True:
+            response = json.loads(self._recv_message())
+            if response.get('id') != message_id:
+                continue  # Events and stale replies
+            if 'error' in response:
+                raise DevToolsError(response['error'].get('message', str(response['error'])))
+            return response.get('result', {})
+
+    def close(self):
+        try:
+            self._send_frame(0x8, b'')
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class DevToolsClient:
+    """Persistent connection to one DevTools endpoint"""
+
+    def __init__(self, port, host=DEFAULT_HOST, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._http = None
+        self._sockets = {}
+        self._lock = threading.Lock()
+
+    def _request(self, method, path, retry=True):
+        if self._http is None:
+            self._http = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self._http.request(method, path)
+            response = self._http.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._http.close()
+            self._http = None
+            if retry:
+                return self._request(method, path, retry=False)
+            raise DevToolsError(f"DevTools endpoint {self.host}:{self.port} unreachable: {e}")
+        if response.status >= 400:
+            return response.status, None
+        try:
+            return response.status, json.loads(body) if body else None
+        except ValueError:
+            return response.status, body.decode(errors='replace')
+
+    def _socket(self, ws_url):
+        sock = self._sockets.get(ws_url)
+        if sock is None:
+            try:
+                sock = DevToolsSocket(ws_url, self.timeout)
+            except OSError as e:
+                raise DevToolsError(f"Cannot connect to {ws_url}: {e}")
+            self._sockets[ws_url] = sock
+        return sock
+
+    def _call(self, ws_url, method, params=None):
+        try:
+            return self._socket(ws_url).call(method, params)
+        except (OSError, DevToolsConnectionError):
+            # Drop the broken connection and retry once on a fresh one. An error
+            # reply is not retried: the browser has run the command already, and
+            # sending Target.createTarget again would open the URL twice
+            stale = self._sockets.pop(ws_url, None)
+            if stale:
+                stale.close()
+            try:
+                return self._socket(ws_url).call(method, params)
+            except OSError as e:
+                raise DevToolsConnectionError(f"DevTools call {method} failed: {e}")
+
+    def version(self):
+        with self._lock:
+            status, data = self._request('GET', '/json/version')
+        if status != 200 or not isinstance(data, dict):
+            raise DevToolsError(f"Unexpected /json/version response ({status})")
+        return data
+
+    def list_tabs(self):
+        """Return the page targets of the browser"""
+        with self._lock:
+            status, data = self._request('GET', '/json/list')
+        if status != 200 or not isinstance(data, list):
+            raise DevToolsError(f"Unexpected /json/list response ({status})")
+        return [target for target in data if target.get('type') == 'page']
+
+    def find_tab(self, url_partial):
+        url_partial = url_partial.lower()
+        for tab in self.list_tabs():
+            if url_partial in tab.get('url', '').lower():
+                return tab
+        return None
+
+    def new_tab(self, url):
+        path = '/json/new?' + quote(url, safe='')
+        with self._lock:
+            # Newer Chromium releases only accept PUT here
+            status, data = self._request('PUT', path)
+            if status == 405:
+                status, data = self._request('GET', path)
+        if status != 200:
+            raise DevToolsError(f"Could not open a new tab ({status})")
+        return data
+
+    def new_private_window(self, url):
+        """Open url in a new window of a fresh off-the-record browser context"""
+        ws_url = self.version()['webSocketDebuggerUrl']
+        with self._lock:
+            context = self._call(ws_url, 'Target.createBrowserContext', {'disposeOnDetach': False})
+            return self._call(ws_url, 'Target.createTarget', {
+                'url': url,
+                'newWindow': True,
+                'browserContextId': context['browserContextId']
+            })
+
+    def activate(self, tab):
+        with self._lock:
+            status, _ = self._request('GET', f"/json/activate/{tab['id']}")
+        return status == 200
+
+    def navigate(self, tab, url):
+        with self._lock:
+            return self._call(tab['webSocketDebuggerUrl'], 'Page.navigate', {'url': url})
+
+    def close_tabs(self, host, private=False):
+        """Close the tabs showing a page on host; returns how many were closed.
+
+        Only tabs of the default browser context are closed unless private is
+        set, in which case only tabs of off-the-record contexts are.
+        """
+        ws_url = self.version()['webSocketDebuggerUrl']
+        with self._lock:
+            contexts = set(self._call(ws_url, 'Target.getBrowserContexts').get('browserContextIds', ()))
+            targets = self._call(ws_url, 'Target.getTargets').get('targetInfos', ())
+            closed = 0
+            for target in targets:
+                if target.get('type') != 'page' or (target.get('browserContextId') in contexts) != private:
+                    continue
+                target_host = (urlsplit(target.get('url', '')).hostname or '').lower()
+                if target_host == host or target_host.endswith('.' + host):
+                    self._call(ws_url, 'Target.closeTarget', {'targetId': target['targetId']})
+                    closed += 1
+            return closed
+
+    def close(self):
+        with self._lock:
+            if self._http:
+                self._http.close()
+                self._http = None
+            for sock in self._sockets.values():
+                sock.close()
+            self._sockets.clear()
+
+
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def get_client(port, host=DEFAULT_HOST):
+    """Return the pooled client for an endpoint, creating it on first use"""
+    with _pool_lock:
+        client = _pool.get((host, port))
+        if client is None:
+            client = DevToolsClient(port, host)
+            _pool[(host, port)] = client
+        return client
+
+
+def discard_client(port, host=DEFAULT_HOST):
+    with _pool_lock:
+        client = _pool.pop((host, port), None)
+    if client:
+        client.close()
+
+
+def read_active_port(user_data_dir):
+    """Read the port from the DevToolsActivePort file Chromium writes at startup"""
+    try:
+        with open(os.path.join(user_data_dir, 'DevToolsActivePort'), 'r') as f:
+            return int(f.readline().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def find_endpoint(browser_name, endpoint=None):
+    """Return a live client for the browser's debugging endpoint, or None.
+
+    endpoint is a (host, port) pair; without it the port is read from the
+    browser's DevToolsActivePort file and the host is DEFAULT_HOST.
+    """
+    if endpoint is None:
+        user_data_dir = browser_locations.chromium_user_data_dir(browser_name)
+        if not user_data_dir:
+            return None
+        port = read_active_port(user_data_dir)
+        if not port:
+            return None
+        host = DEFAULT_HOST
+    else:
+        host, port = endpoint
+    client = get_client(port, host)
+    try:
+        client.version()
+    except DevToolsError:
+        # Stale DevToolsActivePort left behind by a browser that has exited
+        discard_client(port, host)
+        return None
+    return client
+
+
+def close_tabs(browser_name, host, private=False, endpoint=None):
+    """Close the browser's tabs on host; returns the number closed, or None without an endpoint"""
+    client = find_endpoint(browser_name, endpoint)
+    if client is None:
+        return None
+    try:
+        return client.close_tabs(host, private)
+    except (DevToolsError, KeyError) as e:
+        logger.warning("DevTools request to %s failed: %s", browser_name, e)
+        return None
+
+
+def open_url(browser_name, url, private=False, reuse_existing=False, endpoint=None):
+    """Open url in the running browser; returns False when no endpoint handled it.
+
+    With reuse_existing, a tab already showing url is activated and reloaded
+    instead of opening another one. endpoint is passed on to find_endpoint().
+    """
+    client = find_endpoint(browser_name, endpoint)
+    if client is None:
+        return False
+    try:
+        if reuse_existing:
+            tab = client.find_tab(urlsplit(url).netloc or url)
+            if tab:
+                client.activate(tab)
+                client.navigate(tab, url)
+                return True
+        if private:
+            client.new_private_window(url)
+        else:
+            client.new_tab(url)
+        return True
+    except (DevToolsError, KeyError) as e:
+        logger.warning("DevTools request to %s failed: %s", browser_name, e)
+        return False
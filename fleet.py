@@ -0,0 +1,647 @@
+"""Fleet mode: detection agents on many hosts reporting to one aggregator.
+
+An agent runs the normal detection cycle on its host and keeps a TCP
+connection to the aggregator. It sends its full status table once per
+connection and after that only the browsers whose status changed, batched
+per detection cycle (a cycle with no changes sends a heartbeat). If the
+connection drops the agent reconnects with exponential backoff.
+
+The aggregator is a single selectors loop: it does work only when a host
+sends something, so its CPU use follows the number of changes, not the
+number of hosts. It can send commands back to a host (open a URL, close a
+browser), which the agent runs with the same launch and termination code
+as the desktop app.
+
+The aggregator listens on 127.0.0.1 unless told to bind elsewhere, and
+only talks to agents whose hello carries the shared secret from
+BROWSER_MANAGER_FLEET_SECRET (an aggregator without one makes one up and
+logs it). The secret travels in clear text, so bind to other interfaces
+only on a trusted network. A connection that has not said hello within
+HELLO_TIMEOUT seconds is dropped. Agents only open http and https URLs.
+
+Wire format: one compact JSON object per line.
+
+    agent -> aggregator   {"t":"h","n":host,"k":secret} hello
+                          {"t":"f","s":{browser:status}} full table
+                          {"t":"d","s":{browser:status}} changes only
+                          {"t":"p"}                      heartbeat
+                          {"t":"r","i":id,"ok":bool,"m":message}
+    aggregator -> agent   {"t":"c","i":id,"a":"open"|"close","b":browser,"u":url}
+
+The desktop app runs as an agent with `app.py --agent HOST:PORT` and shows
+a Fleet page fed by an aggregator with `app.py --aggregator [PORT]`.
+
+Try it locally with a few agents standing in for machines:
+
+    export BROWSER_MANAGER_FLEET_SECRET=lab-secret
+    python fleet.py aggregate --port 47800
+    python fleet.py agent --connect 127.0.0.1:47800 --name lab-01
+    python fleet.py agent --connect 127.0.0.1:47800 --name lab-02
+
+bench_fleet.py does the same with any number of agent processes and
+measures the aggregator's CPU use.
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import secrets
+import selectors
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+
+import browser_locations
+import browser_termination
+import devtools
+from audit_journal import get_journal, EVENT_LAUNCH, EVENT_TERMINATE
+from browser_registry import BrowserRegistry
+from detection_engine import DetectionCycle, DetectionCancelled
+from session_index import default_scope
+
+logger = logging.getLogger('browser_manager.fleet')
+
+DEFAULT_PORT = 47800
+DEFAULT_BIND = '127.0.0.1'
+SECRET_ENV_VAR = 'BROWSER_MANAGER_FLEET_SECRET'
+HELLO_TIMEOUT = 10.0  # Seconds a new connection has to say hello
+MAX_MESSAGE_BYTES = 1024 * 1024  # Longest line the aggregator buffers
+DETECTION_INTERVAL = 5.0  # Seconds between agent detection cycles
+RECONNECT_MIN = 0.5
+RECONNECT_MAX = 30.0
+OFFLINE_AFTER = 3  # Missed detection intervals before a host is shown offline
+
+STATUS_RUNNING = 'running'
+STATUS_PRIVATE = 'private'
+STATUS_NOT_RUNNING = 'not_running'
+STATUS_UNKNOWN = 'unknown'
+STATUS_OFFLINE = 'offline'
+
+ACTION_OPEN = 'open'
+ACTION_CLOSE = 'close'
+
+URL_SCHEMES = ('http', 'https')
+
+
+def fleet_secret(secret=None):
+    """The shared secret agents present in their hello, or None if not configured"""
+    return secret or os.environ.get(SECRET_ENV_VAR) or None
+
+
+def is_openable_url(url):
+    """Whether a URL sent by the aggregator may be passed to a browser"""
+    if not isinstance(url, str) or not url or url != url.strip() or not url.isprintable():
+        return False
+    parts = urlsplit(url)
+    return parts.scheme.lower() in URL_SCHEMES and bool(parts.hostname)
+
+
+def launch_command(browser, path, incognito_flag, url):
+    """argv that opens url in a new private window of browser.
+
+    "--" ends the switches, so nothing in url is read as one. Firefox does
+    not document "--", but it only gets URLs is_openable_url() accepted,
+    which cannot start with "-".
+    """
+    command = [path] + ([incognito_flag] if incognito_flag else [])
+    if browser not in browser_locations.FIREFOX_PROFILE_ROOTS:
+        command.append('--')
+    return command + [url]
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def parse_address(address, default_port=DEFAULT_PORT):
+    host, _, port = address.rpartition(':')
+    if not host:
+        return address, default_port
+    return host, int(port)
+
+
+def diff_statuses(old, new):
+    """Statuses that changed from old to new; removed browsers map to None"""
+    delta = {browser: status for browser, status in new.items() if old.get(browser) != status}
+    delta.update({browser: None for browser in old if browser not in new})
+    return delta
+
+
+def is_status_table(statuses):
+    """True for a {browser: status or None} mapping as agents send it"""
+    return isinstance(statuses, dict) and all(
+        isinstance(browser, str) and (status is None or isinstance(status, str))
+        for browser, status in statuses.items())
+
+
+class _LineBuffer:
+    """Splits a byte stream into JSON messages"""
+
+    def __init__(self):
+        self.data = b''
+
+    def feed(self, chunk):
+        self.data += chunk
+        *lines, self.data = self.data.split(b'\n')
+        messages = []
+        for line in lines:
+            try:
+                messages.append(json.loads(line))
+            except ValueError:
+                logger.warning("dropping malformed fleet message")
+        return messages
+
+
+class FleetAgent:
+    """Runs detection on this host and pushes status deltas to an aggregator"""
+
+    def __init__(self, address, name=None, interval=DETECTION_INTERVAL, registry=None, scope=None, secret=None):
+        self.address = address
+        self.name = name or socket.gethostname()
+        self.secret = fleet_secret(secret)
+        if not self.secret:
+            raise ValueError(f"Set {SECRET_ENV_VAR} to the aggregator's secret")
+        self.interval = interval
+        self.registry = registry or BrowserRegistry()
+        self.scope = scope or default_scope()
+        self.statuses = {}
+        self._sock = None
+        self._send_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._cycle = None
+
+    def stop(self):
+        self._stopped = True
+        if self._cycle is not None:
+            self._cycle.cancel()
+        self._wake.set()
+        self._close()
+
+    def run(self):
+        """Detect and report until stop(); reconnects after every failure"""
+        if not self.registry.current().generation:
+            self.registry.discover()
+        delay = RECONNECT_MIN
+        while not self._stopped:
+            try:
+                self._connect()
+                delay = RECONNECT_MIN
+                self._report_loop()
+            except OSError as e:
+                if self._stopped:
+                    break
+                logger.warning("fleet connection to %s:%s lost (%s), retrying in %.1f s",
+                               *self.address, e, delay)
+                self._close()
+                self._wake.wait(delay)
+                self._wake.clear()
+                delay = min(delay * 2, RECONNECT_MAX)
+
+    def detect(self):
+        """One detection cycle; returns {browser: status} for every known browser"""
+        snapshot = self.registry.current()
+        catalog = snapshot.catalog
+        self._cycle = cycle = DetectionCycle()
+        index, complete = cycle.scan_sessions(catalog, catalog.required_attrs, self.scope)
+        statuses = {}
+        for browser in catalog.names:
+            summary = index.scoped.get(browser)
+            if summary is not None:
+                statuses[browser] = STATUS_PRIVATE if summary.private else STATUS_RUNNING
+            else:
+                statuses[browser] = STATUS_NOT_RUNNING if complete else STATUS_UNKNOWN
+        return statuses
+
+    def _connect(self):
+        sock = socket.create_connection(self.address, timeout=10)
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = sock
+        self._send({'t': 'h', 'n': self.name, 'k': self.secret})
+        self._send({'t': 'f', 's': self.statuses})  # Whatever we knew before the reconnect
+        threading.Thread(target=self._read_loop, args=(sock,), name='fleet-agent-reader', daemon=True).start()
+        logger.info("fleet agent %s connected to %s:%s", self.name, *self.address)
+
+    def _close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _send(self, message):
+        sock = self._sock
+        if sock is None:
+            raise OSError("not connected")
+        with self._send_lock:
+            sock.sendall(encode(message))
+
+    def _report_loop(self):
+        while not self._stopped:
+            try:
+                statuses = self.detect()
+            except DetectionCancelled:
+                return
+            # All changes of one cycle go out as one message
+            delta = diff_statuses(self.statuses, statuses)
+            self.statuses = statuses
+            self._send({'t': 'd', 's': delta} if delta else {'t': 'p'})
+            if self._sock is None:
+                raise OSError("connection closed")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _read_loop(self, sock):
+        buffer = _LineBuffer()
+        try:
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                for message in buffer.feed(chunk):
+                    if isinstance(message, dict) and message.get('t') == 'c':
+                        threading.Thread(target=self._run_command, args=(message,), daemon=True).start()
+        except OSError:
+            pass
+        if self._sock is sock:
+            self._close()
+            self._wake.set()  # Let the report loop notice and reconnect
+
+    def _run_command(self, message):
+        action, browser, url = message.get('a'), message.get('b'), message.get('u')
+        try:
+            if action == ACTION_OPEN:
+                ok, text = self.open_url(browser, url)
+            elif action == ACTION_CLOSE:
+                ok, text = self.close_browser(browser)
+            else:
+                ok, text = False, f"Unknown action {action}"
+        except Exception as e:
+            ok, text = False, str(e)
+        try:
+            self._send({'t': 'r', 'i': message.get('i'), 'ok': ok, 'm': text})
+        except OSError:
+            pass
+        self._wake.set()  # Report the effect without waiting for the next cycle
+
+    def open_url(self, browser, url):
+        if not is_openable_url(url):
+            return False, f"Refusing to open {url!r}: only http and https URLs are allowed"
+        snapshot = self.registry.current()
+        names = [name for name in snapshot.browser_paths if browser_locations.canonical_name(name) == browser]
+        if not names:
+            return False, f"{browser} is not installed on {self.name}"
+        name = names[0]
+        incognito_flag = snapshot.incognito_flags.get(name, '')
+        if devtools.open_url(name, url, private=bool(incognito_flag)):
+            method = 'devtools'
+        else:
+            path = snapshot.browser_paths[name]
+            subprocess.Popen(launch_command(browser, path, incognito_flag, url))
+            method = 'spawn'
+        get_journal().record(EVENT_LAUNCH, name, url, private=bool(incognito_flag), method=method,
+                             origin='fleet')
+        return True, f"Opening {url} in {name} on {self.name}"
+
+    def close_browser(self, browser):
+        success, pids = browser_termination.terminate_browser(browser, catalog=self.registry.current().catalog,
+                                                              scope=self.scope)
+        get_journal().record(EVENT_TERMINATE, browser, pids=pids, success=success, origin='fleet')
+        return success, f"{'Closed' if success else 'Failed to close'} {browser} on {self.name}"
+
+
+class _HostConnection:
+    __slots__ = ('sock', 'address', 'name', 'buffer', 'outgoing', 'accepted', 'last_seen', 'closed')
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.name = None
+        self.buffer = _LineBuffer()
+        self.outgoing = b''
+        self.accepted = self.last_seen = time.monotonic()
+        self.closed = False
+
+
+class FleetAggregator:
+    """Collects agent updates on one background thread.
+
+    on_update(host, statuses, full) is called on that thread with the
+    changed statuses (None values mean removed), full=True when they
+    replace the host's table; a host going offline is reported with every
+    browser set to STATUS_OFFLINE. on_result(host, command_id, ok, message)
+    reports command outcomes.
+
+    Agents must send secret in their hello; without one from the caller or
+    the environment a random secret is made up (secret_generated is set).
+    """
+
+    def __init__(self, port=DEFAULT_PORT, bind=DEFAULT_BIND, on_update=None, on_result=None,
+                 offline_after=OFFLINE_AFTER * DETECTION_INTERVAL, secret=None, hello_timeout=HELLO_TIMEOUT):
+        self.port = port
+        self.bind = bind
+        self.on_update = on_update
+        self.on_result = on_result
+        self.offline_after = offline_after
+        self.hello_timeout = hello_timeout
+        self.secret = fleet_secret(secret)
+        self.secret_generated = self.secret is None
+        if self.secret_generated:
+            self.secret = secrets.token_urlsafe(16)
+        self._lock = threading.Lock()
+        self._hosts = {}        # host -> {browser: status}
+        self._connections = {}  # host -> _HostConnection
+        self._unnamed = set()   # Connections still waiting for their hello
+        self._commands = []
+        self._next_command = 1
+        self._stopped = False
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._thread = None
+        self._last_expire = 0.0
+
+    def start(self):
+        self._listener = socket.create_server((self.bind, self.port))
+        self._listener.setblocking(False)
+        self.port = self._listener.getsockname()[1]
+        self._selector.register(self._listener, selectors.EVENT_READ, 'accept')
+        self._wake_r.setblocking(False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, 'wake')
+        self._thread = threading.Thread(target=self._loop, name='fleet-aggregator', daemon=True)
+        self._thread.start()
+        logger.info("fleet aggregator listening on %s:%s", self.bind, self.port)
+        if self.secret_generated:
+            logger.warning("no %s set; agents must use %s=%s", SECRET_ENV_VAR, SECRET_ENV_VAR, self.secret)
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(5.0)
+
+    def hosts(self):
+        """Copy of {host: {browser: status}}"""
+        with self._lock:
+            return {host: dict(statuses) for host, statuses in self._hosts.items()}
+
+    def send_command(self, host, action, browser, url=None):
+        """Queue a command for a host; returns its id, reported back through on_result"""
+        with self._lock:
+            command_id = self._next_command
+            self._next_command += 1
+            message = {'t': 'c', 'i': command_id, 'a': action, 'b': browser}
+            if url:
+                message['u'] = url
+            self._commands.append((host, message))
+        self._wake()
+        return command_id
+
+    def _wake(self):
+        try:
+            self._wake_w.send(b'x')
+        except OSError:
+            pass
+
+    def _loop(self):
+        while not self._stopped:
+            for key, events in self._selector.select(timeout=min(self.offline_after, self.hello_timeout) / 2):
+                if key.data == 'accept':
+                    self._accept()
+                elif key.data == 'wake':
+                    try:
+                        self._wake_r.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    self._flush_commands()
+                else:
+                    connection = key.data
+                    try:
+                        if events & selectors.EVENT_READ:
+                            self._read(connection)
+                        if events & selectors.EVENT_WRITE and not connection.closed:
+                            self._write(connection)
+                    except Exception:
+                        # One misbehaving peer must not stop the loop serving every host
+                        logger.exception("fleet connection from %s failed",
+                                         connection.name or connection.address)
+                        if not connection.closed:
+                            self._drop(connection)
+            self._expire()
+        for connection in list(self._connections.values()) + list(self._unnamed):
+            connection.sock.close()
+        self._listener.close()
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        connection = _HostConnection(sock, address)
+        self._unnamed.add(connection)
+        self._selector.register(sock, selectors.EVENT_READ, connection)
+
+    def _read(self, connection):
+        try:
+            chunk = connection.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b''
+        if not chunk:
+            self._drop(connection)
+            return
+        connection.last_seen = time.monotonic()
+        for message in connection.buffer.feed(chunk):
+            if not isinstance(message, dict):
+                logger.warning("fleet connection from %s sent a message that is not an object",
+                               connection.name or connection.address)
+                self._drop(connection)
+                return
+            self._handle(connection, message)
+            if connection.closed:
+                return
+        if len(connection.buffer.data) > MAX_MESSAGE_BYTES:
+            logger.warning("fleet connection from %s sent an oversized message", connection.name or connection.address)
+            self._drop(connection)
+
+    def _hello(self, connection, message):
+        """Name the connection after a hello with the right secret; drops it otherwise"""
+        key, name = message.get('k'), message.get('n')
+        if (message.get('t') != 'h' or not isinstance(key, str) or not isinstance(name, str) or not name
+                or not hmac.compare_digest(key.encode('utf-8'), self.secret.encode('utf-8'))):
+            logger.warning("fleet connection from %s:%s rejected: no valid hello", *connection.address[:2])
+            self._drop(connection)
+            return
+        self._unnamed.discard(connection)
+        connection.name = name
+        previous = self._connections.get(connection.name)
+        if previous is not None and previous is not connection:
+            self._drop(previous, notify=False)  # The agent reconnected
+        self._connections[connection.name] = connection
+
+    def _handle(self, connection, message):
+        kind = message.get('t')
+        if connection.name is None:
+            self._hello(connection, message)  # Nothing is accepted before the hello
+        elif kind in ('f', 'd'):
+            statuses = message.get('s', {})
+            if not is_status_table(statuses):
+                logger.warning("fleet host %s sent malformed statuses", connection.name)
+                self._drop(connection)
+                return
+            with self._lock:
+                table = self._hosts.setdefault(connection.name, {})
+                if kind == 'f':
+                    table.clear()
+                for browser, status in statuses.items():
+                    if status is None:
+                        table.pop(browser, None)
+                    else:
+                        table[browser] = status
+                if kind == 'f':
+                    statuses = dict(table)
+            if statuses:
+                self._notify(self.on_update, connection.name, statuses, kind == 'f')
+        elif kind == 'r':
+            self._notify(self.on_result, connection.name, message.get('i'), bool(message.get('ok')),
+                         message.get('m', ''))
+
+    @staticmethod
+    def _notify(callback, *args):
+        """Run an on_update/on_result callback; its errors are logged, not raised into the loop"""
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("fleet callback %r failed", callback)
+
+    def _flush_commands(self):
+        with self._lock:
+            commands, self._commands = self._commands, []
+        for host, message in commands:
+            connection = self._connections.get(host)
+            if connection is None:
+                self._notify(self.on_result, host, message['i'], False, f"{host} is offline")
+                continue
+            connection.outgoing += encode(message)
+            self._write(connection)
+
+    def _write(self, connection):
+        try:
+            sent = connection.sock.send(connection.outgoing)
+            connection.outgoing = connection.outgoing[sent:]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._drop(connection)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if connection.outgoing else 0)
+        self._selector.modify(connection.sock, events, connection)
+
+    def _expire(self):
+        now = time.monotonic()
+        if now - self._last_expire < 1.0:
+            return  # Checked at most once a second, however many hosts report
+        self._last_expire = now
+        for connection in list(self._unnamed):
+            if now - connection.accepted > self.hello_timeout:
+                logger.warning("fleet connection from %s:%s sent no hello", *connection.address[:2])
+                self._drop(connection)
+        for connection in list(self._connections.values()):
+            if now - connection.last_seen > self.offline_after:
+                logger.warning("fleet host %s stopped reporting", connection.name)
+                self._drop(connection)
+
+    def _drop(self, connection, notify=True):
+        connection.closed = True
+        self._unnamed.discard(connection)
+        try:
+            self._selector.unregister(connection.sock)
+        except (KeyError, ValueError):
+            pass
+        connection.sock.close()
+        if connection.name is None or self._connections.get(connection.name) is not connection:
+            return
+        del self._connections[connection.name]
+        if notify:
+            with self._lock:
+                table = self._hosts.get(connection.name, {})
+                for browser in table:
+                    table[browser] = STATUS_OFFLINE
+                statuses = dict(table)
+            if statuses:
+                self._notify(self.on_update, connection.name, statuses, True)
+
+
+def options_from_args(argv):
+    """Handle the desktop app's fleet switches; returns (options, argv without them)"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--agent', metavar='HOST:PORT')
+    parser.add_argument('--agent-name')
+    parser.add_argument('--aggregator', type=int, nargs='?', const=DEFAULT_PORT, metavar='PORT')
+    parser.add_argument('--aggregator-bind', default=DEFAULT_BIND, metavar='ADDRESS',
+                        help="interface to listen on (default: %(default)s)")
+    options, remaining = parser.parse_known_args(argv[1:])
+    return options, argv[:1] + remaining
+
+
+def run_agent(options):
+    """Run a headless agent for app.py --agent until interrupted"""
+    try:
+        agent = FleetAgent(parse_address(options.agent), options.agent_name)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 2
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    agent_parser = commands.add_parser('agent', help="report this host to an aggregator")
+    agent_parser.add_argument('--connect', required=True, metavar='HOST:PORT')
+    agent_parser.add_argument('--name', help="host name to report (default: this machine's)")
+    agent_parser.add_argument('--interval', type=float, default=DETECTION_INTERVAL)
+    aggregate_parser = commands.add_parser('aggregate', help="print the status of every reporting host")
+    aggregate_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    aggregate_parser.add_argument('--bind', default=DEFAULT_BIND, help="interface to listen on (default: %(default)s)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+    if args.command == 'agent':
+        try:
+            agent = FleetAgent(parse_address(args.connect), args.name, args.interval)
+        except ValueError as e:
+            parser.error(str(e))
+        try:
+            agent.run()
+        except KeyboardInterrupt:
+            agent.stop()
+        return
+
+    def print_update(host, statuses, full):
+        running = sorted(browser for browser, status in statuses.items() if status in (STATUS_RUNNING, STATUS_PRIVATE))
+        print(f"{host}: {'full' if full else 'delta'} {statuses} running={running}", flush=True)
+
+    aggregator = FleetAggregator(args.port, args.bind, on_update=print_update).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        aggregator.stop()
+
+
+if __name__ == "__main__":
+    main()
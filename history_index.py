@@ -0,0 +1,407 @@
+"""URL suggestions from the browsers' history and the app's own launches.
+
+A background thread syncs the index: each browser profile's history
+database (Chromium "History", Firefox "places.sqlite") is copied together
+with its -wal file to a temporary directory, because the running browser
+keeps the original locked, and only rows visited after the last sync are
+read from the copy. Databases whose mtime and size have not changed are
+not copied at all. Launches recorded in the audit journal count as visits
+too. Entries and sync marks are saved to history_index.json in the data
+directory.
+
+After a sync an immutable SearchSnapshot is built off to the side and
+swapped in with one assignment, like the browser registry. search() runs
+on the GUI thread against that snapshot only, never against a database:
+
+- text that looks like a URL ("office.com/la") is matched as a prefix of
+  the URLs without scheme and www., by bisecting a sorted list;
+- every word of the text is matched as a prefix of the words of the URLs
+  and titles through a token index. The word with the fewest postings
+  drives the search, its postings are walked best ranked first and the
+  other words are checked against the candidate, so a query stops after
+  SUGGESTION_LIMIT matches (or MAX_CANDIDATES postings) instead of ranking
+  every entry.
+
+    python history_index.py [--sync] office
+"""
+import argparse
+import bisect
+import heapq
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from PyQt5.QtCore import QStringListModel
+from PyQt5.QtWidgets import QCompleter
+
+import browser_locations
+from audit_journal import get_journal, EVENT_LAUNCH
+from browser_profiles import get_profile_index, KIND_CHROMIUM
+
+logger = logging.getLogger('browser_manager.history')
+
+HISTORY_INDEX_FILE = 'history_index.json'
+SYNC_INTERVAL = 120.0  # Seconds between background syncs
+MAX_ENTRIES = 20000  # Best ranked URLs kept in the index
+FIRST_SYNC_ROWS = 20000  # Rows read from a database that was never synced
+SUGGESTION_LIMIT = 10
+PREFIX_SCAN = 256  # URL prefix matches ranked per query
+MAX_CANDIDATES = 2000  # Postings checked per query; bounds words that rarely occur together
+LAUNCH_WEIGHT = 10  # A URL opened from the app counts as this many visits
+LAUNCH_SOURCE = 'launches'
+
+CHROMIUM_HISTORY_FILE = 'History'
+FIREFOX_HISTORY_FILE = 'places.sqlite'
+
+# Chromium stores times as microseconds since 1601-01-01
+WEBKIT_EPOCH_OFFSET = 11644473600
+
+# Rows visited after a mark, newest first: (url, title, visit count, last visit as stored)
+CHROMIUM_QUERY = ("SELECT url, title, visit_count, last_visit_time FROM urls "
+                  "WHERE hidden = 0 AND last_visit_time > ? ORDER BY last_visit_time DESC LIMIT ?")
+FIREFOX_QUERY = ("SELECT url, title, visit_count, last_visit_date FROM moz_places "
+                 "WHERE hidden = 0 AND last_visit_date > ? ORDER BY last_visit_date DESC LIMIT ?")
+
+TOKEN = re.compile(r'[a-z0-9]+')
+URL_PREFIX = re.compile(r'^(?:https?://)?(?:www\.)?', re.IGNORECASE)
+
+# Immutable search structures, swapped in whole after every sync:
+# urls/haystacks by rank (best first); keys, sorted stripped URLs with their
+# rank; tokens, sorted, with their postings (ranks, ascending) and the running
+# total of posting lengths so the size of a prefix range is two lookups
+SearchSnapshot = namedtuple('SearchSnapshot', 'urls haystacks keys key_ranks tokens postings totals')
+
+EMPTY_SNAPSHOT = SearchSnapshot((), (), [], [], [], [], [0])
+
+
+def strip_url(url):
+    """'https://www.office.com/x' -> 'office.com/x', the form URL prefixes are matched against"""
+    return URL_PREFIX.sub('', url.strip()).lower()
+
+
+def looks_like_url(text):
+    return '.' in text or '/' in text
+
+
+def history_sources():
+    """Yield (source id, kind, database path) for every history database on disk"""
+    profiles = get_profile_index()
+    for browser in list(browser_locations.CHROMIUM_USER_DATA_DIRS) + list(browser_locations.FIREFOX_PROFILE_ROOTS):
+        parsed = profiles.profile_list(browser)
+        if parsed is None:
+            continue
+        file_name = CHROMIUM_HISTORY_FILE if parsed.kind == KIND_CHROMIUM else FIREFOX_HISTORY_FILE
+        directories = [(profile.key, profile.path) for profile in parsed.profiles]
+        if not directories and parsed.kind == KIND_CHROMIUM:
+            # Opera keeps its only profile in the user data directory itself
+            directories = [('', os.path.dirname(parsed.source))]
+        for key, directory in directories:
+            path = os.path.join(directory, file_name)
+            if os.path.isfile(path):
+                yield f"{browser}/{key}", parsed.kind, path
+
+
+def _file_stamp(path):
+    """(mtime_ns, size) of a database and its -wal file; they change on every write"""
+    stamp = []
+    for name in (path, path + '-wal'):
+        try:
+            st = os.stat(name)
+            stamp += [st.st_mtime_ns, st.st_size]
+        except OSError:
+            stamp += [0, 0]
+    return stamp
+
+
+def read_new_rows(kind, path, mark):
+    """Copy a locked history database and return its rows visited after mark"""
+    query = CHROMIUM_QUERY if kind == KIND_CHROMIUM else FIREFOX_QUERY
+    limit = FIRST_SYNC_ROWS if not mark else -1
+    with tempfile.TemporaryDirectory(prefix='browser_manager_history_') as directory:
+        copy = os.path.join(directory, os.path.basename(path))
+        shutil.copyfile(path, copy)
+        if os.path.exists(path + '-wal'):
+            # Recent visits may still be in the write-ahead log only
+            shutil.copyfile(path + '-wal', copy + '-wal')
+        connection = sqlite3.connect(copy)
+        try:
+            return connection.execute(query, (mark, limit)).fetchall()
+        finally:
+            connection.close()
+
+
+def visit_time(kind, stored):
+    """Convert a stored last visit time to seconds since the epoch"""
+    if kind == KIND_CHROMIUM:
+        return stored / 1e6 - WEBKIT_EPOCH_OFFSET
+    return stored / 1e6
+
+
+def build_snapshot(entries):
+    """Rank entries and build the search structures for them"""
+    def score(item):
+        _, (_, last_visit, visits) = item
+        return sum(count * (LAUNCH_WEIGHT if source == LAUNCH_SOURCE else 1)
+                   for source, count in visits.items()), last_visit
+
+    ranked = heapq.nlargest(MAX_ENTRIES, entries.items(), key=score)
+    urls = tuple(url for url, _ in ranked)
+    haystacks = tuple(f"{strip_url(url)} {title.lower()}" for url, (title, _, _) in ranked)
+
+    keyed = sorted((strip_url(url), rank) for rank, url in enumerate(urls))
+    postings = {}
+    for rank, haystack in enumerate(haystacks):
+        for token in set(TOKEN.findall(haystack)):
+            postings.setdefault(token, array('I')).append(rank)
+    tokens = sorted(postings)
+    totals = [0]
+    for token in tokens:
+        totals.append(totals[-1] + len(postings[token]))
+    return SearchSnapshot(urls, haystacks, [key for key, _ in keyed], [rank for _, rank in keyed],
+                          tokens, [postings[token] for token in tokens], totals)
+
+
+def _prefix_range(sorted_list, prefix):
+    lo = bisect.bisect_left(sorted_list, prefix)
+    hi = bisect.bisect_left(sorted_list, prefix + '\uffff')
+    return lo, hi
+
+
+def search_snapshot(snapshot, text, limit=SUGGESTION_LIMIT):
+    """Return up to limit URLs matching text, best ranked first"""
+    text = text.strip().lower()
+    if not text:
+        return []
+    ranks = []
+    seen = set()
+
+    if looks_like_url(text):
+        lo, hi = _prefix_range(snapshot.keys, strip_url(text))
+        for rank in sorted(snapshot.key_ranks[lo:min(hi, lo + PREFIX_SCAN)])[:limit]:
+            ranks.append(rank)
+            seen.add(rank)
+
+    terms = TOKEN.findall(text)
+    if terms and len(ranks) < limit:
+        ranges = [_prefix_range(snapshot.tokens, term) for term in terms]
+        sizes = [snapshot.totals[hi] - snapshot.totals[lo] for lo, hi in ranges]
+        driver = sizes.index(min(sizes))
+        lo, hi = ranges[driver]
+        others = [term for i, term in enumerate(terms) if i != driver]
+        previous = None
+        # Postings are ascending ranks, so the merge yields the best entries first
+        for checked, rank in enumerate(heapq.merge(*snapshot.postings[lo:hi])):
+            if checked >= MAX_CANDIDATES:
+                break
+            if rank == previous:
+                continue  # Matched by several tokens with the prefix
+            previous = rank
+            if rank in seen:
+                continue
+            haystack = snapshot.haystacks[rank]
+            if all(term in haystack for term in others):
+                ranks.append(rank)
+                if len(ranks) >= limit:
+                    break
+    return [snapshot.urls[rank] for rank in ranks]
+
+
+class HistoryIndex:
+    """URL history of every browser, synced in the background and searched in memory"""
+
+    def __init__(self, path=None, interval=SYNC_INTERVAL):
+        self.path = path or browser_locations.data_path(HISTORY_INDEX_FILE)
+        self.interval = interval
+        self._entries = {}  # url -> [title, last visit, {source id: visits}]
+        self._marks = {}    # source id -> [stamp, last visit as stored in that database]
+        self._snapshot = EMPTY_SNAPSHOT
+        self._loaded = False
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        """Make the saved index searchable, before the first sync has finished"""
+        with self._sync_lock:
+            if not self._loaded:
+                self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                saved = json.load(f)
+            self._entries = saved.get('entries', {})
+            self._marks = saved.get('marks', {})
+        except (OSError, ValueError, AttributeError):
+            self._entries, self._marks = {}, {}
+        self._snapshot = build_snapshot(self._entries)
+        self._loaded = True
+
+    def _save(self):
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'w') as f:
+                json.dump({'entries': self._entries, 'marks': self._marks}, f, separators=(',', ':'))
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning("could not save history index %s: %s", self.path, e)
+
+    def _add(self, url, title, last_visit, source, visits):
+        if not url.startswith(('http://', 'https://')):
+            return
+        entry = self._entries.get(url)
+        if entry is None:
+            self._entries[url] = [title or '', last_visit, {source: visits}]
+            return
+        if title and last_visit >= entry[1]:
+            entry[0] = title
+        entry[1] = max(entry[1], last_visit)
+        entry[2][source] = visits
+
+    def _sync_database(self, source, kind, path):
+        """Index the rows of one database visited since its last sync; True if any were new"""
+        stamp = _file_stamp(path)
+        mark = self._marks.get(source, [None, 0])
+        if mark[0] == stamp:
+            return False
+        try:
+            rows = read_new_rows(kind, path, mark[1])
+        except (OSError, sqlite3.Error) as e:
+            logger.info("could not read history %s: %s", path, e)
+            return False
+        newest = mark[1]
+        for url, title, visits, stored in rows:
+            if stored:
+                self._add(url, title, visit_time(kind, stored), source, visits or 1)
+                newest = max(newest, stored)
+        self._marks[source] = [stamp, newest]
+        return bool(rows)
+
+    def _sync_launches(self):
+        """Count the URLs opened from the app since the last sync"""
+        journal = get_journal()
+        journal.flush()  # The journal indexes its files before it handles the flush
+        _, since = self._marks.get(LAUNCH_SOURCE, [None, 0])
+        events = [event for event in journal.query(since=since, event_type=EVENT_LAUNCH)
+                  if event['ts'] > since and event.get('url')]
+        for event in reversed(events):  # Oldest first
+            entry = self._entries.get(event['url'])
+            launches = entry[2].get(LAUNCH_SOURCE, 0) if entry else 0
+            self._add(event['url'], '', event['ts'], LAUNCH_SOURCE, launches + 1)
+        if events:
+            self._marks[LAUNCH_SOURCE] = [None, events[0]['ts']]
+        return bool(events)
+
+    def sync(self):
+        """Bring the index up to date with the history databases and the journal"""
+        with self._sync_lock:
+            if not self._loaded:
+                self._load()
+            changed = False
+            for source, kind, path in history_sources():
+                changed |= self._sync_database(source, kind, path)
+            changed |= self._sync_launches()
+            if changed:
+                if len(self._entries) > MAX_ENTRIES * 2:
+                    kept = build_snapshot(self._entries).urls
+                    self._entries = {url: self._entries[url] for url in kept}
+                self._snapshot = build_snapshot(self._entries)
+                self._save()
+            return changed
+
+    def urls(self):
+        """Every indexed URL, best ranked first"""
+        return self._snapshot.urls
+
+    def search(self, text, limit=SUGGESTION_LIMIT):
+        """Return up to limit URLs for text; reads only the in-memory snapshot"""
+        return search_snapshot(self._snapshot, text, limit)
+
+    def start(self):
+        """Sync now and then every interval seconds in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='history-sync', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("history sync failed")
+            self._stop.wait(self.interval)
+
+
+class HistoryCompleter(QCompleter):
+    """Popup of history suggestions under a QLineEdit, refreshed on every keystroke"""
+
+    def __init__(self, line_edit, index=None):
+        super().__init__(line_edit)
+        self.index = index or get_history_index()
+        self.line_edit = line_edit
+        self.suggestions = QStringListModel(self)
+        self.setModel(self.suggestions)
+        # The index has already filtered and ranked the suggestions
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setWidget(line_edit)
+        self.activated[str].connect(line_edit.setText)
+        line_edit.textEdited.connect(self.update_suggestions)
+
+    def update_suggestions(self, text):
+        urls = self.index.search(text)
+        self.suggestions.setStringList(urls)
+        if urls:
+            self.complete()
+        else:
+            self.popup().hide()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_history_index():
+    """Return the shared history index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = HistoryIndex()
+        return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the URL history index")
+    parser.add_argument('--sync', action='store_true', help="sync the databases before searching")
+    parser.add_argument('query', nargs='+')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
+
+    index = get_history_index()
+    if args.sync:
+        start = time.perf_counter()
+        index.sync()
+        print(f"synced in {(time.perf_counter() - start) * 1000:.0f} ms")
+    else:
+        index.load()
+    text = ' '.join(args.query)
+    start = time.perf_counter()
+    urls = index.search(text)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{len(index.urls())} URLs indexed, {len(urls)} suggestions in {elapsed:.2f} ms")
+    for url in urls:
+        print(url)
+
+
+if __name__ == "__main__":
+    main()
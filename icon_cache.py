@@ -0,0 +1,274 @@
+"""Browser icons extracted off the GUI thread and cached on disk.
+
+pixmap(executable) never blocks: it returns a QPixmap from a small
+in-memory LRU, or None after queuing the executable for the background
+loader thread; icon_ready(executable) is emitted once the icon is available. Cards
+paint a placeholder until then.
+
+The loader looks an executable up in an on-disk index keyed by its real
+path, mtime and size. Thumbnails are stored once per content hash, so a
+browser is only extracted again after an update, and identical icons are
+shared. On a miss the icon is extracted:
+
+- from a Windows binary's RT_GROUP_ICON / RT_ICON resources, read through
+  mmap with the same resource walker as version_probe;
+- on Linux, from the PNG logos browsers install next to their binary or
+  from the hicolor icon theme.
+"""
+import glob
+import hashlib
+import json
+import logging
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QBuffer, QByteArray, QIODevice, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+import browser_locations
+from version_probe import find_resource
+
+logger = logging.getLogger('browser_manager.icons')
+
+ICON_CACHE_DIR = 'icon_cache'
+ICON_SIZE = 32
+PIXMAP_CACHE_SIZE = 64
+
+RT_ICON = 3
+RT_GROUP_ICON = 14
+
+# Logo files shipped next to browser binaries on Linux, with their size in the name
+LINUX_LOGO_PATTERNS = ('product_logo_*.png', 'browser/chrome/icons/default/default*.png', 'default*.png')
+HICOLOR_DIRS = ('/usr/share/icons/hicolor', os.path.expanduser('~/.local/share/icons/hicolor'))
+
+
+def _closest_size(candidates, size_of):
+    """The smallest candidate at least twice ICON_SIZE, else the largest"""
+    wanted = ICON_SIZE * 2
+    candidates = sorted(candidates, key=size_of)
+    for candidate in candidates:
+        if size_of(candidate) >= wanted:
+            return candidate
+    return candidates[-1] if candidates else None
+
+
+def extract_pe_icon(buf):
+    """Return the best icon of a PE image as .ico or .png bytes, or None"""
+    group = find_resource(buf, RT_GROUP_ICON)
+    if group is None or group[1] < 6:
+        return None
+    start, _ = group
+    (count,) = struct.unpack_from('<H', buf, start + 4)
+    entries = []
+    for i in range(count):
+        entry = start + 6 + i * 14
+        if entry + 14 > len(buf):
+            break
+        # width, height, colors, reserved, planes, bit count, size, resource id
+        entries.append(struct.unpack_from('<BBBBHHIH', buf, entry))
+    best = _closest_size(entries, lambda entry: entry[0] or 256)  # 0 means 256 pixels
+    if best is None:
+        return None
+    image = find_resource(buf, RT_ICON, best[7])
+    if image is None:
+        return None
+    data = bytes(buf[image[0]:image[0] + image[1]])
+    if data.startswith(b'\x89PNG'):
+        return data  # Large icons are stored as plain PNG
+    # Wrap the bitmap in a one-image .ico so QImage can decode it
+    header = struct.pack('<HHH', 0, 1, 1) + struct.pack('<BBBBHHII', *best[:6], len(data), 22)
+    return header + data
+
+
+def linux_icon_file(executable):
+    """Return the path of the PNG logo closest to the wanted size, or None"""
+    install_dir = os.path.dirname(executable)
+    candidates = []
+    for pattern in LINUX_LOGO_PATTERNS:
+        candidates += glob.glob(os.path.join(glob.escape(install_dir), pattern))
+    name = os.path.basename(executable)
+    for root in HICOLOR_DIRS:
+        candidates += glob.glob(os.path.join(root, '*x*', 'apps', glob.escape(name) + '.png'))
+
+    def size_of(path):
+        # product_logo_64.png, default64.png or hicolor/64x64/apps/<name>.png
+        numbers = re.findall(r'\d+', os.path.basename(path)) or re.findall(r'(\d+)x\d+', path)
+        return int(numbers[-1]) if numbers else 0
+
+    return _closest_size(candidates, size_of)
+
+
+def extract_icon(executable):
+    """Return encoded icon bytes for an executable, or None"""
+    with open(executable, 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if buf[:2] == b'MZ':
+                    return extract_pe_icon(buf)
+    path = linux_icon_file(executable)
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def thumbnail(data):
+    """Decode icon bytes and scale them to a PNG thumbnail; None if undecodable"""
+    image = QImage()
+    if not image.loadFromData(data):
+        return None
+    image = image.scaled(ICON_SIZE, ICON_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    encoded = QByteArray()
+    buffer = QBuffer(encoded)
+    buffer.open(QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(encoded)
+
+
+class IconStore:
+    """On-disk thumbnails: an index from (path, mtime, size) to content hashes"""
+
+    def __init__(self, directory=None):
+        self.directory = directory = directory or browser_locations.data_path(ICON_CACHE_DIR)
+        self.index_path = os.path.join(directory, 'index.json')
+        self.index = None
+
+    def _key(self, real_path, st):
+        return f"{real_path}|{st.st_mtime_ns}|{st.st_size}"
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _save(self):
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(temporary, self.index_path)
+
+    def load(self, executable):
+        """Return the thumbnail PNG bytes for executable, extracting it on a miss"""
+        if self.index is None:
+            self._load()
+        real_path = os.path.realpath(executable)
+        st = os.stat(real_path)
+        key = self._key(real_path, st)
+        digest = self.index.get(key)
+        if digest == '':
+            return None  # Known to have no icon
+        if digest:
+            try:
+                with open(os.path.join(self.directory, digest + '.png'), 'rb') as f:
+                    return f.read()
+            except OSError:
+                pass  # Blob removed; extract again
+
+        data = extract_icon(real_path)
+        png = thumbnail(data) if data else None
+        digest = hashlib.sha256(png).hexdigest() if png else ''
+        # Drop the entries of older builds of the same executable
+        self.index = {k: v for k, v in self.index.items() if not k.startswith(real_path + '|')}
+        self.index[key] = digest
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            blob = os.path.join(self.directory, digest + '.png')
+            if png and not os.path.exists(blob):
+                with open(blob, 'wb') as f:
+                    f.write(png)
+            self._save()
+        except OSError as e:
+            logger.warning("could not write icon cache %s: %s", self.directory, e)
+        return png
+
+
+class IconCache(QObject):
+    """LRU of icon pixmaps in front of a background loader thread.
+
+    pixmap() and icon_ready belong to the GUI thread; the loader only
+    produces QImages, which are turned into pixmaps when they arrive.
+    """
+    icon_ready = pyqtSignal(str)
+    loaded = pyqtSignal(str, QImage)  # executable, image (null when it has none)
+
+    def __init__(self, store=None, capacity=PIXMAP_CACHE_SIZE, parent=None):
+        super().__init__(parent)
+        self.store = store or IconStore()
+        self.capacity = capacity
+        self.pixmaps = OrderedDict()  # executable -> QPixmap, or None when it has no icon
+        self.pending = set()
+        self.requests = queue.Queue()
+        self.loaded.connect(self.on_loaded)
+        # A daemon thread, so an unfinished load never holds up or aborts shutdown
+        self.loader = threading.Thread(target=self._load_loop, name='icon-loader', daemon=True)
+        self.loader.start()
+
+    def pixmap(self, executable):
+        """Return the cached pixmap, or None and load it in the background"""
+        if not executable:
+            return None
+        if executable in self.pixmaps:
+            self.pixmaps.move_to_end(executable)
+            return self.pixmaps[executable]
+        if executable not in self.pending:
+            if not os.path.exists(executable):
+                self._remember(executable, None)  # Not installed, do not look again on every paint
+                return None
+            self.pending.add(executable)
+            self.requests.put(executable)
+        return None
+
+    def _load_loop(self):
+        while True:
+            executable = self.requests.get()
+            image = QImage()
+            try:
+                png = self.store.load(executable)
+                if png:
+                    image.loadFromData(png, 'PNG')
+            except (OSError, ValueError, struct.error) as e:
+                logger.warning("could not load the icon of %s: %s", executable, e)
+            except Exception:
+                # Keep the loader alive: every later request would wait forever
+                logger.exception("loading the icon of %s failed", executable)
+            self.loaded.emit(executable, image)
+
+    def on_loaded(self, executable, image):
+        self.pending.discard(executable)
+        self._remember(executable, QPixmap.fromImage(image) if not image.isNull() else None)
+        self.icon_ready.emit(executable)
+
+    def _remember(self, executable, pixmap):
+        """Cache a pixmap, or None for no icon, evicting the least recently used beyond capacity"""
+        self.pixmaps[executable] = pixmap
+        self.pixmaps.move_to_end(executable)
+        while len(self.pixmaps) > self.capacity:
+            self.pixmaps.popitem(last=False)
+
+    def clear(self):
+        """Drop every pixmap; they are reloaded from the disk cache when painted again"""
+        self.pixmaps.clear()
+
+
+_cache = None
+
+
+def get_icon_cache():
+    """Return the application's icon cache, creating it on first use"""
+    global _cache
+    if _cache is None:
+        _cache = IconCache()
+    return _cache
+
+
+def release_icon_cache():
+    """Free the pixmaps of the shared cache, if it has been created"""
+    if _cache is not None:
+        _cache.clear()
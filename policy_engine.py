@@ -0,0 +1,486 @@
+"""Automatic enforcement of browser policies on top of detection.
+
+Policies are declared in policies.json, one object per rule:
+
+    [
+        {"name": "Edge only InPrivate", "browser": "Edge",
+         "private_only": true, "action": "relaunch_private"},
+        {"name": "office.com only in private windows", "url": "office.com",
+         "private_only": true, "action": "close_tabs"},
+        {"name": "Two Chrome instances per user", "browser": "Google Chrome",
+         "max_instances": 2, "action": "terminate"}
+    ]
+
+compile_policies() validates the rules once and indexes them by browser
+and by host. Every enforcement cycle turns the detection snapshot into
+facts keyed by (user, browser) and the tab inventory into facts keyed by
+(browser, profile); only the keys whose facts changed since the previous
+cycle are looked up in those indexes and evaluated, so an idle machine
+costs a dict comparison per cycle no matter how many rules there are.
+A key whose violation was acted on is checked again after a backoff
+(RETRY_MIN doubling up to RETRY_MAX) until it complies, so a failed
+action is retried; a violation whose action is still running is not
+acted on twice.
+
+The desktop app feeds the enforcer the SessionIndex and tab inventory of
+its own detection cycles (PolicyEnforcer.feed), so processes are only
+scanned once. Standalone, the enforcer takes its own snapshot every
+ENFORCE_INTERVAL.
+
+Actions run through the same termination and launch code as the app and
+are journalled with origin 'policy'. The time from the detection snapshot
+that showed a violation to the start of its action is kept per action
+(latency_stats()) and written to the journal with it.
+
+Run headless with `python policy_engine.py [--policies FILE] [--dry-run]`;
+the desktop app enforces policies.json automatically when it has rules.
+"""
+import argparse
+import json
+import logging
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+
+import browser_locations
+import browser_termination
+import devtools
+import profiler
+from audit_journal import get_journal, EVENT_LAUNCH, EVENT_TERMINATE, EVENT_CLOSE_TABS
+from browser_catalog import ROLE_MAIN
+from browser_registry import BrowserRegistry
+from detection_engine import DetectionCycle, DetectionCancelled
+from session_index import default_scope
+from tab_inventory import TabInventory, normalize_host
+
+logger = logging.getLogger('browser_manager.policy')
+
+POLICIES_FILE = 'policies.json'
+ENFORCE_INTERVAL = 2.0  # Seconds between enforcement cycles
+RETRY_MIN = 5.0  # Seconds before a key that was acted on is checked again
+RETRY_MAX = 300.0
+LATENCY_SAMPLES = 1000
+
+ACTION_TERMINATE = 'terminate'
+ACTION_RELAUNCH_PRIVATE = 'relaunch_private'
+ACTION_CLOSE_TABS = 'close_tabs'
+ACTIONS = (ACTION_TERMINATE, ACTION_RELAUNCH_PRIVATE, ACTION_CLOSE_TABS)
+
+RULE_PRIVATE_ONLY = 'private_only'
+RULE_MAX_INSTANCES = 'max_instances'
+RULE_URL_PRIVATE_ONLY = 'url_private_only'
+
+FACTS_PROCESSES = 'processes'
+FACTS_TABS = 'tabs'
+
+# Read on top of the catalog's identity attributes: roles and private mode
+# come from the command line, instance age from create_time
+PROCESS_ATTRS = ('cmdline', 'create_time', 'username')  # max_instances counts per user
+
+Rule = namedtuple('Rule', 'name kind browser host limit action')
+
+# One main browser process as seen by a detection cycle
+Instance = namedtuple('Instance', 'pid create_time private')
+
+# What a rule found wrong with one fact key; targets are Instances or hosts
+Violation = namedtuple('Violation', 'rule key targets observed')
+
+
+def load_policies(path=POLICIES_FILE):
+    """Read the rule list; a missing or unreadable file means no policies"""
+    try:
+        with open(path, 'r') as f:
+            rules = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning("could not read policies from %s: %s", path, e)
+        return []
+    return rules if isinstance(rules, list) else []
+
+
+def compile_rule(entry):
+    """Turn one policies.json entry into a Rule; raises ValueError if it makes no sense"""
+    name = entry.get('name') or json.dumps(entry, sort_keys=True)
+    action = entry.get('action', ACTION_TERMINATE)
+    browser = browser_locations.canonical_name(entry['browser']) if entry.get('browser') else None
+    if action not in ACTIONS:
+        raise ValueError(f"policy {name!r}: unknown action {action!r}")
+    if entry.get('url'):
+        if action != ACTION_CLOSE_TABS:
+            raise ValueError(f"policy {name!r}: URL rules can only close tabs")
+        return Rule(name, RULE_URL_PRIVATE_ONLY, browser, normalize_host(entry['url']), None, action)
+    if browser is None:
+        raise ValueError(f"policy {name!r}: needs a browser or a url")
+    if action == ACTION_CLOSE_TABS:
+        raise ValueError(f"policy {name!r}: close_tabs needs a url")
+    if entry.get('max_instances') is not None:
+        return Rule(name, RULE_MAX_INSTANCES, browser, None, int(entry['max_instances']), action)
+    if entry.get('private_only'):
+        return Rule(name, RULE_PRIVATE_ONLY, browser, None, None, action)
+    raise ValueError(f"policy {name!r}: needs private_only or max_instances")
+
+
+class CompiledPolicies:
+    """Rules indexed by the fact keys they apply to"""
+
+    def __init__(self, rules):
+        self.rules = tuple(rules)
+        self.by_browser = {}  # browser -> process rules
+        self.by_host = {}     # host -> URL rules
+        for rule in self.rules:
+            if rule.kind == RULE_URL_PRIVATE_ONLY:
+                self.by_host.setdefault(rule.host, []).append(rule)
+            else:
+                self.by_browser.setdefault(rule.browser, []).append(rule)
+        self.needs_tabs = bool(self.by_host)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def url_rules(self, host):
+        """URL rules for host and every domain above it"""
+        parts = host.split('.')
+        for start in range(len(parts) - 1):
+            yield from self.by_host.get('.'.join(parts[start:]), ())
+
+
+def compile_policies(entries):
+    """Compile policies.json entries, logging and skipping invalid ones"""
+    rules = []
+    for entry in entries:
+        try:
+            rules.append(compile_rule(entry))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("ignoring policy: %s", e)
+    return CompiledPolicies(rules)
+
+
+def process_facts(index, catalog, scope):
+    """{(user, browser): (Instance, ...)} of the main processes in scope, oldest first"""
+    facts = {}
+    for user, summaries in index.users.items():
+        for browser, summary in summaries.items():
+            instances = []
+            for record in summary.processes:
+                if not scope.matches(record):
+                    continue
+                classification = catalog.classify(record)
+                if classification.role == ROLE_MAIN:
+                    instances.append(Instance(record.pid, record.create_time, classification.private))
+            if instances:
+                instances.sort(key=lambda instance: (instance.create_time or 0, instance.pid))
+                facts[(user, browser)] = tuple(instances)
+    return facts
+
+
+def tab_facts(tab_inventory):
+    """{(browser, profile): frozenset of hosts} of the tabs in session files.
+
+    Browsers never write private tabs to their session files, so every
+    host here is open in a normal window.
+    """
+    return {location: frozenset(normalize_host(url) for url in urls)
+            for location, urls in tab_inventory.profile_tabs().items() if urls}
+
+
+def changed_keys(old, new):
+    return [key for key in new if old.get(key) != new[key]] + [key for key in old if key not in new]
+
+
+class PolicyActions:
+    """Carries out violations with the app's termination and launch code"""
+
+    def __init__(self, registry, scope):
+        self.registry = registry
+        self.scope = scope
+
+    def terminate(self, violation):
+        entries = [(instance.pid, instance.create_time) for instance in violation.targets]
+        # Only the violating instances: any others of the browser are left running
+        success, pids = browser_termination.terminate_browser(violation.rule.browser, entries, rescan=False)
+        return success, {'pids': pids}
+
+    def relaunch_private(self, violation):
+        success, details = self.terminate(violation)
+        if not success:
+            return False, details
+        snapshot = self.registry.current()
+        browser = violation.rule.browser
+        names = [name for name in snapshot.browser_paths if browser_locations.canonical_name(name) == browser]
+        if not names or not snapshot.incognito_flags.get(names[0]):
+            return False, dict(details, error=f"{browser} has no known path or private flag")
+        name = names[0]
+        try:
+            subprocess.Popen([snapshot.browser_paths[name], snapshot.incognito_flags[name]])
+        except OSError as e:
+            return False, dict(details, error=str(e))
+        get_journal().record(EVENT_LAUNCH, name, private=True, method='spawn', origin='policy',
+                             policy=violation.rule.name)
+        return True, details
+
+    def close_tabs(self, violation):
+        browser = violation.key[0]
+        closed = [devtools.close_tabs(browser, host) for host in violation.targets]
+        if any(count is None for count in closed):
+            return False, {'error': f"{browser} has no DevTools endpoint to close tabs with"}
+        return True, {'tabs': sum(closed)}
+
+
+class PolicyEngine:
+    """Evaluates compiled policies against the changes between enforcement cycles"""
+
+    def __init__(self, policies, actions=None, dry_run=False):
+        self.policies = policies
+        self.actions = actions
+        self.dry_run = dry_run
+        self.processes = {}
+        self.tabs = {}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.enforced = 0
+        self._lock = threading.Lock()
+        self._in_progress = set()  # (rule, key) whose action is running
+        self._rechecks = {FACTS_PROCESSES: {}, FACTS_TABS: {}}  # kind -> {key: (due, actions so far)}
+
+    def update(self, processes=None, tabs=None, observed=None):
+        """Take the facts of one cycle and act on new violations; returns them.
+
+        Either kind of facts may be None when the cycle could not read it,
+        in which case the previous facts stand and no key of that kind is
+        re-checked. observed is the monotonic time the snapshot was taken.
+        """
+        observed = time.monotonic() if observed is None else observed
+        violations = []
+        with profiler.span('policy evaluation', 'policy'):
+            if processes is not None:
+                keys = set(changed_keys(self.processes, processes)) | self._due(FACTS_PROCESSES)
+                self.processes = processes
+                for key in keys:
+                    found = list(self._check_processes(key, processes.get(key, ()), observed))
+                    self._resolved(FACTS_PROCESSES, key, found)
+                    violations.extend(found)
+            if tabs is not None:
+                keys = set(changed_keys(self.tabs, tabs)) | self._due(FACTS_TABS)
+                self.tabs = tabs
+                for key in keys:
+                    found = list(self._check_tabs(key, tabs.get(key, frozenset()), observed))
+                    self._resolved(FACTS_TABS, key, found)
+                    violations.extend(found)
+        acting = not self.dry_run and self.actions is not None
+        for violation in violations:
+            if acting:
+                with self._lock:
+                    if (violation.rule, violation.key) in self._in_progress:
+                        continue  # Its action has not finished yet
+                    self._in_progress.add((violation.rule, violation.key))
+            logger.warning("policy %r violated by %s: %s", violation.rule.name, violation.key, violation.targets)
+            if acting:
+                threading.Thread(target=self.enforce, args=(violation,), name='policy-action', daemon=True).start()
+        return violations
+
+    def _due(self, kind):
+        """Keys of kind whose re-check is due"""
+        now = time.monotonic()
+        with self._lock:
+            return {key for key, (due, _) in self._rechecks[kind].items() if due <= now}
+
+    def _resolved(self, kind, key, violations):
+        """Stop re-checking a key once it complies"""
+        if not violations:
+            with self._lock:
+                self._rechecks[kind].pop(key, None)
+
+    def _schedule_recheck(self, violation):
+        kind = FACTS_TABS if violation.rule.kind == RULE_URL_PRIVATE_ONLY else FACTS_PROCESSES
+        with self._lock:
+            self._in_progress.discard((violation.rule, violation.key))
+            # Back off while the key keeps violating, whether the actions succeed or not
+            _, actions = self._rechecks[kind].get(violation.key, (0.0, 0))
+            delay = min(RETRY_MIN * 2 ** actions, RETRY_MAX)
+            self._rechecks[kind][violation.key] = (time.monotonic() + delay, actions + 1)
+
+    def _check_processes(self, key, instances, observed):
+        for rule in self.policies.by_browser.get(key[1], ()):
+            if rule.kind == RULE_PRIVATE_ONLY:
+                targets = tuple(instance for instance in instances if not instance.private)
+            else:
+                # Keep the oldest instances, the newest ones are over the limit
+                targets = instances[rule.limit:]
+            if targets:
+                yield Violation(rule, key, targets, observed)
+
+    def _check_tabs(self, key, hosts, observed):
+        found = {}
+        for host in hosts:
+            for rule in self.policies.url_rules(host):
+                if rule.browser is None or rule.browser == key[0]:
+                    found.setdefault(rule, []).append(host)
+        for rule, targets in found.items():
+            yield Violation(rule, key, tuple(targets), observed)
+
+    def enforce(self, violation):
+        """Run the violation's action and journal it with its latency"""
+        rule = violation.rule
+        started = time.monotonic()
+        latency = started - violation.observed
+        self.latencies.append(latency)
+        with profiler.span('policy action', 'policy', policy=rule.name, action=rule.action):
+            try:
+                success, details = getattr(self.actions, rule.action)(violation)
+            except Exception as e:
+                logger.exception("policy action %s for %r failed", rule.action, rule.name)
+                success, details = False, {'error': str(e)}
+            finally:
+                self._schedule_recheck(violation)
+        duration = time.monotonic() - started
+        self.enforced += 1
+        get_journal().record(EVENT_CLOSE_TABS if rule.action == ACTION_CLOSE_TABS else EVENT_TERMINATE,
+                             rule.browser or violation.key[0], origin='policy', policy=rule.name,
+                             success=success, latency_ms=round(latency * 1000, 1),
+                             duration_ms=round(duration * 1000, 1), **details)
+        return success
+
+    def latency_stats(self):
+        """Violation-to-action latency in milliseconds over the recent actions"""
+        samples = sorted(self.latencies)
+        if not samples:
+            return {'count': 0}
+
+        def percentile(fraction):
+            return round(samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000, 1)
+
+        return {'count': len(samples), 'p50': percentile(0.5), 'p95': percentile(0.95),
+                'max': round(samples[-1] * 1000, 1)}
+
+
+class PolicyEnforcer:
+    """Runs enforcement cycles on a background thread.
+
+    Started with fed=True it takes no snapshots of its own: every cycle
+    evaluates what the last feed() call handed over. The tab inventory is
+    then expected to be refreshed by whoever feeds the enforcer.
+    """
+
+    def __init__(self, policies, registry=None, scope=None, interval=ENFORCE_INTERVAL, dry_run=False,
+                 tab_inventory=None):
+        self.registry = registry or BrowserRegistry()
+        self.scope = scope or default_scope()
+        self.interval = interval
+        self.engine = PolicyEngine(policies, PolicyActions(self.registry, self.scope), dry_run)
+        self.tab_inventory = None
+        if policies.needs_tabs:
+            self.tab_inventory = tab_inventory or TabInventory()
+        self.fed = False
+        self._fed_cycle = None  # (SessionIndex, complete, observed) waiting to be evaluated
+        self._fed_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._cycle = None
+        self._thread = None
+
+    @property
+    def attrs(self):
+        """Snapshot attributes a fed SessionIndex needs on top of the catalog's identity attributes"""
+        return PROCESS_ATTRS if self.engine.policies.by_browser else ()
+
+    def start(self, fed=False):
+        self.fed = fed
+        self._thread = threading.Thread(target=self.run, name='policy-enforcer', daemon=True)
+        self._thread.start()
+        return self
+
+    def feed(self, index, complete, observed):
+        """Hand over a detection cycle's SessionIndex; safe to call from any thread.
+
+        index must have been scanned with attrs. Only the newest cycle is
+        kept when the enforcer is still busy with an older one.
+        """
+        with self._fed_lock:
+            self._fed_cycle = (index, complete, observed)
+        self._wake.set()
+
+    def stop(self):
+        self._stopped = True
+        if self._cycle is not None:
+            self._cycle.cancel()
+        self._wake.set()
+
+    def run(self):
+        if not self.registry.current().generation:
+            self.registry.discover()
+        while not self._stopped:
+            try:
+                if self.fed:
+                    self.enforce_fed()
+                else:
+                    self.enforce_once()
+            except DetectionCancelled:
+                break
+            # Fed cycles arrive through feed(); re-checks wait for the next one
+            self._wake.wait(None if self.fed else self.interval)
+            self._wake.clear()
+
+    def enforce_once(self):
+        """One cycle: snapshot, diff against the last cycle, act on new violations"""
+        catalog = self.registry.current().catalog
+        self._cycle = cycle = DetectionCycle()
+        index, complete = None, False
+        if self.engine.policies.by_browser:
+            index, complete = cycle.scan_sessions(catalog, catalog.identity_attrs + PROCESS_ATTRS, self.scope)
+        if self.tab_inventory is not None:
+            self.tab_inventory.refresh()
+        return self.evaluate(index, complete, cycle.started)
+
+    def enforce_fed(self):
+        """Evaluate the cycle handed over by feed(), if there is a new one"""
+        with self._fed_lock:
+            fed, self._fed_cycle = self._fed_cycle, None
+        if fed is None:
+            return []
+        return self.evaluate(*fed)
+
+    def evaluate(self, index, complete, observed):
+        catalog = self.registry.current().catalog
+        processes = None
+        # A cut-short scan would look like processes exiting and coming back
+        if index is not None and complete and self.engine.policies.by_browser:
+            processes = process_facts(index, catalog, self.scope)
+        tabs = tab_facts(self.tab_inventory) if self.tab_inventory is not None else None
+        return self.engine.update(processes, tabs, observed)
+
+
+def start_enforcer(registry=None, path=POLICIES_FILE, tab_inventory=None, fed=False):
+    """Start enforcing the policies in path; returns None when there are none.
+
+    With fed=True the caller passes its detection cycles to feed() and keeps
+    tab_inventory refreshed.
+    """
+    policies = compile_policies(load_policies(path))
+    if not policies:
+        return None
+    logger.info("enforcing %d policies from %s", len(policies), path)
+    return PolicyEnforcer(policies, registry, tab_inventory=tab_inventory).start(fed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enforce browser policies without the GUI")
+    parser.add_argument('--policies', default=POLICIES_FILE)
+    parser.add_argument('--interval', type=float, default=ENFORCE_INTERVAL)
+    parser.add_argument('--dry-run', action='store_true', help="report violations without acting on them")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(message)s')
+
+    policies = compile_policies(load_policies(args.policies))
+    if not policies:
+        parser.error(f"no valid policies in {args.policies}")
+    enforcer = PolicyEnforcer(policies, interval=args.interval, dry_run=args.dry_run)
+    try:
+        enforcer.run()
+    except KeyboardInterrupt:
+        enforcer.stop()
+    print(json.dumps(enforcer.engine.latency_stats()))
+
+
+if __name__ == '__main__':
+    main()
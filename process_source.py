@@ -0,0 +1,188 @@
+"""Process table snapshots for browser detection.
+
+Detection only needs a few attributes per process, mostly the executable
+name. The psutil backend works everywhere; on Linux the procfs backend reads
+/proc/<pid>/comm, stat and cmdline directly into a reused buffer and skips
+every attribute that was not asked for.
+
+iter_snapshot() yields records as they are read and asks an optional
+should_continue() callback before every process, so a caller can stop a
+slow scan part way through.
+"""
+import os
+import sys
+from collections import namedtuple
+
+ProcessRecord = namedtuple('ProcessRecord', 'pid name ppid exe cmdline create_time username session')
+ProcessRecord.__new__.__defaults__ = (None,) * 6
+
+# Attributes a snapshot can be asked for besides pid and name
+ATTRIBUTES = ('ppid', 'exe', 'cmdline', 'create_time', 'username', 'session')
+
+# Force a backend with e.g. BROWSER_MANAGER_PROCESS_SOURCE=psutil
+SOURCE_ENV_VAR = 'BROWSER_MANAGER_PROCESS_SOURCE'
+
+
+def session_id(pid):
+    """Login session of a process: the Windows session ID, or the Linux audit session"""
+    if sys.platform == 'win32':
+        import ctypes
+        session = ctypes.c_ulong()
+        if ctypes.windll.kernel32.ProcessIdToSessionId(pid, ctypes.byref(session)):
+            return session.value
+        return None
+    try:
+        with open(f'/proc/{pid}/sessionid', 'rb') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+class PsutilProcessSource:
+    """Portable backend built on psutil.process_iter"""
+    name = 'psutil'
+
+    def __init__(self):
+        import psutil
+        self._psutil = psutil
+
+    def snapshot(self, attrs=()):
+        """Return a ProcessRecord for every process, filling only attrs"""
+        return list(self.iter_snapshot(attrs))
+
+    def iter_snapshot(self, attrs=(), should_continue=None):
+        """Yield a ProcessRecord per process until should_continue() returns False"""
+        wanted = ['name'] + [attr for attr in ATTRIBUTES if attr in attrs and attr != 'session']
+        want_session = 'session' in attrs
+        for proc in self._psutil.process_iter(wanted):
+            if should_continue is not None and not should_continue():
+                return
+            info = proc.info
+            if want_session:
+                info['session'] = session_id(proc.pid)
+            yield ProcessRecord(proc.pid, *(info.get(field) for field in ProcessRecord._fields[1:]))
+
+
+class ProcfsProcessSource:
+    """Linux backend reading /proc directly"""
+    name = 'procfs'
+
+    def __init__(self, proc_root='/proc'):
+        self.proc_root = proc_root
+        self._buffer = bytearray(4096)
+        self._clock_ticks = os.sysconf('SC_CLK_TCK')
+        self._boot_time = self._read_boot_time()
+        self._usernames = {}
+
+    def _read_boot_time(self):
+        try:
+            with open(os.path.join(self.proc_root, 'stat'), 'rb') as f:
+                for line in f:
+                    if line.startswith(b'btime'):
+                        return float(line.split()[1])
+        except (OSError, ValueError, IndexError):
+            pass
+        return 0.0
+
+    def _read(self, path):
+        """Read a small /proc file into the shared buffer and return its bytes"""
+        with open(path, 'rb', buffering=0) as f:
+            size = f.readinto(self._buffer)
+            if size < len(self._buffer):
+                return bytes(self._buffer[:size])
+            # Long command lines: keep reading and grow the buffer for next time
+            data = bytes(self._buffer) + f.read()
+        self._buffer = bytearray(max(len(self._buffer) * 2, len(data)))
+        return data
+
+    def _username(self, uid):
+        name = self._usernames.get(uid)
+        if name is None:
+            try:
+                import pwd
+                name = pwd.getpwuid(uid).pw_name
+            except (ImportError, KeyError):
+                name = str(uid)
+            self._usernames[uid] = name
+        return name
+
+    def snapshot(self, attrs=()):
+        """Return a ProcessRecord for every process, filling only attrs"""
+        return list(self.iter_snapshot(attrs))
+
+    def iter_snapshot(self, attrs=(), should_continue=None):
+        """Yield a ProcessRecord per process until should_continue() returns False"""
+        want_stat = 'ppid' in attrs or 'create_time' in attrs
+        want_cmdline = 'cmdline' in attrs
+        want_exe = 'exe' in attrs
+        want_username = 'username' in attrs
+        want_session = 'session' in attrs
+        with os.scandir(self.proc_root) as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                if should_continue is not None and not should_continue():
+                    return
+                base = entry.path
+                try:
+                    name = self._read(base + '/comm').rstrip(b'\n').decode(errors='replace')
+                    ppid = create_time = exe = cmdline = username = session = None
+                    if want_stat:
+                        stat = self._read(base + '/stat')
+                        # The command name in field 2 may contain spaces and parentheses
+                        fields = stat[stat.rfind(b')') + 2:].split()
+                        ppid = int(fields[1])
+                        create_time = self._boot_time + int(fields[19]) / self._clock_ticks
+                    if want_cmdline or len(name) == 15:
+                        args = self._read(base + '/cmdline').split(b'\0')
+                        if args and args[-1] == b'':
+                            args.pop()
+                        cmdline = [arg.decode(errors='replace') for arg in args]
+                        # comm is truncated to 15 characters, recover the full name from argv[0]
+                        if len(name) == 15 and cmdline:
+                            full_name = os.path.basename(cmdline[0])
+                            if full_name.startswith(name):
+                                name = full_name
+                        if not want_cmdline:
+                            cmdline = None
+                    if want_exe:
+                        try:
+                            exe = os.readlink(base + '/exe')
+                        except OSError:
+                            exe = None  # Other users' processes
+                    if want_username:
+                        username = self._username(entry.stat().st_uid)
+                    if want_session:
+                        try:
+                            session = int(self._read(base + '/sessionid'))
+                        except (OSError, ValueError):
+                            session = None  # Kernel without audit sessions
+                except (OSError, ValueError, IndexError):
+                    continue  # Process exited while being read
+                yield ProcessRecord(int(entry.name), name, ppid, exe, cmdline, create_time, username, session)
+
+
+_default_source = None
+
+
+def get_process_source():
+    """Return the fastest process source available on this platform"""
+    global _default_source
+    if _default_source is None:
+        choice = os.environ.get(SOURCE_ENV_VAR, '').lower()
+        if choice != 'psutil' and sys.platform.startswith('linux') and os.path.isdir('/proc/self'):
+            _default_source = ProcfsProcessSource()
+        else:
+            _default_source = PsutilProcessSource()
+    return _default_source
+
+
+def set_process_source(source):
+    """Make every later get_process_source() return source; returns the previous one.
+
+    process_trace installs its recording and replay sources this way.
+    """
+    global _default_source
+    previous = get_process_source()
+    _default_source = source
+    return previous
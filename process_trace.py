@@ -0,0 +1,389 @@
+"""Record process and window snapshots into a trace file and replay them.
+
+Detection problems on a user's machine depend on that machine's process
+table, which cannot be reproduced anywhere else. A trace captures the
+inputs of detection instead: every process snapshot read through
+get_process_source() (BrowserDetector cycles and the running_browsers()
+check of is_url_open) and every window list read by window_titles().
+
+Recording wraps the process source with a RecordingProcessSource. Each
+snapshot becomes one frame holding its records, the attributes asked for,
+whether the scan read the whole table and how long it took. A frame only
+stores the records that changed and the pids that went away since the
+previous snapshot with the same attributes, and frames are written as
+NDJSON into xz streams, so an idle machine costs a few bytes per cycle.
+The header stores the platform, the detection scope and the custom
+browsers, so a replay classifies the records exactly as the recording
+machine did.
+
+Replay installs a ReplayProcessSource that returns the recorded snapshots
+(rebuilt from the deltas, new processes last) one after the other and
+runs a DetectionCycle per frame, as fast as the engine allows and with no
+deadline. It prints the detection result and timing of every cycle;
+--save writes the results as the expected output of a regression check,
+--expect compares a replay against it and --budget-ms fails on slow
+cycles:
+
+    python app.py --record-trace session.trace.xz
+    python process_trace.py record session.trace.xz --seconds 60
+    python process_trace.py replay session.trace.xz --save expected.json
+    python process_trace.py replay session.trace.xz --expect expected.json --budget-ms 5
+"""
+import argparse
+import atexit
+import json
+import logging
+import lzma
+import statistics
+import sys
+import threading
+import time
+
+from browser_catalog import compile_catalog
+from browser_registry import BrowserRegistry
+from detection_engine import DetectionCycle
+from process_source import ProcessRecord, get_process_source, set_process_source
+from session_index import Scope, default_scope
+
+try:
+    import pygetwindow as gw
+except NotImplementedError:
+    gw = None  # pygetwindow has no Linux backend
+
+logger = logging.getLogger('browser_manager.trace')
+
+TRACE_VERSION = 1
+
+FRAME_HEADER = 'header'
+FRAME_PROCESSES = 'processes'
+FRAME_WINDOWS = 'windows'
+
+FLUSH_INTERVAL = 5.0  # Seconds frames are buffered before they are compressed and written
+
+# A replayed cycle never runs out of time; timing is checked with --budget-ms
+REPLAY_DEADLINE = float('inf')
+
+_recorder = None
+
+
+class TraceRecorder:
+    """Appends snapshot frames to a compressed trace file; safe to use from any thread.
+
+    Frames are buffered and written every FLUSH_INTERVAL seconds as a
+    complete xz stream of their own; lzma reads concatenated streams as one
+    file, and a recording that ends in a crash loses only the last batch.
+    """
+
+    def __init__(self, path, scope=None, custom_browsers=None, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._bases = {}  # attributes -> {pid: fields} of the last snapshot that asked for them
+        self._flushed = self.started
+        self._closed = False
+        open(path, 'wb').close()
+        scope = scope or default_scope()
+        self._write({'type': FRAME_HEADER, 'version': TRACE_VERSION, 'platform': sys.platform,
+                     'recorded': time.time(), 'scope': [scope.kind, scope.key],
+                     'custom_browsers': custom_browsers or {}})
+        self.flush()
+
+    def _write(self, frame, encode=None):
+        """Queue a frame; encode(frame) runs under the lock, so deltas follow file order"""
+        with self._lock:
+            if self._closed:
+                return
+            if encode is not None:
+                encode(frame)
+            self._pending.append(json.dumps(frame, separators=(',', ':')) + '\n')
+            due = time.monotonic() - self._flushed >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Compress the buffered frames and append them to the file"""
+        with self._lock:
+            lines, self._pending = self._pending, []
+            self._flushed = time.monotonic()
+            if not lines:
+                return
+            with open(self.path, 'ab') as f:
+                f.write(lzma.compress(''.join(lines).encode('utf-8')))
+
+    def offset(self):
+        return round(time.monotonic() - self.started, 6)
+
+    def record_processes(self, attrs, records, complete, elapsed):
+        attrs = sorted(set(attrs))
+        current = {record.pid: list(record) for record in records}
+
+        def encode(frame):
+            # Only what changed since the last snapshot with the same attributes
+            key = ','.join(attrs)
+            base = self._bases.get(key, {})
+            frame['changed'] = [fields for pid, fields in current.items() if base.get(pid) != fields]
+            frame['removed'] = [pid for pid in base if pid not in current]
+            self._bases[key] = current
+
+        self._write({'type': FRAME_PROCESSES, 't': self.offset(), 'attrs': attrs,
+                     'complete': complete, 'elapsed': round(elapsed, 6)}, encode)
+
+    def record_windows(self, titles):
+        self._write({'type': FRAME_WINDOWS, 't': self.offset(), 'titles': list(titles)})
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._closed = True
+
+
+class RecordingProcessSource:
+    """Process source that passes another source's snapshots through and records them"""
+
+    def __init__(self, source, recorder):
+        self.source = source
+        self.recorder = recorder
+        self.name = source.name
+
+    def snapshot(self, attrs=()):
+        return list(self.iter_snapshot(attrs))
+
+    def iter_snapshot(self, attrs=(), should_continue=None):
+        records = []
+        stopped = []
+        complete = False
+
+        def check():
+            # A scan stopped by its deadline ends early without an error
+            if should_continue is None or should_continue():
+                return True
+            stopped.append(True)
+            return False
+
+        start = time.perf_counter()
+        try:
+            for record in self.source.iter_snapshot(attrs, check):
+                records.append(record)
+                yield record
+            complete = not stopped
+        finally:
+            self.recorder.record_processes(attrs, records, complete, time.perf_counter() - start)
+
+
+class ReplayProcessSource:
+    """Process source returning the snapshots of a trace, one per call"""
+    name = 'replay'
+
+    def __init__(self, frames):
+        self.frames = iter(frames)
+        self.frame = None
+
+    def snapshot(self, attrs=()):
+        return list(self.iter_snapshot(attrs))
+
+    def iter_snapshot(self, attrs=(), should_continue=None):
+        try:
+            self.frame = next(self.frames)
+        except StopIteration:
+            # Inside a generator a StopIteration would surface as a RuntimeError
+            raise ValueError("trace exhausted") from None
+        for fields in self.frame['records']:
+            if should_continue is not None and not should_continue():
+                return
+            yield ProcessRecord(*fields)
+
+
+def _decode_processes(frame, bases):
+    """Rebuild a process frame's full snapshot from its delta, in the order of the previous one"""
+    key = ','.join(frame['attrs'])
+    snapshot = dict(bases.get(key, {}))
+    for pid in frame.pop('removed'):
+        snapshot.pop(pid, None)
+    for fields in frame.pop('changed'):
+        snapshot[fields[0]] = fields
+    bases[key] = snapshot
+    frame['records'] = list(snapshot.values())
+
+
+def read_trace(path):
+    """Return (header, frames) of a trace; a trace cut off by a crash is read up to the cut"""
+    header, frames = None, []
+    bases = {}
+    try:
+        with lzma.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    frame = json.loads(line)
+                except ValueError:
+                    break  # Torn last line
+                if frame.get('type') == FRAME_HEADER:
+                    header = frame
+                    continue
+                if frame.get('type') == FRAME_PROCESSES:
+                    _decode_processes(frame, bases)
+                frames.append(frame)
+    except (EOFError, lzma.LZMAError):
+        logger.warning("trace %s ends early, the recording was not closed", path)
+    if header is None or header.get('version') != TRACE_VERSION:
+        raise ValueError(f"{path} is not a version {TRACE_VERSION} trace")
+    return header, frames
+
+
+def start_recording(path, custom_browsers=None):
+    """Record every later process snapshot and window list into path"""
+    global _recorder
+    if _recorder is not None:
+        return _recorder
+    _recorder = TraceRecorder(path, custom_browsers=custom_browsers)
+    set_process_source(RecordingProcessSource(get_process_source(), _recorder))
+    atexit.register(_recorder.close)
+    logger.info("recording process and window snapshots to %s", path)
+    return _recorder
+
+
+def configure_from_args(argv):
+    """Handle --record-trace PATH; returns argv without it"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--record-trace', metavar='PATH')
+    args, remaining = parser.parse_known_args(argv[1:])
+    if args.record_trace:
+        start_recording(args.record_trace, BrowserRegistry().load_custom_browsers())
+    return argv[:1] + remaining
+
+
+def window_titles():
+    """Titles of every top-level window, recorded when a trace is being recorded"""
+    titles = [window.title for window in gw.getAllWindows()] if gw is not None else []
+    if _recorder is not None:
+        _recorder.record_windows(titles)
+    return titles
+
+
+def cycle_result(index):
+    """Detection output of one cycle in a JSON friendly form"""
+    return {
+        'scoped': {browser: [summary.main_count, summary.helper_count, summary.private]
+                   for browser, summary in sorted(index.scoped.items())},
+        'users': {user or '': counts for user, counts in sorted(index.aggregate().items(),
+                                                                 key=lambda item: item[0] or '')}
+    }
+
+
+def replay(header, frames, urls=()):
+    """Run every frame of a trace through the detection engine.
+
+    Returns a list with one result per frame: detection output and replay
+    time for process frames, {url: open} for window frames.
+    """
+    catalog = compile_catalog(header['custom_browsers'])
+    scope = Scope(*header['scope'])
+    process_frames = [frame for frame in frames if frame['type'] == FRAME_PROCESSES]
+    source = ReplayProcessSource(process_frames)
+    previous = set_process_source(source)
+    results = []
+    try:
+        for frame in frames:
+            if frame['type'] == FRAME_WINDOWS:
+                results.append({'t': frame['t'], 'windows': {
+                    url: any(url in title for title in frame['titles']) for url in urls}})
+                continue
+            cycle = DetectionCycle(REPLAY_DEADLINE)
+            start = time.perf_counter()
+            index, _ = cycle.scan_sessions(catalog, catalog.identity_attrs, scope)
+            elapsed = time.perf_counter() - start
+            result = {'t': frame['t'], 'processes': len(frame['records']), 'complete': frame['complete']}
+            result.update(cycle_result(index))
+            result['recorded_ms'] = frame['elapsed'] * 1000
+            result['replay_ms'] = elapsed * 1000
+            results.append(result)
+    finally:
+        set_process_source(previous)
+    return results
+
+
+def comparable(result):
+    """A result without the timings, which differ on every run"""
+    return {key: value for key, value in result.items() if not key.endswith('_ms')}
+
+
+def record_main(args):
+    registry = BrowserRegistry()
+    snapshot = registry.discover()
+    recorder = start_recording(args.trace, registry.load_custom_browsers())
+    deadline = time.monotonic() + args.seconds
+    cycles = 0
+    while time.monotonic() < deadline:
+        cycle = DetectionCycle()
+        cycle.scan_sessions(snapshot.catalog, snapshot.catalog.identity_attrs + ('username',), default_scope())
+        window_titles()
+        cycles += 1
+        time.sleep(args.interval)
+    recorder.close()
+    print(f"recorded {cycles} cycles to {args.trace}")
+    return 0
+
+
+def replay_main(args):
+    header, frames = read_trace(args.trace)
+    results = replay(header, frames, args.url)
+    failed = False
+    timings = []
+    for number, result in enumerate(results):
+        if 'windows' in result:
+            print(f"{number:>5} {result['t']:>9.3f}s windows  {result['windows']}")
+            continue
+        timings.append(result['replay_ms'])
+        running = ', '.join(f"{browser}{' (private)' if counts[2] else ''}"
+                            for browser, counts in result['scoped'].items()) or "none"
+        slow = args.budget_ms is not None and result['replay_ms'] > args.budget_ms
+        failed |= slow
+        print(f"{number:>5} {result['t']:>9.3f}s {result['processes']:>5} procs "
+              f"{result['recorded_ms']:>8.2f} ms recorded {result['replay_ms']:>8.2f} ms replay"
+              f"{' OVER BUDGET' if slow else ''}  {running}")
+    if timings:
+        print(f"{len(timings)} cycles: median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms")
+    else:
+        print("the trace holds no process snapshots")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump([comparable(result) for result in results], f, indent=1)
+        print(f"expected output written to {args.save}")
+    if args.expect:
+        with open(args.expect, 'r') as f:
+            expected = json.load(f)
+        actual = [comparable(result) for result in results]
+        mismatches = [number for number, (a, e) in enumerate(zip(actual, expected)) if a != e]
+        if len(actual) != len(expected):
+            print(f"{len(actual)} results, {len(expected)} expected")
+            failed = True
+        for number in mismatches:
+            print(f"cycle {number} differs:\n  expected {expected[number]}\n  actual   {actual[number]}")
+        failed |= bool(mismatches)
+        print("detection output matches" if not mismatches and len(actual) == len(expected)
+              else "DETECTION OUTPUT DIFFERS")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="record detection cycles on this machine")
+    record.add_argument('trace')
+    record.add_argument('--seconds', type=float, default=60.0)
+    record.add_argument('--interval', type=float, default=1.0, help="seconds between cycles")
+    play = commands.add_parser('replay', help="replay a trace through the detection engine")
+    play.add_argument('trace')
+    play.add_argument('--save', metavar='FILE', help="write the detection output as expected output")
+    play.add_argument('--expect', metavar='FILE', help="fail if the detection output differs from FILE")
+    play.add_argument('--budget-ms', type=float, help="fail if a cycle takes longer than this")
+    play.add_argument('--url', action='append', default=[], help="report whether URL is in a window title")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(name)s: %(message)s')
+    return record_main(args) if args.command == 'record' else replay_main(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""Opt-in span recorder exporting Chrome trace-event JSON.
+
+Start the app with --profile to record how long detection cycles, process
+snapshots, window enumeration, launches, terminations, config loads and UI
+updates take. Spans from every thread go into one fixed-size ring buffer
+(a deque append is atomic, so no lock is taken on the hot path) and are
+written on exit as a trace that chrome://tracing or https://ui.perfetto.dev
+can open:
+
+    python app.py --profile [--profile-output trace.json] [--profile-cprofile N]
+
+--profile-cprofile N additionally runs cProfile over every Nth detection
+cycle on the detector thread and dumps it next to the trace. When profiling
+is off, span() returns a shared no-op context manager and traced() calls
+the wrapped function directly. Without --profile-output the trace goes to
+the data directory (see browser_locations.data_dir()).
+"""
+import argparse
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import browser_locations
+
+logger = logging.getLogger('browser_manager.profiler')
+
+DEFAULT_CAPACITY = 100000
+DEFAULT_OUTPUT = 'browser_manager_trace.json'
+
+_events = None  # Ring buffer of finished spans, None while profiling is off
+_thread_names = {}
+_origin_ns = time.perf_counter_ns()
+_cprofile_every = 0
+_cprofile_cycles = {}
+_output_path = None
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        thread = threading.current_thread()
+        _thread_names[thread.ident] = thread.name
+        _events.append((self.name, self.category, (self.start - _origin_ns) // 1000,
+                        (end - self.start) // 1000, thread.ident, self.args))
+        return False
+
+
+def enabled():
+    return _events is not None
+
+
+def enable(capacity=DEFAULT_CAPACITY, output_path=None, cprofile_every=0):
+    """Start recording spans; keeps only the latest capacity spans"""
+    global _events, _cprofile_every, _output_path
+    _events = deque(maxlen=capacity)
+    _output_path = output_path or browser_locations.data_path(DEFAULT_OUTPUT)
+    _cprofile_every = cprofile_every
+    logger.info("profiling enabled, trace will be written to %s", _output_path)
+
+
+def span(name, category, **args):
+    """Context manager timing one span; free when profiling is off"""
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(category, name=None):
+    """Decorator recording every call of a function as a span"""
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return func(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class sampled_cprofile:
+    """Run cProfile over every Nth use of this context manager per label.
+
+    cProfile only sees the thread it is enabled on, so this wraps the work
+    of one thread, e.g. a detection cycle on the detector thread.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.profile = None
+
+    def __enter__(self):
+        if _events is not None and _cprofile_every:
+            count = _cprofile_cycles.get(self.label, 0)
+            _cprofile_cycles[self.label] = count + 1
+            if count % _cprofile_every == 0:
+                self.profile = cProfile.Profile()
+                self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.profile.disable()
+            base, _ = os.path.splitext(_output_path)
+            path = f"{base}.{self.label}.{_cprofile_cycles[self.label]}.prof"
+            try:
+                self.profile.dump_stats(path)
+            except OSError as e:
+                logger.warning("could not write %s: %s", path, e)
+        return False
+
+
+def trace_events():
+    """Return the recorded spans as a Chrome trace-event list"""
+    pid = os.getpid()
+    events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+              for tid, name in list(_thread_names.items())]
+    for name, category, start_us, duration_us, tid, args in list(_events or ()):
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start_us, 'dur': duration_us,
+                 'pid': pid, 'tid': tid}
+        if args:
+            event['args'] = {key: str(value) for key, value in args.items()}
+        events.append(event)
+    return events
+
+
+def export_chrome_trace(path=None):
+    """Write the recorded spans as trace-event JSON; returns the path"""
+    path = path or _output_path or browser_locations.data_path(DEFAULT_OUTPUT)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace_events(), 'displayTimeUnit': 'ms'}, f)
+    logger.info("trace written to %s", path)
+    return path
+
+
+def configure_from_args(argv):
+    """Handle the profiling switches; returns argv without them for QApplication"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--profile-output')
+    parser.add_argument('--profile-cprofile', type=int, default=0, metavar='N')
+    parser.add_argument('--profile-capacity', type=int, default=DEFAULT_CAPACITY)
+    args, remaining = parser.parse_known_args(argv[1:])
+    if args.profile:
+        enable(args.profile_capacity, args.profile_output, args.profile_cprofile)
+    return argv[:1] + remaining
@@ -0,0 +1,121 @@
+"""Per-user and per-session views of one process snapshot.
+
+On a terminal server every user runs their own browsers, so "is Chrome
+running" has to mean "is Chrome running for me". A SessionIndex is built in
+the same pass that classifies the snapshot: every browser process is added
+to the summaries of its user and of its login session, and to those of the
+Scope the app acts in. Looking up one user's or one session's browsers is
+then a dict lookup, and the admin view aggregates all users from the same
+snapshot without another scan.
+
+The scope defaults to the current user and can be changed with
+BROWSER_MANAGER_SCOPE=user|session|all.
+"""
+import getpass
+import os
+from collections import namedtuple
+
+from browser_catalog import SummaryBuilder
+from process_source import session_id
+
+SCOPE_ALL = 'all'
+SCOPE_USER = 'user'
+SCOPE_SESSION = 'session'
+
+SCOPE_ENV_VAR = 'BROWSER_MANAGER_SCOPE'
+
+
+def normalize_user(username):
+    return username.lower() if username else None
+
+
+def current_user():
+    """The user this process runs as, in the form process snapshots report"""
+    try:
+        import psutil
+        return normalize_user(psutil.Process().username())
+    except Exception:
+        return normalize_user(getpass.getuser())
+
+
+class Scope(namedtuple('Scope', 'kind key')):
+    """Which processes detection and actions apply to"""
+
+    @property
+    def attrs(self):
+        """Snapshot attributes needed to tell whether a process is in scope"""
+        return {SCOPE_USER: ('username',), SCOPE_SESSION: ('session',)}.get(self.kind, ())
+
+    def matches(self, record):
+        if self.kind == SCOPE_USER:
+            return normalize_user(record.username) == self.key
+        if self.kind == SCOPE_SESSION:
+            return record.session == self.key
+        return True
+
+
+ALL_PROCESSES = Scope(SCOPE_ALL, None)
+
+_default_scope = None
+
+
+def default_scope():
+    """Return the configured scope for this process"""
+    global _default_scope
+    if _default_scope is None:
+        kind = os.environ.get(SCOPE_ENV_VAR, SCOPE_USER).lower()
+        if kind == SCOPE_SESSION:
+            _default_scope = Scope(SCOPE_SESSION, session_id(os.getpid()))
+        elif kind == SCOPE_ALL:
+            _default_scope = ALL_PROCESSES
+        else:
+            _default_scope = Scope(SCOPE_USER, current_user())
+    return _default_scope
+
+
+def filter_scope(records, scope):
+    """Yield only the records in scope"""
+    if scope is None or scope.kind == SCOPE_ALL:
+        return records
+    return (record for record in records if scope.matches(record))
+
+
+class SessionIndex:
+    """Browser summaries of one snapshot, partitioned by user and session"""
+
+    def __init__(self, scope=ALL_PROCESSES, per_user=True):
+        self.scope = scope
+        self.per_user = per_user  # False when the snapshot has no user names: users is not partitioned
+        self._scoped = SummaryBuilder()
+        self._users = {}
+        self._sessions = {}
+        self.users = {}     # user -> {browser: BrowserSummary}
+        self.sessions = {}  # session -> {browser: BrowserSummary}
+        self.scoped = {}    # browser -> BrowserSummary within scope
+
+    def add(self, record, classification):
+        """Index one classified record; returns True if it is its browser's first process in scope"""
+        self._users.setdefault(normalize_user(record.username), SummaryBuilder()).add(record, classification)
+        if record.session is not None:
+            self._sessions.setdefault(record.session, SummaryBuilder()).add(record, classification)
+        if self.scope.matches(record):
+            return self._scoped.add(record, classification)
+        return False
+
+    def finish(self):
+        """Freeze the partitions after the last record; returns the in-scope summaries"""
+        self.users = {user: builder.summaries() for user, builder in self._users.items()}
+        self.sessions = {session: builder.summaries() for session, builder in self._sessions.items()}
+        self.scoped = self._scoped.summaries()
+        return self.scoped
+
+    def for_user(self, username):
+        return self.users.get(normalize_user(username), {})
+
+    def for_session(self, session):
+        return self.sessions.get(session, {})
+
+    def aggregate(self):
+        """{user: {browser: process count}} across every user, for the admin view"""
+        return {user: {browser: len(summary.processes) for browser, summary in summaries.items()}
+                for user, summaries in self.users.items()}
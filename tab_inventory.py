@@ -0,0 +1,314 @@
+"""Inventory of open browser tabs read from the browsers' session files.
+
+Chromium based browsers append their tab state to SNSS files in
+<profile>/Sessions, Firefox keeps it in
+<profile>/sessionstore-backups/recovery.jsonlz4. Both are read through mmap
+and only re-parsed when their modification time or size changes. The parsed
+tabs are kept in a URL -> {(browser, profile)} index so lookups are O(1).
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from urllib.parse import urlsplit
+
+import browser_locations
+
+try:
+    import lz4.block as _lz4_block
+except ImportError:
+    _lz4_block = None
+
+# What decompressing a corrupt or half-written block can raise
+LZ4_ERRORS = (ValueError, IndexError)
+if _lz4_block is not None:
+    LZ4_ERRORS += (_lz4_block.LZ4BlockError,)
+
+# Chromium session command ids (components/sessions/core/session_service_commands.cc)
+SNSS_SET_TAB_WINDOW = 0
+SNSS_UPDATE_TAB_NAVIGATION = 6
+SNSS_SET_SELECTED_NAVIGATION_INDEX = 7
+SNSS_TAB_CLOSED = 16
+SNSS_WINDOW_CLOSED = 17
+
+MOZLZ4_MAGIC = b'mozLz40\0'
+
+
+def normalize_url(url):
+    """Reduce a URL to the form used as index key"""
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+    parts = urlsplit(url)
+    path = parts.path.rstrip('/')
+    key = f"{parts.scheme.lower()}://{parts.netloc.lower()}{path}"
+    if parts.query:
+        key += '?' + parts.query
+    return key
+
+
+def normalize_host(url):
+    """Return the host of a URL (or bare host name) without a leading www."""
+    if '://' not in url:
+        url = 'https://' + url
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _read_pickle_string(buf, pos, end):
+    """Read a length-prefixed, 4-byte aligned string from a Chromium Pickle"""
+    if pos + 4 > end:
+        return None, end
+    (length,) = struct.unpack_from('<i', buf, pos)
+    pos += 4
+    if length < 0 or pos + length > end:
+        return None, end
+    value = bytes(buf[pos:pos + length]).decode('utf-8', errors='replace')
+    return value, pos + ((length + 3) & ~3)
+
+
+def parse_snss(buf):
+    """Return the URLs of the tabs still open in a Chromium SNSS session file"""
+    size = len(buf)
+    if size < 8 or buf[:4] != b'SNSS':
+        return []
+
+    navigations = {}   # tab id -> {navigation index: url}
+    selected = {}      # tab id -> selected navigation index
+    tab_windows = {}   # tab id -> window id
+    closed_tabs = set()
+    closed_windows = set()
+
+    pos = 8
+    while pos + 2 <= size:
+        (command_size,) = struct.unpack_from('<H', buf, pos)
+        pos += 2
+        if command_size == 0 or pos + command_size > size:
+            break  # Truncated trailing command while the browser is writing
+        command_id = buf[pos]
+        start, end = pos + 1, pos + command_size
+        pos = end
+
+        if command_id == SNSS_UPDATE_TAB_NAVIGATION and end - start >= 16:
+            # Pickle: payload size, tab id, navigation index, url, ...
+            tab_id, index = struct.unpack_from('<ii', buf, start + 4)
+            url, _ = _read_pickle_string(buf, start + 12, end)
+            if url:
+                navigations.setdefault(tab_id, {})[index] = url
+                selected.setdefault(tab_id, index)
+        elif command_id == SNSS_SET_SELECTED_NAVIGATION_INDEX and end - start >= 8:
+            tab_id, index = struct.unpack_from('<ii', buf, start)
+            selected[tab_id] = index
+        elif command_id == SNSS_SET_TAB_WINDOW and end - start >= 8:
+            window_id, tab_id = struct.unpack_from('<ii', buf, start)
+            tab_windows[tab_id] = window_id
+        elif command_id == SNSS_TAB_CLOSED and end - start >= 4:
+            closed_tabs.add(struct.unpack_from('<i', buf, start)[0])
+        elif command_id == SNSS_WINDOW_CLOSED and end - start >= 4:
+            closed_windows.add(struct.unpack_from('<i', buf, start)[0])
+
+    urls = []
+    for tab_id, entries in navigations.items():
+        if tab_id in closed_tabs or tab_windows.get(tab_id) in closed_windows:
+            continue
+        url = entries.get(selected.get(tab_id)) or entries[max(entries)]
+        urls.append(url)
+    return urls
+
+
+def lz4_block_decompress(src, uncompressed_size):
+    """Decompress a raw LZ4 block (pure Python fallback for the lz4 package)"""
+    if _lz4_block is not None:
+        return _lz4_block.decompress(src, uncompressed_size=uncompressed_size)
+
+    dst = bytearray()
+    i, n = 0, len(src)
+    while i < n:
+        token = src[i]
+        i += 1
+        literal_length = token >> 4
+        if literal_length == 15:
+            while True:
+                extra = src[i]
+                i += 1
+                literal_length += extra
+                if extra != 255:
+                    break
+        dst += src[i:i + literal_length]
+        i += literal_length
+        if i >= n:
+            break  # Last sequence has no match part
+
+        offset = src[i] | (src[i + 1] << 8)
+        i += 2
+        match_length = token & 0x0F
+        if match_length == 15:
+            while True:
+                extra = src[i]
+                i += 1
+                match_length += extra
+                if extra != 255:
+                    break
+        match_length += 4
+        start = len(dst) - offset
+        if offset >= match_length:
+            dst += dst[start:start + match_length]
+        else:
+            # Overlapping match repeats the last `offset` bytes
+            for k in range(match_length):
+                dst.append(dst[start + k])
+    return bytes(dst)
+
+
+def parse_mozlz4_session(buf):
+    """Return the URLs of the selected entry of every tab in a recovery.jsonlz4"""
+    if len(buf) < 12 or buf[:8] != MOZLZ4_MAGIC:
+        return []
+    (uncompressed_size,) = struct.unpack_from('<I', buf, 8)
+    try:
+        # Decompressed straight from the mapping; the view must be released before the mmap closes
+        with memoryview(buf)[12:] as src:
+            session = json.loads(lz4_block_decompress(src, uncompressed_size))
+    except LZ4_ERRORS:
+        return []
+
+    urls = []
+    for window in session.get('windows', []):
+        for tab in window.get('tabs', []):
+            entries = tab.get('entries') or []
+            if not entries:
+                continue
+            index = min(max(tab.get('index', len(entries)), 1), len(entries))
+            url = entries[index - 1].get('url')
+            if url:
+                urls.append(url)
+    return urls
+
+
+def _read_mapped(path, parser):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return parser(buf)
+
+
+def _latest_chromium_session(profile_dir):
+    """Return the newest Session_* file (the current session) of a profile"""
+    sessions_dir = os.path.join(profile_dir, 'Sessions')
+    latest, latest_mtime = None, -1
+    try:
+        with os.scandir(sessions_dir) as entries:
+            for entry in entries:
+                if entry.name.startswith('Session_') and entry.is_file():
+                    mtime = entry.stat().st_mtime_ns
+                    if mtime > latest_mtime:
+                        latest, latest_mtime = entry.path, mtime
+    except OSError:
+        pass
+    return latest
+
+
+def _subdirectories(path):
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if entry.is_dir()]
+    except OSError:
+        return []
+
+
+class TabInventory:
+    """URL index of the tabs open in every installed browser profile"""
+
+    def __init__(self):
+        self._files = {}   # path -> (mtime_ns, size, browser, profile, urls)
+        self._urls = {}    # normalized url -> {(browser, profile)}
+        self._hosts = {}   # host -> {(browser, profile)}
+        self._lock = threading.Lock()
+
+    def session_files(self):
+        """Yield (browser, profile, path, parser) for every session file on disk"""
+        for browser in browser_locations.CHROMIUM_USER_DATA_DIRS:
+            user_data_dir = browser_locations.chromium_user_data_dir(browser)
+            if not user_data_dir:
+                continue
+            # Opera keeps its only profile in the user data directory itself
+            candidates = [(os.path.basename(user_data_dir), user_data_dir)]
+            candidates += [(entry.name, entry.path) for entry in _subdirectories(user_data_dir)]
+            for profile, profile_dir in candidates:
+                path = _latest_chromium_session(profile_dir)
+                if path:
+                    yield browser, profile, path, parse_snss
+
+        for browser in browser_locations.FIREFOX_PROFILE_ROOTS:
+            root = browser_locations.firefox_profile_root(browser)
+            if not root:
+                continue
+            for parent in (root, os.path.join(root, 'Profiles')):
+                for entry in _subdirectories(parent):
+                    path = os.path.join(entry.path, 'sessionstore-backups', 'recovery.jsonlz4')
+                    if os.path.isfile(path):
+                        yield browser, entry.name, path, parse_mozlz4_session
+
+    def refresh(self):
+        """Re-parse session files that changed since the last refresh"""
+        with self._lock:
+            seen = set()
+            changed = False
+            for browser, profile, path, parser in self.session_files():
+                seen.add(path)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                cached = self._files.get(path)
+                if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                    continue
+                try:
+                    urls = _read_mapped(path, parser)
+                except (OSError, ValueError, struct.error):
+                    urls = []
+                self._files[path] = (st.st_mtime_ns, st.st_size, browser, profile, urls)
+                changed = True
+
+            for path in set(self._files) - seen:
+                del self._files[path]
+                changed = True
+
+            if changed:
+                self._rebuild_index()
+
+    def _rebuild_index(self):
+        urls, hosts = {}, {}
+        for _, _, browser, profile, tab_urls in self._files.values():
+            location = (browser, profile)
+            for url in tab_urls:
+                urls.setdefault(normalize_url(url), set()).add(location)
+                hosts.setdefault(normalize_host(url), set()).add(location)
+        # Swap in complete indexes so readers never see a partial one
+        self._urls, self._hosts = urls, hosts
+
+    def profile_tabs(self):
+        """Return {(browser, profile): [url, ...]} of the tabs found at the last refresh"""
+        tabs = {}
+        for _, _, browser, profile, urls in list(self._files.values()):
+            tabs.setdefault((browser, profile), []).extend(urls)
+        return tabs
+
+    def locations(self, url):
+        """Return the {(browser, profile)} pairs that have url open.
+
+        A bare host such as "office.com" matches any page on that host.
+        """
+        path = urlsplit(url if '://' in url else 'https://' + url).path
+        if path.strip('/'):
+            return self._urls.get(normalize_url(url), set())
+        return self._hosts.get(normalize_host(url), set())
+
+    def is_url_open(self, url, browser_name=None):
+        found = self.locations(url)
+        if browser_name is None:
+            return bool(found)
+        browser_name = browser_locations.canonical_name(browser_name)
+        return any(browser == browser_name for browser, _ in found)
@@ -0,0 +1,85 @@
+"""The audit journal's index follows the files kept on disk."""
+import json
+import os
+import tempfile
+import unittest
+
+import browser_locations
+from audit_journal import EVENT_LAUNCH, EVENT_TERMINATE, AuditIndex, AuditJournal
+
+
+def events_on_disk(journal):
+    events = []
+    for name in journal._files():
+        with open(name, encoding='utf-8') as f:
+            events += [json.loads(line) for line in f]
+    return events
+
+
+class AuditJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'audit.ndjson')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def journal(self, **kwargs):
+        journal = AuditJournal(self.path, flush_interval=0.01, **kwargs)
+        self.addCleanup(journal.close)
+        return journal
+
+    def test_index_drops_rotated_out_events(self):
+        journal = self.journal(max_bytes=2000, backups=2)
+        for n in range(200):
+            journal.record(EVENT_LAUNCH, 'Firefox', f'https://example.com/{n}', private=n % 2 == 0)
+            journal.flush()
+        on_disk = events_on_disk(journal)
+        self.assertLess(len(on_disk), 200)  # Rotation deleted the oldest files
+        self.assertEqual(journal.query(), list(reversed(on_disk)))
+        self.assertEqual(len(journal._index), len(on_disk))
+        oldest = on_disk[0]['url']
+        self.assertEqual([event['url'] for event in journal.query(url=oldest)], [oldest])
+        self.assertEqual(journal.query(url='https://example.com/0'), [])
+
+    def test_reload_matches_the_files(self):
+        journal = self.journal(max_bytes=2000, backups=1)
+        for n in range(100):
+            journal.record(EVENT_TERMINATE, 'Chrome', f'https://example.org/{n}')
+        journal.flush()
+        journal.close()
+        reloaded = self.journal(max_bytes=2000, backups=1)
+        reloaded.flush()
+        self.assertEqual(reloaded.query(), list(reversed(events_on_disk(reloaded))))
+        self.assertEqual(sum(reloaded._file_counts), len(reloaded._index))
+
+    def test_filters_combine(self):
+        journal = self.journal()
+        journal.record(EVENT_LAUNCH, 'Firefox', 'https://office.com/a')
+        journal.record(EVENT_LAUNCH, 'Chrome', 'https://office.com/b')
+        journal.record(EVENT_TERMINATE, 'Chrome')
+        journal.record(EVENT_LAUNCH, 'Chrome', 'https://example.com/')
+        self.assertEqual([event['url'] for event in journal.query(browser='Chrome', url='office.com')],
+                         ['https://office.com/b'])
+        self.assertEqual(len(journal.query(browser='Chrome')), 3)
+        self.assertEqual(len(journal.query(browser='Chrome', event_type=EVENT_LAUNCH, limit=1)), 1)
+
+
+class AuditIndexTest(unittest.TestCase):
+    def test_drop_keeps_positions_valid(self):
+        index = AuditIndex()
+        for n in range(10):
+            browser = browser_locations.canonical_name('Chrome' if n % 2 else 'Firefox')
+            index.add({'ts': n, 'event': EVENT_LAUNCH, 'browser': browser,
+                       'url': f'https://example.com/{n % 3}'})
+        index.drop(4)
+        self.assertEqual(index.base, 4)
+        self.assertEqual([index.event(p)['ts'] for p in index.positions(browser='Chrome')], [5, 7, 9])
+        self.assertEqual([index.event(p)['ts'] for p in index.positions(url='https://example.com/0')], [6, 9])
+        index.drop(100)
+        self.assertEqual(index.by_browser, {})
+        self.assertEqual(index.positions(browser='Chrome'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
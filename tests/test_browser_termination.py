@@ -0,0 +1,57 @@
+"""Termination falls back to a fresh scan and reports processes it could not close."""
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+import psutil
+
+import browser_termination
+
+
+class TerminateBrowserTest(unittest.TestCase):
+    def start_process(self):
+        self.process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        self.addCleanup(self.process.wait)
+        self.addCleanup(self.process.kill)
+        return self.process.pid, psutil.Process(self.process.pid).create_time()
+
+    def terminate(self, entries, scanned, **kwargs):
+        with mock.patch.object(browser_termination, 'scan_processes', return_value=scanned) as scan:
+            result = browser_termination.terminate_browser('Firefox', entries, **kwargs)
+        return result, scan.called
+
+    def test_empty_snapshot_rescans(self):
+        entry = self.start_process()
+        (success, pids), scanned = self.terminate([], [entry])
+        self.assertTrue(scanned)
+        self.assertEqual((success, pids), (True, [entry[0]]))
+        self.assertIsNotNone(self.process.poll())
+
+    def test_reused_pids_rescan(self):
+        entry = self.start_process()
+        stale = [(entry[0], entry[1] - 100.0)]  # Same pid, another process
+        (success, pids), scanned = self.terminate(stale, [entry])
+        self.assertTrue(scanned)
+        self.assertEqual((success, pids), (True, [entry[0]]))
+
+    def test_live_snapshot_is_used_as_is(self):
+        entry = self.start_process()
+        (success, pids), scanned = self.terminate([entry], [])
+        self.assertFalse(scanned)
+        self.assertEqual((success, pids), (True, [entry[0]]))
+
+    def test_access_denied_is_a_failure(self):
+        with mock.patch.object(psutil, 'Process', side_effect=psutil.AccessDenied(1234)):
+            (success, pids), scanned = self.terminate([(1234, 1.0)], [(1234, 1.0)])
+        self.assertFalse(scanned)
+        self.assertEqual((success, pids), (False, []))
+
+    def test_nothing_running_without_rescan(self):
+        (success, pids), scanned = self.terminate([], [], rescan=False)
+        self.assertFalse(scanned)
+        self.assertEqual((success, pids), (True, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
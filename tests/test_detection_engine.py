@@ -0,0 +1,84 @@
+"""scan_sessions only reads process users when they are needed; a stopped detector stays stopped."""
+import os
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import app
+
+from browser_catalog import default_catalog
+from browser_registry import BrowserRegistry
+from detection_engine import DetectionCycle
+from process_source import ProcessRecord, set_process_source
+from session_index import ALL_PROCESSES, SCOPE_SESSION, SCOPE_USER, Scope
+
+
+class RecordingSource:
+    """Returns fixed records and remembers the attributes it was asked for"""
+    name = 'test'
+
+    def __init__(self, records):
+        self.records = records
+        self.requested = []
+
+    def iter_snapshot(self, attrs=(), should_continue=None):
+        self.requested.append(tuple(attrs))
+        return iter(self.records)
+
+
+class ScanSessionsTest(unittest.TestCase):
+    def setUp(self):
+        self.source = RecordingSource([
+            ProcessRecord(10, 'firefox.exe', 1, username='alice', session=1),
+            ProcessRecord(11, 'firefox.exe', 1, username='bob', session=2)])
+        previous = set_process_source(self.source)
+        self.addCleanup(set_process_source, previous)
+        self.catalog = default_catalog()
+
+    def scan(self, scope, attrs=()):
+        index, complete = DetectionCycle().scan_sessions(self.catalog, self.catalog.identity_attrs + attrs, scope)
+        self.assertTrue(complete)
+        return index, self.source.requested[-1]
+
+    def test_all_users_scope_does_not_read_users(self):
+        index, requested = self.scan(ALL_PROCESSES)
+        self.assertNotIn('username', requested)
+        self.assertFalse(index.per_user)
+
+    def test_session_scope_does_not_read_users(self):
+        index, requested = self.scan(Scope(SCOPE_SESSION, 1))
+        self.assertNotIn('username', requested)
+        self.assertEqual(len(index.scoped['Firefox'].processes), 1)
+
+    def test_user_scope_reads_users(self):
+        index, requested = self.scan(Scope(SCOPE_USER, 'alice'))
+        self.assertIn('username', requested)
+        self.assertTrue(index.per_user)
+        self.assertEqual([p.pid for p in index.scoped['Firefox'].processes], [10])
+
+    def test_per_user_counts_on_request(self):
+        index, requested = self.scan(ALL_PROCESSES, ('username',))
+        self.assertEqual(requested.count('username'), 1)
+        self.assertEqual(index.aggregate(), {'alice': {'Firefox': 1}, 'bob': {'Firefox': 1}})
+
+
+class BrowserDetectorTest(unittest.TestCase):
+    def test_stop_before_a_cycle_starts(self):
+        detector = app.BrowserDetector(BrowserRegistry())
+        detector.stop()
+        detector.run()  # The thread body, run here: it must not start a cycle
+        self.assertIsNone(detector.cycle)
+        self.assertIsNone(detector.last_index)
+
+    def test_stop_cancels_the_running_cycle(self):
+        detector = app.BrowserDetector(BrowserRegistry())
+        detector.run()
+        cycle = detector.cycle
+        detector.stop()
+        self.assertTrue(cycle.cancelled)
+        detector.run()
+        self.assertIs(detector.cycle, cycle)
+
+
+if __name__ == '__main__':
+    unittest.main()
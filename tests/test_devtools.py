@@ -0,0 +1,232 @@
+"""devtools against a fake DevTools endpoint: an http.server answering the
+/json API and a WebSocket stub answering JSON-RPC calls."""
+import base64
+import hashlib
+import json
+import socket
+import socketserver
+import struct
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import devtools
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+class FakeBrowser:
+    """State shared by the fake HTTP and WebSocket servers"""
+
+    def __init__(self):
+        self.tabs = [{'id': 'tab-1', 'type': 'page', 'url': 'https://example.com/start'}]
+        self.contexts = []
+        self.calls = []  # (method, params) of every JSON-RPC call
+        self.lock = threading.Lock()
+
+    def rpc(self, method, params):
+        with self.lock:
+            self.calls.append((method, params))
+            if method == 'Target.createBrowserContext':
+                self.contexts.append(f'context-{len(self.contexts) + 1}')
+                return {'browserContextId': self.contexts[-1]}
+            if method == 'Target.createTarget':
+                self.tabs.append({'id': f'tab-{len(self.tabs) + 1}', 'type': 'page', 'url': params['url'],
+                                  'browserContextId': params.get('browserContextId')})
+                return {'targetId': self.tabs[-1]['id']}
+            if method == 'Target.getBrowserContexts':
+                return {'browserContextIds': list(self.contexts)}
+            if method == 'Target.getTargets':
+                return {'targetInfos': [{'targetId': tab['id'], 'type': tab['type'], 'url': tab['url'],
+                                         'browserContextId': tab.get('browserContextId', 'default')}
+                                        for tab in self.tabs]}
+            if method == 'Target.closeTarget':
+                self.tabs = [tab for tab in self.tabs if tab['id'] != params['targetId']]
+                return {'success': True}
+            if method == 'Page.navigate':
+                return {'frameId': 'frame'}
+            return None  # Unknown method: answered with an error
+
+
+class WebSocketStub(socketserver.StreamRequestHandler):
+    """Accepts the upgrade and answers each text frame as a JSON-RPC request"""
+
+    def handle(self):
+        head = b''
+        while b'\r\n\r\n' not in head:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return
+            head += chunk
+        key = next(line.split(b':', 1)[1].strip() for line in head.split(b'\r\n')
+                   if line.lower().startswith(b'sec-websocket-key:'))
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID.encode()).digest())
+        self.request.sendall(b'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n'
+                             b'Connection: Upgrade\r\nSec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            opcode, payload = frame
+            if opcode == 0x8:
+                return
+            request = json.loads(payload)
+            result = self.server.browser.rpc(request['method'], request.get('params', {}))
+            if result is None:
+                response = {'id': request['id'], 'error': {'message': f"'{request['method']}' wasn't found"}}
+            else:
+                response = {'id': request['id'], 'result': result}
+            # An unrelated event first, as a real browser interleaves them
+            self.send_frame(json.dumps({'method': 'Target.targetInfoChanged', 'params': {}}).encode())
+            self.send_frame(json.dumps(response).encode())
+
+    def read_exact(self, count):
+        data = self.rfile.read(count)
+        return data if len(data) == count else None
+
+    def read_frame(self):
+        header = self.read_exact(2)
+        if header is None:
+            return None
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.read_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.read_exact(8))[0]
+        mask = self.read_exact(4)
+        payload = self.read_exact(length) if length else b''
+        return header[0] & 0x0F, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+    def send_frame(self, payload):
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x81, length])
+        elif length < 1 << 16:
+            header = bytes([0x81, 126]) + struct.pack('!H', length)
+        else:
+            header = bytes([0x81, 127]) + struct.pack('!Q', length)
+        self.request.sendall(header + payload)
+
+
+class DevToolsHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # The client keeps its connection open
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def tab_info(self, tab):
+        return dict(tab, webSocketDebuggerUrl=f"{self.server.ws_url}/devtools/page/{tab['id']}")
+
+    def do_GET(self):
+        browser = self.server.browser
+        if self.path == '/json/version':
+            self.reply(200, {'Browser': 'Fake/1.0', 'webSocketDebuggerUrl': f'{self.server.ws_url}/devtools/browser'})
+        elif self.path == '/json/list':
+            with browser.lock:
+                self.reply(200, [self.tab_info(tab) for tab in browser.tabs])
+        elif self.path.startswith('/json/activate/'):
+            tab_id = self.path.rsplit('/', 1)[1]
+            with browser.lock:
+                known = any(tab['id'] == tab_id for tab in browser.tabs)
+                if known:
+                    browser.calls.append(('activate', {'id': tab_id}))
+            self.reply(200 if known else 404, 'Target activated' if known else None)
+        else:
+            self.reply(404)
+
+    def do_PUT(self):
+        browser = self.server.browser
+        if self.path.startswith('/json/new?'):
+            with browser.lock:
+                tab = {'id': f'tab-{len(browser.tabs) + 1}', 'type': 'page', 'url': unquote(self.path[10:])}
+                browser.tabs.append(tab)
+                self.reply(200, self.tab_info(tab))
+        else:
+            self.reply(405)
+
+
+class FakeDevToolsTest(unittest.TestCase):
+    def setUp(self):
+        self.browser = FakeBrowser()
+        self.ws_server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), WebSocketStub)
+        self.ws_server.daemon_threads = True
+        self.ws_server.browser = self.browser
+        self.http_server = ThreadingHTTPServer(('127.0.0.1', 0), DevToolsHTTPHandler)
+        self.http_server.daemon_threads = True
+        self.http_server.browser = self.browser
+        self.http_server.ws_url = 'ws://127.0.0.1:%d' % self.ws_server.server_address[1]
+        for server in (self.ws_server, self.http_server):
+            threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        self.endpoint = ('127.0.0.1', self.http_server.server_address[1])
+
+    def tearDown(self):
+        devtools.discard_client(self.endpoint[1], self.endpoint[0])
+        for server in (self.http_server, self.ws_server):
+            server.shutdown()
+            server.server_close()
+
+    def test_open_url_opens_a_new_tab(self):
+        self.assertTrue(devtools.open_url('Chrome', 'https://example.org/a?b=c', endpoint=self.endpoint))
+        self.assertEqual(self.browser.tabs[-1]['url'], 'https://example.org/a?b=c')
+
+    def test_reuse_existing_activates_and_navigates(self):
+        self.assertTrue(devtools.open_url('Chrome', 'https://example.com/other', reuse_existing=True,
+                                          endpoint=self.endpoint))
+        self.assertEqual(len(self.browser.tabs), 1)
+        methods = [method for method, _ in self.browser.calls]
+        self.assertEqual(methods, ['activate', 'Page.navigate'])
+        self.assertEqual(self.browser.calls[1][1], {'url': 'https://example.com/other'})
+
+    def test_private_window_uses_a_new_context(self):
+        self.assertTrue(devtools.open_url('Chrome', 'https://example.org/', private=True, endpoint=self.endpoint))
+        self.assertEqual(self.browser.tabs[-1]['browserContextId'], 'context-1')
+
+    def test_close_tabs_only_closes_the_requested_context(self):
+        devtools.open_url('Chrome', 'https://www.example.com/private', private=True, endpoint=self.endpoint)
+        self.assertEqual(devtools.close_tabs('Chrome', 'example.com', endpoint=self.endpoint), 1)
+        self.assertEqual([tab['url'] for tab in self.browser.tabs], ['https://www.example.com/private'])
+        self.assertEqual(devtools.close_tabs('Chrome', 'example.com', private=True, endpoint=self.endpoint), 1)
+        self.assertEqual(self.browser.tabs, [])
+
+    def test_connection_is_reused(self):
+        client = devtools.find_endpoint('Chrome', self.endpoint)
+        self.assertIs(devtools.find_endpoint('Chrome', self.endpoint), client)
+
+    def test_rpc_error_is_reported_as_failure(self):
+        client = devtools.find_endpoint('Chrome', self.endpoint)
+        with self.assertRaises(devtools.DevToolsError):
+            client._call(client.version()['webSocketDebuggerUrl'], 'Browser.unknown')
+
+    def test_rpc_error_is_not_resent(self):
+        client = devtools.find_endpoint('Chrome', self.endpoint)
+        with self.assertRaises(devtools.DevToolsError):
+            client._call(client.version()['webSocketDebuggerUrl'], 'Browser.unknown')
+        self.assertEqual([method for method, _ in self.browser.calls], ['Browser.unknown'])
+
+    def test_closed_socket_is_retried_once(self):
+        client = devtools.find_endpoint('Chrome', self.endpoint)
+        ws_url = client.version()['webSocketDebuggerUrl']
+        client._call(ws_url, 'Target.getTargets')
+        client._sockets[ws_url].sock.shutdown(socket.SHUT_RDWR)  # As if the browser dropped it
+        self.assertIn('targetInfos', client._call(ws_url, 'Target.getTargets'))
+        self.assertEqual([method for method, _ in self.browser.calls], ['Target.getTargets'] * 2)
+
+    def test_unreachable_endpoint(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]  # Nothing listens here once closed
+        self.assertIsNone(devtools.find_endpoint('Chrome', ('127.0.0.1', port)))
+        self.assertFalse(devtools.open_url('Chrome', 'https://example.org/', endpoint=('127.0.0.1', port)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""Several agents reporting to one aggregator over local TCP connections."""
+import os
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+
+import fleet
+from browser_registry import BrowserRegistry
+
+SECRET = 'test-secret'
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class ScriptedAgent(fleet.FleetAgent):
+    """Agent whose detection returns whatever the test sets"""
+
+    def __init__(self, *args, statuses, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.detected = dict(statuses)
+
+    def detect(self):
+        return dict(self.detected)
+
+
+class FleetTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.registry = BrowserRegistry()
+        cls.registry.discover()
+
+    def setUp(self):
+        self.updates = []
+        self.results = []
+        self.aggregator = fleet.FleetAggregator(
+            0, on_update=lambda host, statuses, full: self.updates.append((host, statuses, full)),
+            on_result=lambda host, command_id, ok, message: self.results.append((host, command_id, ok, message)),
+            secret=SECRET, hello_timeout=0.3).start()
+        self.address = ('127.0.0.1', self.aggregator.port)
+        self.addCleanup(self.aggregator.stop)
+
+    def start_agent(self, name, statuses, secret=SECRET):
+        agent = ScriptedAgent(self.address, name, interval=0.05, registry=self.registry, secret=secret,
+                              statuses=statuses)
+        thread = threading.Thread(target=agent.run, daemon=True)
+        thread.start()
+
+        def stop():
+            agent.stop()
+            thread.join(5.0)
+        self.addCleanup(stop)
+        return agent
+
+    def test_agents_report_to_one_aggregator(self):
+        agents = [self.start_agent(f'lab-{n:02}', {'Firefox': fleet.STATUS_RUNNING if n % 2 else
+                                                   fleet.STATUS_NOT_RUNNING, 'Google Chrome': fleet.STATUS_PRIVATE})
+                  for n in range(5)]
+        expected = {agent.name: agent.detected for agent in agents}
+        self.assertTrue(wait_for(lambda: self.aggregator.hosts() == expected), self.aggregator.hosts())
+
+        # Only the change travels
+        self.updates.clear()
+        agents[0].detected['Firefox'] = fleet.STATUS_PRIVATE
+        self.assertTrue(wait_for(lambda: ('lab-00', {'Firefox': fleet.STATUS_PRIVATE}, False) in self.updates))
+        self.assertEqual(self.aggregator.hosts()['lab-00']['Google Chrome'], fleet.STATUS_PRIVATE)
+
+    def test_stopped_agent_goes_offline(self):
+        self.aggregator.offline_after = 0.5
+        agent = self.start_agent('lab-01', {'Firefox': fleet.STATUS_RUNNING})
+        # The host shows up empty on hello, before its first statuses
+        running = {'Firefox': fleet.STATUS_RUNNING}
+        self.assertTrue(wait_for(lambda: self.aggregator.hosts().get('lab-01') == running))
+        agent.stop()
+        self.assertTrue(wait_for(lambda: self.aggregator.hosts()['lab-01'] == {'Firefox': fleet.STATUS_OFFLINE}))
+
+    def test_wrong_secret_is_rejected(self):
+        self.start_agent('intruder', {'Firefox': fleet.STATUS_RUNNING}, secret='guess')
+        self.start_agent('lab-01', {'Firefox': fleet.STATUS_RUNNING})
+        self.assertTrue(wait_for(lambda: 'lab-01' in self.aggregator.hosts()))
+        time.sleep(0.2)
+        self.assertNotIn('intruder', self.aggregator.hosts())
+
+    def test_connection_without_hello_is_dropped(self):
+        with socket.create_connection(self.address, timeout=5.0) as sock:
+            self.assertEqual(sock.recv(1), b'')  # Closed by the aggregator after hello_timeout
+
+    def test_status_before_hello_is_dropped(self):
+        with socket.create_connection(self.address, timeout=5.0) as sock:
+            sock.sendall(fleet.encode({'t': 'f', 's': {'Firefox': fleet.STATUS_RUNNING}}))
+            self.assertEqual(sock.recv(1), b'')
+        self.assertEqual(self.aggregator.hosts(), {})
+
+    def hello(self, sock, name='lab-01'):
+        sock.sendall(fleet.encode({'t': 'h', 'n': name, 'k': SECRET}))
+
+    def test_malformed_messages_drop_only_their_connection(self):
+        agent = self.start_agent('lab-01', {'Firefox': fleet.STATUS_RUNNING})
+        self.assertTrue(wait_for(lambda: 'lab-01' in self.aggregator.hosts()))
+        unauthenticated = [b'[1,2]\n', b'"hello"\n', b'null\n', b'42\n', b'{"t":"h","k":"test-secret"}\n',
+                           b'{"t":"h","n":null,"k":"test-secret"}\n', b'{"t":"h","n":["x"],"k":"test-secret"}\n']
+        for line in unauthenticated:
+            with socket.create_connection(self.address, timeout=5.0) as sock:
+                sock.sendall(line)
+                self.assertEqual(sock.recv(1), b'', line)
+        for message in ({'t': 'd', 's': [1]}, {'t': 'f', 's': 'Firefox'}, {'t': 'd', 's': {'Firefox': 1}},
+                        {'t': 'd', 's': {'Firefox': ['running']}}):
+            with socket.create_connection(self.address, timeout=5.0) as sock:
+                self.hello(sock, 'lab-02')
+                sock.sendall(fleet.encode(message))
+                self.assertEqual(sock.recv(1), b'', message)
+        with socket.create_connection(self.address, timeout=5.0) as sock:
+            self.hello(sock, 'lab-03')
+            sock.sendall(b'[]\n')
+            self.assertEqual(sock.recv(1), b'')
+
+        self.assertTrue(self.aggregator._thread.is_alive())
+        self.assertEqual(set(self.aggregator.hosts()), {'lab-01'})
+        # The well-behaved agent is still served
+        self.updates.clear()
+        agent.detected['Firefox'] = fleet.STATUS_PRIVATE
+        self.assertTrue(wait_for(lambda: ('lab-01', {'Firefox': fleet.STATUS_PRIVATE}, False) in self.updates))
+
+    def test_failing_callback_does_not_stop_the_loop(self):
+        def fail(host, statuses, full):
+            raise RuntimeError("callback failed")
+        self.aggregator.on_update = fail
+        with self.assertLogs('browser_manager.fleet', 'ERROR') as logs:
+            self.start_agent('lab-01', {'Firefox': fleet.STATUS_RUNNING})
+            self.assertTrue(wait_for(lambda: logs.output))
+        self.assertTrue(self.aggregator._thread.is_alive())
+
+    def test_open_command_refuses_switches(self):
+        self.start_agent('lab-01', {'Firefox': fleet.STATUS_RUNNING})
+        self.assertTrue(wait_for(lambda: 'lab-01' in self.aggregator.hosts()))
+        with mock.patch('subprocess.Popen') as popen:
+            command_id = self.aggregator.send_command('lab-01', fleet.ACTION_OPEN, 'Google Chrome',
+                                                      '--utility-cmd-prefix=calc.exe')
+            self.assertTrue(wait_for(lambda: self.results))
+        self.assertFalse(popen.called)
+        host, result_id, ok, message = self.results[0]
+        self.assertEqual((host, result_id, ok), ('lab-01', command_id, False))
+        self.assertIn('only http and https', message)
+
+    def test_command_to_unknown_host_fails(self):
+        self.aggregator.send_command('nowhere', fleet.ACTION_CLOSE, 'Firefox')
+        self.assertTrue(wait_for(lambda: self.results))
+        self.assertEqual(self.results[0][2:], (False, 'nowhere is offline'))
+
+
+class LaunchTest(unittest.TestCase):
+    def test_openable_urls(self):
+        for url in ('https://office.com', 'http://example.com/a?b=c', 'HTTPS://Example.com'):
+            self.assertTrue(fleet.is_openable_url(url), url)
+        for url in ('--gpu-launcher=calc', 'file:///etc/passwd', 'javascript:alert(1)', 'https://',
+                    ' https://example.com', 'https://example.com/\n--x', None, 42):
+            self.assertFalse(fleet.is_openable_url(url), url)
+
+    def test_launch_command_ends_switches(self):
+        self.assertEqual(fleet.launch_command('Google Chrome', 'chrome', '--incognito', 'https://a.example'),
+                         ['chrome', '--incognito', '--', 'https://a.example'])
+        self.assertEqual(fleet.launch_command('Firefox', 'firefox', '-private', 'https://a.example'),
+                         ['firefox', '-private', 'https://a.example'])
+
+    def test_agent_needs_a_secret(self):
+        with mock.patch.dict(os.environ, {fleet.SECRET_ENV_VAR: ''}):
+            with self.assertRaises(ValueError):
+                fleet.FleetAgent(('127.0.0.1', 1), 'lab-01', registry=BrowserRegistry())
+
+    def test_aggregator_binds_to_localhost(self):
+        with mock.patch.dict(os.environ, {fleet.SECRET_ENV_VAR: ''}):
+            aggregator = fleet.FleetAggregator(0)
+        self.assertEqual(aggregator.bind, '127.0.0.1')
+        self.assertTrue(aggregator.secret_generated and aggregator.secret)
+
+
+if __name__ == '__main__':
+    unittest.main()
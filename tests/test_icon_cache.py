@@ -0,0 +1,60 @@
+"""The icon cache stays bounded and its loader survives failing loads."""
+import os
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QEventLoop, QTimer
+from PyQt5.QtWidgets import QApplication
+
+from icon_cache import IconCache
+
+APP = QApplication.instance() or QApplication([])
+
+
+class FailingStore:
+    """Raises an unexpected error for the first executable, then has no icons"""
+
+    def __init__(self):
+        self.calls = []
+
+    def load(self, executable):
+        self.calls.append(executable)
+        if len(self.calls) == 1:
+            raise RuntimeError("unexpected")
+        return None
+
+
+def run_until(predicate, timeout=5.0):
+    loop = QEventLoop()
+    timer = QTimer()
+    timer.timeout.connect(lambda: predicate() and loop.quit())
+    timer.start(10)
+    QTimer.singleShot(int(timeout * 1000), loop.quit)
+    loop.exec_()
+    timer.stop()
+    return predicate()
+
+
+class IconCacheTest(unittest.TestCase):
+    def test_missing_executables_are_bounded(self):
+        cache = IconCache(store=FailingStore(), capacity=4)
+        for n in range(50):
+            self.assertIsNone(cache.pixmap(f'/nonexistent/browser-{n}'))
+        self.assertEqual(list(cache.pixmaps), [f'/nonexistent/browser-{n}' for n in range(46, 50)])
+
+    def test_loader_survives_an_unexpected_error(self):
+        store = FailingStore()
+        cache = IconCache(store=store)
+        ready = []
+        cache.icon_ready.connect(ready.append)
+        with self.assertLogs('browser_manager.icons', 'ERROR'):
+            cache.pixmap(os.__file__)
+            self.assertTrue(run_until(lambda: ready == [os.__file__]))
+        cache.pixmap(__file__)
+        self.assertTrue(run_until(lambda: ready == [os.__file__, __file__]))
+        self.assertTrue(cache.loader.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""Policy actions are not doubled while running and are retried until the key complies."""
+import threading
+import time
+import unittest
+from unittest import mock
+
+import policy_engine
+from policy_engine import Instance, PolicyEngine, compile_policies
+
+USER_KEY = ('alice', 'Firefox')
+
+
+def instances(count):
+    return tuple(Instance(pid, float(pid), False) for pid in range(100, 100 + count))
+
+
+class BlockingActions:
+    """terminate() waits for release() and reports the configured outcome"""
+
+    def __init__(self, success):
+        self.success = success
+        self.calls = []
+        self.release = threading.Event()
+        self.finished = threading.Semaphore(0)
+
+    def terminate(self, violation):
+        self.calls.append(violation.targets)
+        self.release.wait(5.0)
+        self.finished.release()
+        return self.success, {}
+
+
+class PolicyEngineTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(policy_engine, 'get_journal')
+        self.addCleanup(patcher.stop)
+        patcher.start()
+        retry = mock.patch.object(policy_engine, 'RETRY_MIN', 0.1)
+        self.addCleanup(retry.stop)
+        retry.start()
+        self.policies = compile_policies([{'name': 'one Firefox', 'browser': 'Firefox', 'max_instances': 1,
+                                           'action': 'terminate'}])
+
+    def wait_finished(self, actions):
+        self.assertTrue(actions.finished.acquire(timeout=5.0))
+        time.sleep(0.02)  # Let enforce() schedule its re-check
+
+    def test_running_action_is_not_started_twice(self):
+        actions = BlockingActions(success=True)
+        engine = PolicyEngine(self.policies, actions)
+        self.assertEqual(len(engine.update({USER_KEY: instances(2)})), 1)
+        engine.update({USER_KEY: instances(3)})  # Changed, but the first action still runs
+        actions.release.set()
+        self.wait_finished(actions)
+        self.assertEqual(len(actions.calls), 1)
+
+    def test_failed_action_is_retried_after_backoff(self):
+        actions = BlockingActions(success=False)
+        actions.release.set()
+        engine = PolicyEngine(self.policies, actions)
+        facts = {USER_KEY: instances(2)}
+        engine.update(facts)
+        self.wait_finished(actions)
+        engine.update(dict(facts))  # Unchanged and not due yet
+        self.assertEqual(len(actions.calls), 1)
+        time.sleep(0.15)
+        engine.update(dict(facts))
+        self.wait_finished(actions)
+        self.assertEqual(len(actions.calls), 2)
+        # The second re-check waits twice as long
+        time.sleep(0.1)
+        engine.update(dict(facts))
+        self.assertEqual(len(actions.calls), 2)
+
+    def test_complying_key_is_no_longer_rechecked(self):
+        actions = BlockingActions(success=True)
+        actions.release.set()
+        engine = PolicyEngine(self.policies, actions)
+        engine.update({USER_KEY: instances(2)})
+        self.wait_finished(actions)
+        self.assertIn(USER_KEY, engine._rechecks[policy_engine.FACTS_PROCESSES])
+        engine.update({USER_KEY: instances(1)})
+        self.assertEqual(engine._rechecks[policy_engine.FACTS_PROCESSES], {})
+        time.sleep(0.15)
+        engine.update({USER_KEY: instances(1)})
+        self.assertEqual(len(actions.calls), 1)
+
+    def test_dry_run_only_reports(self):
+        actions = BlockingActions(success=True)
+        engine = PolicyEngine(self.policies, actions, dry_run=True)
+        self.assertEqual(len(engine.update({USER_KEY: instances(3)})), 1)
+        self.assertEqual(actions.calls, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+"""Replaying a trace that runs out of process snapshots."""
+import unittest
+
+from process_source import ProcessRecord
+from process_trace import ReplayProcessSource
+
+FRAME = {'records': [[4, 'firefox.exe', 1]]}
+
+
+class ReplayProcessSourceTest(unittest.TestCase):
+    def test_snapshots_in_order(self):
+        source = ReplayProcessSource([FRAME, {'records': []}])
+        self.assertEqual(source.snapshot(), [ProcessRecord(4, 'firefox.exe', 1)])
+        self.assertEqual(source.snapshot(), [])
+
+    def test_exhausted_trace_raises_value_error(self):
+        source = ReplayProcessSource([FRAME])
+        source.snapshot()
+        with self.assertRaisesRegex(ValueError, 'trace exhausted'):
+            source.snapshot()
+        with self.assertRaisesRegex(ValueError, 'trace exhausted'):
+            next(source.iter_snapshot())
+
+
+if __name__ == '__main__':
+    unittest.main()
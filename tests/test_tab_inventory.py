@@ -0,0 +1,63 @@
+"""Firefox session files decoded straight from their mapping."""
+import json
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import tab_inventory
+from tab_inventory import MOZLZ4_MAGIC, lz4_block_decompress, parse_mozlz4_session
+
+
+def literal_block(data):
+    """An LZ4 block holding data as a single literal run"""
+    length = len(data)
+    if length < 15:
+        return bytes([length << 4]) + data
+    rest = length - 15
+    return bytes([0xF0]) + b'\xff' * (rest // 255) + bytes([rest % 255]) + data
+
+
+def mozlz4(session):
+    raw = json.dumps(session).encode()
+    return MOZLZ4_MAGIC + struct.pack('<I', len(raw)) + literal_block(raw)
+
+
+SESSION = {'windows': [{'tabs': [
+    {'entries': [{'url': 'https://example.com/a'}, {'url': 'https://office.com/'}], 'index': 2},
+    {'entries': [{'url': 'https://example.org/'}]},
+    {'entries': []}]}]}
+
+
+class MozLz4Test(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(tab_inventory, '_lz4_block', None)  # The pure Python decoder
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'recovery.jsonlz4')
+
+    def parse(self, data):
+        with open(self.path, 'wb') as f:
+            f.write(data)
+        return tab_inventory._read_mapped(self.path, parse_mozlz4_session)
+
+    def test_selected_entries_from_the_mapping(self):
+        self.assertEqual(self.parse(mozlz4(SESSION)), ['https://office.com/', 'https://example.org/'])
+
+    def test_corrupt_files(self):
+        data = mozlz4(SESSION)
+        self.assertEqual(self.parse(data[:40]), [])  # Half written
+        self.assertEqual(self.parse(b'mozLz40\0' + b'\xff' * 32), [])
+        self.assertEqual(self.parse(b'not a session file'), [])
+
+    def test_overlapping_match(self):
+        # 'abc', then 9 bytes copied from 3 back, then the closing literal
+        block = bytes([0x35]) + b'abc' + b'\x03\x00' + bytes([0x10]) + b'x'
+        self.assertEqual(lz4_block_decompress(memoryview(block), 13), b'abcabcabcabcx')
+
+
+if __name__ == '__main__':
+    unittest.main()
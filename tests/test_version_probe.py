@@ -0,0 +1,144 @@
+"""probe_version against synthetic PE32 and PE32+ images."""
+import os
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+import browser_locations
+import version_probe
+from version_probe import RT_VERSION, VersionIndex, probe_version
+
+PE_OFFSET = 0x40
+RSRC_RVA = 0x1000
+RSRC_OFFSET = 0x200
+SUBDIRECTORY = 0x80000000
+RT_ICON = 3
+
+
+def directory(entries):
+    """A resource directory of (id, offset) entries, all ids, no names"""
+    return struct.pack('<IIHHHH', 0, 0, 0, 0, 0, len(entries)) + b''.join(
+        struct.pack('<II', entry_id, offset) for entry_id, offset in entries)
+
+
+def version_info(version):
+    """VS_VERSIONINFO holding just the VS_FIXEDFILEINFO block"""
+    major, minor, build, patch = version
+    key = 'VS_VERSION_INFO\0'.encode('utf-16-le')
+    fixed = (version_probe.FIXED_FILE_INFO_SIGNATURE + struct.pack('<I', 0x10000)
+             + struct.pack('<II', major << 16 | minor, build << 16 | patch) + bytes(40))
+    header = struct.pack('<HHH', 6 + len(key) + 2 + len(fixed), len(fixed), 0) + key + b'\0\0'
+    return header + fixed
+
+
+def resource_tree(resource_type, data):
+    """type -> name 1 -> language 0x409 -> data, laid out from offset 0 of .rsrc"""
+    tree = directory([(resource_type, SUBDIRECTORY | 0x18)])
+    tree += directory([(1, SUBDIRECTORY | 0x30)])
+    tree += directory([(0x409, 0x48)])
+    tree += struct.pack('<IIII', RSRC_RVA + 0x58, len(data), 0, 0)
+    return tree + bytes(0x58 - len(tree)) + data
+
+
+def pe_image(magic=0x10b, resources=b'', with_resource_directory=True):
+    """A PE image with a single .rsrc section holding resources"""
+    directories = 96 if magic == 0x10b else 112
+    optional = bytearray(directories + 16 * 8)
+    struct.pack_into('<H', optional, 0, magic)
+    struct.pack_into('<I', optional, directories - 4, 16)
+    if with_resource_directory:
+        struct.pack_into('<II', optional, directories + 2 * 8, RSRC_RVA, len(resources))
+
+    dos = bytearray(PE_OFFSET)
+    dos[:2] = b'MZ'
+    struct.pack_into('<I', dos, 0x3C, PE_OFFSET)
+    coff = struct.pack('<HHIIIHH', 0x14c if magic == 0x10b else 0x8664, 1, 0, 0, 0, len(optional), 0x102)
+    section = struct.pack('<8sIIIIIIHHI', b'.rsrc', len(resources), RSRC_RVA, len(resources), RSRC_OFFSET,
+                          0, 0, 0, 0, 0x40000040)
+    headers = bytes(dos) + b'PE\0\0' + coff + bytes(optional) + section
+    return headers + bytes(RSRC_OFFSET - len(headers)) + resources
+
+
+class ProbePETest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def probe(self, image):
+        path = os.path.join(self.directory, 'browser.exe')
+        with open(path, 'wb') as f:
+            f.write(image)
+        return probe_version(path)
+
+    def test_pe32(self):
+        image = pe_image(0x10b, resource_tree(RT_VERSION, version_info((120, 0, 6099, 109))))
+        self.assertEqual(self.probe(image), '120.0.6099.109')
+
+    def test_pe32_plus(self):
+        image = pe_image(0x20b, resource_tree(RT_VERSION, version_info((115, 3, 1, 0))))
+        self.assertEqual(self.probe(image), '115.3.1.0')
+
+    def test_missing_version_resource(self):
+        self.assertIsNone(self.probe(pe_image(0x20b, resource_tree(RT_ICON, b'\0' * 64))))
+        self.assertIsNone(self.probe(pe_image(0x10b, with_resource_directory=False)))
+
+    def test_truncated_resource_directory(self):
+        image = pe_image(0x10b, resource_tree(RT_VERSION, version_info((120, 0, 1, 2))))
+        for end in (RSRC_OFFSET + 8, RSRC_OFFSET + 0x20, RSRC_OFFSET + 0x50, RSRC_OFFSET + 0x60):
+            self.assertIsNone(self.probe(image[:end]), end)
+
+    def test_looping_resource_directory(self):
+        # Every level points back at the root directory
+        looping = directory([(RT_VERSION, SUBDIRECTORY | 0)]) + bytes(0x40)
+        self.assertIsNone(self.probe(pe_image(0x20b, looping)))
+        self.assertIsNone(self.probe(pe_image(0x10b, directory([(RT_VERSION, SUBDIRECTORY | 0x7FFFFFF0)]))))
+
+    def test_data_outside_the_image(self):
+        tree = bytearray(resource_tree(RT_VERSION, version_info((1, 2, 3, 4))))
+        struct.pack_into('<I', tree, 0x4C, 0x100000)  # Size runs past the end of the file
+        self.assertIsNone(self.probe(pe_image(0x10b, bytes(tree))))
+
+    def test_not_an_executable(self):
+        self.assertIsNone(self.probe(b''))
+        self.assertIsNone(self.probe(b'MZ'))
+        self.assertIsNone(self.probe(b'#!/bin/sh\nexec firefox "$@"\n' * 4))
+
+
+class VersionIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.paths = {}
+        for n, name in enumerate(('Chrome', 'Edge')):
+            path = os.path.join(directory.name, f'{name}.exe')
+            with open(path, 'wb') as f:
+                f.write(pe_image(0x20b, resource_tree(RT_VERSION, version_info((100 + n, 0, 0, 1)))))
+            self.paths[name] = path
+        self.index_path = os.path.join(directory.name, 'version_index.json')
+
+    def test_saved_once_per_call(self):
+        index = VersionIndex(self.index_path)
+        with mock.patch.object(version_probe.os, 'replace', wraps=os.replace) as replace:
+            self.assertEqual(index.versions(self.paths), {'Chrome': '100.0.0.1', 'Edge': '101.0.0.1'})
+            self.assertEqual(replace.call_count, 1)
+            index.versions(self.paths)  # Nothing changed on disk: not written again
+            self.assertEqual(replace.call_count, 1)
+
+    def test_default_path_is_in_the_data_directory(self):
+        data_dir = os.path.dirname(self.index_path)
+        with mock.patch.dict(os.environ, {browser_locations.DATA_DIR_ENV_VAR: data_dir}):
+            self.assertEqual(VersionIndex().path, self.index_path)
+
+    def test_cached_versions_never_probe(self):
+        self.assertEqual(VersionIndex(self.index_path).cached_versions(self.paths), {})
+        VersionIndex(self.index_path).versions(self.paths)
+        with mock.patch.object(version_probe, 'probe_version') as probe:
+            self.assertEqual(VersionIndex(self.index_path).cached_versions(self.paths),
+                             {'Chrome': '100.0.0.1', 'Edge': '101.0.0.1'})
+        self.assertFalse(probe.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
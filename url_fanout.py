@@ -0,0 +1,114 @@
+"""Open a list of URLs in several browsers at once.
+
+FanOutRunner launches every (browser, url) pair of a batch on a small
+thread pool. Two limits keep a large batch from turning into a spawn storm:
+
+- at most max_concurrent launches are in flight at any time;
+- each browser is launched at most once per per_browser_interval seconds.
+
+Jobs are dispatched round-robin across browsers, so one browser waiting on
+its rate limit never holds up the others. Progress is reported per job and
+cancel() stops the batch; launches already in flight finish, the rest are
+reported as cancelled.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+MAX_CONCURRENT_LAUNCHES = 4
+PER_BROWSER_INTERVAL = 0.5  # Seconds between two launches of the same browser
+
+
+class RateLimiter:
+    """Minimum interval between two events with the same key"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._next = {}
+
+    def delay(self, key, now):
+        """Seconds until key may be used again, 0 if it may be used now"""
+        return max(0.0, self._next.get(key, 0.0) - now)
+
+    def consume(self, key, now):
+        self._next[key] = max(now, self._next.get(key, 0.0)) + self.interval
+
+
+class FanOutRunner(QThread):
+    job_finished = pyqtSignal(str, str, bool, str)  # browser, url, success, message
+    progress = pyqtSignal(int, int)  # jobs done, jobs total
+    batch_finished = pyqtSignal(int, int, int)  # succeeded, failed, cancelled
+
+    def __init__(self, launch, urls, browsers, max_concurrent=MAX_CONCURRENT_LAUNCHES,
+                 per_browser_interval=PER_BROWSER_INTERVAL):
+        """launch(browser, url) returns (success, message), as open_url_in_browser does"""
+        super().__init__()
+        self.launch = launch
+        self.urls = list(urls)
+        self.browsers = list(browsers)
+        self.max_concurrent = max(1, max_concurrent)
+        self.limiter = RateLimiter(per_browser_interval)
+        self.total = len(self.urls) * len(self.browsers)
+        self._condition = threading.Condition()
+        self._cancelled = False
+        self._in_flight = 0
+        self._done = 0
+        self._succeeded = 0
+
+    def cancel(self):
+        """Stop dispatching; safe to call from any thread"""
+        with self._condition:
+            self._cancelled = True
+            self._condition.notify()
+
+    def run(self):
+        queues = OrderedDict((browser, deque(self.urls)) for browser in self.browsers if self.urls)
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='fanout') as pool:
+            with self._condition:
+                while queues and not self._cancelled:
+                    now = time.monotonic()
+                    if self._in_flight >= self.max_concurrent:
+                        self._condition.wait()
+                        continue
+                    browser = next((b for b in queues if not self.limiter.delay(b, now)), None)
+                    if browser is None:
+                        # Every remaining browser is rate limited, sleep until the first is free
+                        self._condition.wait(min(self.limiter.delay(b, now) for b in queues))
+                        continue
+                    url = queues[browser].popleft()
+                    if queues[browser]:
+                        queues.move_to_end(browser)  # Round-robin across browsers
+                    else:
+                        del queues[browser]
+                    self.limiter.consume(browser, now)
+                    self._in_flight += 1
+                    pool.submit(self._launch, browser, url)
+
+        # Launches in flight have finished; report what was never started
+        cancelled = 0
+        for browser, urls in queues.items():
+            for url in urls:
+                cancelled += 1
+                self._finish(browser, url, False, "Cancelled")
+        self.batch_finished.emit(self._succeeded, self._done - self._succeeded - cancelled, cancelled)
+
+    def _launch(self, browser, url):
+        try:
+            success, message = self.launch(browser, url)
+        except Exception as e:
+            success, message = False, f"Error opening {browser}: {str(e)}"
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+        self._finish(browser, url, success, message)
+
+    def _finish(self, browser, url, success, message):
+        with self._condition:
+            self._done += 1
+            self._succeeded += bool(success)
+            done = self._done
+        self.job_finished.emit(browser, url, success, message)
+        self.progress.emit(done, self.total)
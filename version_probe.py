@@ -0,0 +1,320 @@
+"""Installed browser versions read straight from the executables on disk.
+
+Windows binaries carry their version in the VS_FIXEDFILEINFO block of
+the PE VERSIONINFO resource; probe_pe() walks the section table and
+resource tree to it with find_resource(), which icon_cache uses for
+icons. Linux installs are probed through the metadata Firefox ships
+next to its binary (application.ini), or else by searching the ELF
+.rodata section for the browser's product token
+("Chrome/120.0.6099.109"). Both read the file through mmap, so only the
+pages actually touched are loaded and the file is never copied into
+memory.
+
+Results are kept in a VersionIndex keyed by real path and invalidated
+by mtime and size. The index is saved to version_index.json in the
+data directory once per versions() call, not once per probe, so a
+browser is only probed again after it has been updated. Probing a
+changed executable can take a while, so GUI code reads
+cached_versions() and probes on a worker thread.
+"""
+import configparser
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+
+import browser_locations
+
+logger = logging.getLogger('browser_manager.versions')
+
+VERSION_INDEX_FILE = 'version_index.json'
+
+RT_VERSION = 16
+FIXED_FILE_INFO_SIGNATURE = b'\xbd\x04\xef\xfe'  # 0xFEEF04BD, little endian
+
+PRODUCT_TOKEN = re.compile(rb'(?:Chrome|Firefox|Edg|OPR|Brave)/(\d{1,4}\.\d{1,4}(?:\.\d{1,6}){1,2})(?![\d.])')
+
+# Private-mode flags that depend on the installed version: (minimum version, flag),
+# newest last. Firefox 29 added -private-window, which opens a private window
+# in an already running Firefox instead of a whole private-only session.
+VERSIONED_INCOGNITO_FLAGS = {
+    'Firefox': (((0,), '-private'), ((29,), '-private-window'))
+}
+
+
+def parse_version(version):
+    """'120.0.6099.109' -> (120, 0, 6099, 109); None for anything unparseable"""
+    try:
+        return tuple(int(part) for part in version.split('.'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def select_incognito_flag(browser_name, version, default):
+    """Return the private-mode flag the installed version supports"""
+    choices = VERSIONED_INCOGNITO_FLAGS.get(browser_locations.canonical_name(browser_name))
+    parsed = parse_version(version)
+    if not choices or parsed is None:
+        return default
+    flag = default
+    for minimum, candidate in choices:
+        if parsed >= minimum:
+            flag = candidate
+    return flag
+
+
+def _rva_to_offset(sections, rva):
+    for virtual_size, virtual_address, raw_size, raw_offset in sections:
+        if virtual_address <= rva < virtual_address + max(virtual_size, raw_size):
+            return raw_offset + rva - virtual_address
+    return None
+
+
+def _pe_resources(buf):
+    """Return (sections, file offset of the resource directory) of a PE image, or None"""
+    if len(buf) < 0x40 or buf[:2] != b'MZ':
+        return None
+    (pe_offset,) = struct.unpack_from('<I', buf, 0x3C)
+    if pe_offset + 24 > len(buf) or buf[pe_offset:pe_offset + 4] != b'PE\0\0':
+        return None
+    section_count, optional_size = struct.unpack_from('<H12xH', buf, pe_offset + 6)
+    optional = pe_offset + 24
+    (magic,) = struct.unpack_from('<H', buf, optional)
+    if magic == 0x10b:
+        directories = optional + 96
+    elif magic == 0x20b:
+        directories = optional + 112
+    else:
+        return None
+    (directory_count,) = struct.unpack_from('<I', buf, directories - 4)
+    if directory_count <= 2:
+        return None
+    resource_rva, _ = struct.unpack_from('<II', buf, directories + 2 * 8)
+    if not resource_rva:
+        return None
+
+    sections = []
+    table = optional + optional_size
+    for i in range(section_count):
+        entry = table + i * 40
+        if entry + 40 > len(buf):
+            break
+        sections.append(struct.unpack_from('<IIII', buf, entry + 8))
+    base = _rva_to_offset(sections, resource_rva)
+    return None if base is None else (sections, base)
+
+
+def _resource_child(buf, base, directory, wanted=None):
+    """Follow the entry with id wanted, or the first entry, of a resource directory.
+
+    Returns (file offset, is_directory) or None.
+    """
+    named, ids = struct.unpack_from('<HH', buf, directory + 12)
+    for i in range(named + ids):
+        name, offset = struct.unpack_from('<II', buf, directory + 16 + i * 8)
+        if wanted is None or name == wanted:
+            return base + (offset & 0x7FFFFFFF), bool(offset & 0x80000000)
+    return None
+
+
+def find_resource(buf, resource_type, name=None):
+    """Return (file offset, size) of a PE resource in its first language, or None.
+
+    Resources are a three level tree, type -> name -> language; name None
+    takes the first resource of the type.
+    """
+    try:
+        resources = _pe_resources(buf)
+        if resources is None:
+            return None
+        sections, base = resources
+        node = base
+        for level, wanted in enumerate((resource_type, name, None)):
+            child = _resource_child(buf, base, node, wanted)
+            if child is None or child[1] != (level < 2):
+                return None
+            node = child[0]
+        data_rva, data_size = struct.unpack_from('<II', buf, node)
+    except struct.error:
+        return None
+    start = _rva_to_offset(sections, data_rva)
+    if start is None or start + data_size > len(buf):
+        return None
+    return start, data_size
+
+
+def probe_pe(buf):
+    """Return the file version in a PE image's VERSIONINFO resource, or None"""
+    resource = find_resource(buf, RT_VERSION)
+    if resource is None:
+        return None
+    start, size = resource
+    fixed = buf.find(FIXED_FILE_INFO_SIGNATURE, start, start + size)
+    if fixed < 0 or fixed + 16 > len(buf):
+        return None
+    version_ms, version_ls = struct.unpack_from('<II', buf, fixed + 8)
+    return f"{version_ms >> 16}.{version_ms & 0xFFFF}.{version_ls >> 16}.{version_ls & 0xFFFF}"
+
+
+def _elf_section(buf, wanted):
+    """Return (offset, size) of a named ELF section, or None"""
+    if buf[4] == 2:
+        header, shoff_at, counts_at, section_format = '<Q', 0x28, 0x3A, '<I4x16xQQ'
+    elif buf[4] == 1:
+        header, shoff_at, counts_at, section_format = '<I', 0x20, 0x2E, '<I4x8xII'
+    else:
+        return None
+    if buf[5] != 1:
+        return None  # Big endian builds do not exist for the supported browsers
+    (shoff,) = struct.unpack_from(header, buf, shoff_at)
+    entry_size, count, names_index = struct.unpack_from('<HHH', buf, counts_at)
+    if not shoff or shoff + count * entry_size > len(buf) or names_index >= count:
+        return None
+    sections = [struct.unpack_from(section_format, buf, shoff + i * entry_size) for i in range(count)]
+    names_offset = sections[names_index][1]
+    wanted = wanted.encode()
+    for name, offset, size in sections:
+        start = names_offset + name
+        if buf[start:start + len(wanted) + 1] == wanted + b'\0':
+            return offset, size
+    return None
+
+
+def _application_ini_version(path):
+    """Version from the application.ini Mozilla ships next to its binary"""
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        if parser.read(os.path.join(os.path.dirname(path), 'application.ini'), encoding='utf-8'):
+            return parser.get('App', 'Version', fallback=None)
+    except configparser.Error:
+        pass
+    return None
+
+
+def probe_elf(buf):
+    """Search an ELF binary's .rodata for a browser product token, or None"""
+    if len(buf) < 0x40 or buf[:4] != b'\x7fELF':
+        return None
+    try:
+        section = _elf_section(buf, '.rodata')
+    except struct.error:
+        return None
+    start, end = (section[0], section[0] + section[1]) if section else (0, len(buf))
+    match = PRODUCT_TOKEN.search(buf, start, min(end, len(buf)))
+    return match.group(1).decode() if match else None
+
+
+def probe_version(path):
+    """Read the version of the executable at path; None when it has none"""
+    version = _application_ini_version(path)
+    if version:
+        return version
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return probe_pe(buf) or probe_elf(buf)
+
+
+class VersionIndex:
+    """Executable versions cached by real path, mtime and size"""
+
+    def __init__(self, path=None):
+        self.path = path or browser_locations.data_path(VERSION_INDEX_FILE)
+        self._entries = None  # real path -> [mtime_ns, size, version]
+        self._dirty = False  # Entries probed since the last save
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+            self._entries = entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def save(self):
+        """Write the index if anything was probed since it was last written"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries, self._dirty = dict(self._entries), False
+        temporary = self.path + '.tmp'
+        try:
+            with open(temporary, 'w') as f:
+                json.dump(entries, f)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            logger.warning("could not save version index %s: %s", self.path, e)
+
+    def _lookup(self, executable, probe=True):
+        """Return the cached version of executable; a changed file is probed only if probe is set"""
+        if not executable:
+            return None
+        real_path = os.path.realpath(executable)
+        try:
+            st = os.stat(real_path)
+        except OSError:
+            return None
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            cached = self._entries.get(real_path)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+        if not probe:
+            return None
+        try:
+            version = probe_version(real_path)
+        except (OSError, ValueError) as e:
+            logger.warning("could not read the version of %s: %s", real_path, e)
+            version = None
+        with self._lock:
+            self._entries[real_path] = [st.st_mtime_ns, st.st_size, version]
+            self._dirty = True
+        return version
+
+    def version(self, executable):
+        """Return the version of executable, probing it only if it changed on disk"""
+        version = self._lookup(executable)
+        self.save()
+        return version
+
+    def versions(self, browser_paths):
+        """{browser: version} for every browser whose version could be read"""
+        versions = {}
+        for browser, executable in browser_paths.items():
+            version = self._lookup(executable)
+            if version:
+                versions[browser] = version
+        self.save()
+        return versions
+
+    def cached_version(self, executable):
+        """Like version(), but only from the cache: never probes, so it is safe on the GUI thread"""
+        return self._lookup(executable, probe=False)
+
+    def cached_versions(self, browser_paths):
+        """Like versions(), but only from the cache"""
+        versions = {}
+        for browser, executable in browser_paths.items():
+            version = self.cached_version(executable)
+            if version:
+                versions[browser] = version
+        return versions
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_version_index():
+    """Return the shared version index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = VersionIndex()
+        return _index